@@ -18,6 +18,7 @@ def login():
                 session["user_id"] = user.user_id
                 session["username"] = user.username
                 session["role"] = user.role
+                session["institution_id"] = user.institution_id  # also picks the user's shard (utils.sharding)
                 session["phone"] = user.phone
                 print("SESSION AT LOGIN:", dict(session))
                 return redirect(url_for("api.index"))
@@ -1,26 +1,52 @@
-from flask import redirect, render_template, request, jsonify, send_from_directory, flash, url_for
+from flask import redirect, render_template, request, jsonify, send_from_directory, flash, url_for, session
 from marshmallow import ValidationError
 from werkzeug.exceptions import NotFound
 import os
 
 from .init import api
-from .helpers import login_required
+from .helpers import login_required, enforce_institution_scope
 from models import db, Certificate
 from schema.schemas import CertificateSchema
+from schema.serializers import certificate_serializer
+from utils.credentials import revoke_credentials
+from utils.idempotency import idempotent
+from utils.roles import require_roles
+from utils.sharding import fan_out_rows, scope_to_institution, scope_to_row, sharding_enabled
 
 UPLOAD_FOLDER = "static/uploads/certificates"   # adjust path as needed
 
 certificate_schema = CertificateSchema()
 certificates_schema = CertificateSchema(many=True)
 
+CERTIFICATE_ROLES = ("institution_admin", "gov_admin", "super_admin")
+
+
+def _outside_scope(cert):
+    """Institution admins may only change their own institution's certificates."""
+    return session.get("role") == "institution_admin" and cert.institution_id != session.get("institution_id")
+
+
+def _own_institution():
+    """The institution staff are locked to, or None for gov/super admins (who see every institution)."""
+    if session.get("role") in ("institution_admin", "hr"):
+        return session.get("institution_id") or -1
+    return None
+
 
 # -------------------------------
 # CREATE CERTIFICATE
 # -------------------------------
 @api.route('/certificates', methods=['POST'])
+@login_required
+@require_roles(*CERTIFICATE_ROLES)
+@idempotent
 def create_certificate():
     try:
-        new_item = certificate_schema.load(request.json)
+        payload = enforce_institution_scope(dict(request.json or {}))
+        institution_id = payload.pop("institution_id")
+        new_item = certificate_schema.load(payload)
+        new_item.institution_id = institution_id
+        new_item.uploaded_by = session["user_id"]
         db.session.add(new_item)
         db.session.commit()
         return certificate_schema.jsonify(new_item), 201
@@ -36,9 +62,17 @@ def create_certificate():
 # GET ALL CERTIFICATES
 # -------------------------------
 @api.route('/certificates', methods=['GET'])
+@login_required
 def get_certificates():
     try:
-        return certificates_schema.jsonify(Certificate.query.all()), 200
+        stmt = certificate_serializer.select().order_by(Certificate.certificate_id)
+        institution_id = _own_institution()
+        if institution_id is not None:
+            stmt = stmt.where(Certificate.institution_id == institution_id)
+            scope_to_institution(institution_id)
+        elif sharding_enabled():
+            return certificate_serializer.response_across_shards(stmt, "certificate_id")
+        return certificate_serializer.response(stmt)
     except Exception as e:
         return jsonify({"error": "Server error", "message": str(e)}), 500
 
@@ -47,9 +81,13 @@ def get_certificates():
 # GET SINGLE CERTIFICATE
 # -------------------------------
 @api.route('/certificates/<int:id>', methods=['GET'])
+@login_required
 def get_certificate(id):
     try:
+        scope_to_row(Certificate, id)
         cert = Certificate.query.get_or_404(id)
+        if _own_institution() not in (None, cert.institution_id):
+            raise NotFound()  # other institutions' certificates do not exist for staff
         return certificate_schema.jsonify(cert), 200
 
     except NotFound:
@@ -63,10 +101,15 @@ def get_certificate(id):
 # UPDATE CERTIFICATE
 # -------------------------------
 @api.route('/certificates/<int:id>', methods=['PUT'])
+@login_required
+@require_roles(*CERTIFICATE_ROLES)
 def update_certificate(id):
     try:
+        scope_to_row(Certificate, id)
         item = Certificate.query.get_or_404(id)
-        updated = certificate_schema.load(request.json, instance=item)
+        if _outside_scope(item):
+            return jsonify({"error": "Forbidden"}), 403
+        updated = certificate_schema.load(request.json, instance=item, partial=True)
         db.session.commit()
         return certificate_schema.jsonify(updated), 200
 
@@ -84,9 +127,14 @@ def update_certificate(id):
 # DELETE CERTIFICATE
 # -------------------------------
 @api.route('/certificates/<int:id>', methods=['DELETE'])
+@login_required
+@require_roles(*CERTIFICATE_ROLES)
 def delete_certificate(id):
     try:
+        scope_to_row(Certificate, id)
         item = Certificate.query.get_or_404(id)
+        if _outside_scope(item):
+            return jsonify({"error": "Forbidden"}), 403
 
         # delete certificate file if exists
         if item.certificate_file:
@@ -94,6 +142,7 @@ def delete_certificate(id):
             if os.path.exists(file_path):
                 os.remove(file_path)
 
+        revoke_credentials(item.certificate_id, reason="deleted")
         db.session.delete(item)
         db.session.commit()
         return '', 204
@@ -111,6 +160,7 @@ def delete_certificate(id):
 @api.route('/certificates/<int:id>/download', methods=['GET'])
 def download_certificate_file(id):
     try:
+        scope_to_row(Certificate, id)
         cert = Certificate.query.get_or_404(id)
 
         if not cert.certificate_file:
@@ -135,6 +185,7 @@ UPLOAD_FOLDER = "uploads"  # your folder outside static
 @api.route('/certificates/<int:id>/download', methods=['GET'])
 @login_required
 def download_certificate(id):
+    scope_to_row(Certificate, id)
     cert = Certificate.query.get(id)
     if not cert:
         flash("Certificate not found.", "danger")
@@ -161,12 +212,16 @@ def search_certificates_html():
     if not query:
         return ""
 
-    results = Certificate.query.filter(
+    # rows with just what the cards show, so shards can be searched concurrently and merged
+    stmt = db.select(
+        Certificate.certificate_id, Certificate.student_name
+    ).filter(
         db.or_(
             db.func.lower(Certificate.student_name).like(f"%{query}%"),
             db.func.lower(Certificate.certificate_id).like(f"%{query}%"),
             db.func.lower(Certificate.course_name).like(f"%{query}%")
         )
-    ).limit(20).all()
+    ).order_by(Certificate.certificate_id).limit(20)
+    results = fan_out_rows(stmt, limit=20)
 
     return render_template("partials/certificate_cards.html", certificates=results)
@@ -0,0 +1,48 @@
+from flask import request, jsonify, url_for
+
+from .init import api
+from .helpers import login_required
+from models import Certificate
+from utils.credentials import issue_credential, verify_credential
+from utils.sharding import scope_to_row
+
+
+# ============================================================
+# Issue Signed Credential (for QR codes)
+# ============================================================
+@api.route('/certificates/<int:id>/credential', methods=['GET'])
+@login_required
+def get_certificate_credential(id):
+    scope_to_row(Certificate, id)
+    cert = Certificate.query.get_or_404(id)
+
+    if not cert.verified:
+        return jsonify({"error": "Only verified certificates can be issued a credential"}), 409
+
+    credential = issue_credential(cert)
+    return jsonify({
+        "credential": credential,
+        "qr_payload": url_for("api.verify_credential_route", c=credential, _external=True)
+    }), 200
+
+
+# ============================================================
+# Stateless Credential Verification
+# ============================================================
+@api.route('/verify-credential', methods=['GET', 'POST'])
+def verify_credential_route():
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        credential = data.get("credential") or request.form.get("credential")
+    else:
+        credential = request.args.get("c")
+
+    if not credential:
+        return jsonify({"valid": False, "reason": "missing_credential"}), 400
+
+    fields, reason = verify_credential(credential)
+    if not fields:
+        return jsonify({"valid": False, "reason": reason}), 200
+
+    fields.pop("version")
+    return jsonify({"valid": True, "certificate": fields}), 200
@@ -1,6 +1,7 @@
 from functools import wraps
-from flask import session, redirect, url_for, flash
+from flask import session, redirect, url_for, flash, request, jsonify, g
 from marshmallow import ValidationError
+from utils.api_tokens import hash_token, authenticate_token, consume_quota
 
 def login_required(func):
     @wraps(func)
@@ -11,6 +12,30 @@ def login_required(func):
         return func(*args, **kwargs)
     return wrapper
 
+def token_required(func):
+    """Authenticates machine clients with `Authorization: Bearer <institution api token>`."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        auth = request.headers.get("Authorization", "")
+        scheme, _, token = auth.partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            return jsonify({"error": "Missing bearer token"}), 401
+
+        digest = hash_token(token.strip())
+        owner = authenticate_token(digest)
+        if not owner:
+            return jsonify({"error": "Invalid API token"}), 401
+
+        retry_after = consume_quota(digest)
+        if retry_after:
+            response = jsonify({"error": "API quota exceeded"})
+            response.headers["Retry-After"] = str(retry_after)
+            return response, 429
+
+        g.api_institution_id, g.api_token_scope = owner
+        return func(*args, **kwargs)
+    return wrapper
+
 def enforce_institution_scope(payload):
     role = session.get("role")
     session_institution = session.get("institution_id")
@@ -8,4 +8,10 @@ from .institution_routes import *
 from .user_routes import *
 from .certificate_routes import *
 from .verification_routes import *
+from .credential_routes import *
+from .merkle_routes import *
+from .machine_api_routes import *
+from .webhook_routes import *
+from .stats_routes import *
+from .report_routes import *
 from .views import *
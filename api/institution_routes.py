@@ -1,14 +1,21 @@
 import secrets
-from flask import flash, redirect, request, render_template, session, url_for
+from flask import current_app, flash, redirect, request, render_template, session, url_for, jsonify, Response
 from .init import api
 from models import Certificate, User, Verification, db, Institution
 from schema.schemas import InstitutionSchema
 from.helpers import login_required
+from utils.roles import require_roles
+from utils.api_tokens import generate_api_token, forget_token
+from utils import live_updates
+from utils.idempotency import idempotent
+from utils.confirmations import group_by_task
+from utils.sharding import scope_to_institution
 
 institution_schema = InstitutionSchema()
 institutions_schema = InstitutionSchema(many=True)
 
 @api.route('/institutions', methods=['POST'])
+@idempotent
 def create_institution():
     # Extract form data
     institution_name = request.form.get("institution_name")
@@ -16,9 +23,9 @@ def create_institution():
     contact_email = request.form.get("contact_email")
     contact_phone = request.form.get("contact_phone")
 
-    # Auto-generate API URL and Token
+    # Auto-generate API URL and Token (only the token hash is stored)
     api_url = f"https://api.example.com/{secrets.token_hex(4)}"
-    api_token = secrets.token_hex(16)
+    api_token, api_token_hash = generate_api_token()
 
     # Create new Institution instance
     new_item = Institution(
@@ -27,14 +34,14 @@ def create_institution():
         contact_email=contact_email,
         contact_phone=contact_phone,
         api_url=api_url,
-        api_token=api_token
+        api_token_hash=api_token_hash
     )
 
     # Save to database
     db.session.add(new_item)
     db.session.commit()
 
-    flash("Institution created successfully.", "success")
+    flash(f"Institution created successfully. API token (shown only once): {api_token}", "success")
 
     # Redirect back to the institutions page
     return redirect(url_for("api.view_institutions"))
@@ -55,6 +62,7 @@ def institution_dashboard():
     if not inst:
         flash("Institution not found.", "error")
         return redirect(url_for("api.index"))
+    scope_to_institution(inst.institution_id)
 
     # Pending verifications
     pending = (
@@ -75,10 +83,73 @@ def institution_dashboard():
     return render_template(
         "institution_dashboard.html",
         institution=inst,   # ✅ Pass the institution object to template
-        pending=pending,
+        pending=group_by_task(pending),  # one row per review, however many requesters wait on it
         completed=completed
     )
 
+@api.route("/institution/dashboard/events", endpoint="institution_dashboard_events")
+@login_required
+def institution_dashboard_events():
+    """
+    Server-Sent Events stream of new and updated verifications for the
+    user's institution, so open dashboards update without reloading.
+    """
+    user = User.query.get(session["user_id"])
+    if not user or not user.institution_id:
+        return jsonify({"error": "No institution linked to this account"}), 404
+
+    max_streams = current_app.config["LIVE_MAX_STREAMS"]
+    if max_streams and live_updates.broker.connection_count() >= max_streams:
+        # under thread workers each stream holds a thread; keep the rest for requests
+        response = jsonify({"error": "Too many live streams on this worker"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    institution_id = user.institution_id
+    heartbeat = current_app.config["LIVE_HEARTBEAT_SECONDS"]
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    app = current_app._get_current_object()
+
+    # Release the DB connection now; the stream can stay open for hours
+    db.session.remove()
+
+    def stream():
+        with app.app_context():
+            subscription = live_updates.broker.subscribe(institution_id, last_event_id)
+        try:
+            yield "retry: 3000\n: connected\n\n"
+            while not subscription.overflowed:
+                item = subscription.get(timeout=heartbeat)
+                # comment lines keep proxies from timing out idle streams
+                yield live_updates.format_sse(*item) if item else ": heartbeat\n\n"
+        finally:
+            subscription.close()
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@api.route('/institutions/<int:id>/token', methods=['POST'])
+@login_required
+@require_roles("gov_admin", "super_admin")
+def rotate_institution_token(id):
+    item = Institution.query.get_or_404(id)
+    # "all" lets the token look up every institution's records; it is only ever granted here
+    scope = (request.get_json(silent=True) or {}).get("scope") or item.api_token_scope or "institution"
+    if scope not in ("institution", "all"):
+        return jsonify({"error": "scope must be 'institution' or 'all'"}), 400
+
+    if item.api_token_hash:
+        forget_token(item.api_token_hash)
+
+    api_token, item.api_token_hash = generate_api_token()
+    item.api_token = None
+    item.api_token_scope = scope
+    db.session.commit()
+
+    return jsonify({"institution_id": item.institution_id, "api_token": api_token, "scope": scope}), 200
+
 @api.route('/institutions/<int:id>', methods=['GET'])
 def get_institution(id):
     return institution_schema.jsonify(Institution.query.get_or_404(id))
@@ -0,0 +1,69 @@
+from flask import current_app, g, request, jsonify
+
+from .init import api
+from .helpers import token_required
+from utils.lookups import lookup_student_numbers
+from utils.idempotency import idempotent
+
+
+def _payload_institution_id(data):
+    """Lookups default to the token's own institution."""
+    try:
+        return int(data.get("institution_id") or g.api_institution_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _outside_token_scope(institution_id):
+    """Tokens only look up their own institution unless issued with scope "all"."""
+    return g.api_token_scope != "all" and institution_id != g.api_institution_id
+
+
+# ============================================================
+# Single Student Number Verification
+# ============================================================
+@api.route('/api/v1/verify', methods=['POST'])
+@token_required
+@idempotent
+def api_verify():
+    data = request.get_json(silent=True) or {}
+    institution_id = _payload_institution_id(data)
+    student_number = str(data.get("student_number") or "").strip()
+
+    if not institution_id or not student_number:
+        return jsonify({"error": "student_number is required"}), 400
+    if _outside_token_scope(institution_id):
+        return jsonify({"error": "This API token may only look up its own institution"}), 403
+
+    result = lookup_student_numbers(institution_id, [student_number])[student_number]
+    return jsonify({"institution_id": institution_id, "student_number": student_number, **result}), 200
+
+
+# ============================================================
+# Batch Verification (one query per call)
+# ============================================================
+@api.route('/api/v1/verify/batch', methods=['POST'])
+@token_required
+@idempotent
+def api_verify_batch():
+    data = request.get_json(silent=True) or {}
+    institution_id = _payload_institution_id(data)
+    student_numbers = data.get("student_numbers")
+
+    if not institution_id or not isinstance(student_numbers, list) or not student_numbers:
+        return jsonify({"error": "student_numbers must be a non-empty list"}), 400
+    if _outside_token_scope(institution_id):
+        return jsonify({"error": "This API token may only look up its own institution"}), 403
+
+    max_size = current_app.config["API_BATCH_MAX_SIZE"]
+    if len(student_numbers) > max_size:
+        return jsonify({"error": f"At most {max_size} student numbers per call"}), 413
+
+    # de-duplicate while keeping the caller's order
+    student_numbers = list(dict.fromkeys(str(sn).strip() for sn in student_numbers if str(sn).strip()))
+    results = lookup_student_numbers(institution_id, student_numbers)
+
+    return jsonify({
+        "institution_id": institution_id,
+        "results": [{"student_number": sn, **results[sn]} for sn in student_numbers],
+    }), 200
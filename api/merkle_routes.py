@@ -0,0 +1,68 @@
+from flask import request, jsonify
+
+from .init import api
+from models import db, Certificate, CertificateBatch
+from utils.merkle import (
+    certificate_proof, leaf_hash, proof_from_json, proof_to_json, root_from_proof,
+)
+from utils.sharding import scope_to_row
+
+
+# ============================================================
+# Inclusion Proof for an Anchored Certificate
+# ============================================================
+@api.route('/certificates/<int:id>/proof', methods=['GET'])
+def get_certificate_proof(id):
+    scope_to_row(Certificate, id)
+    cert = Certificate.query.get_or_404(id)
+
+    if cert.batch_id is None:
+        return jsonify({"error": "Certificate has not been anchored yet"}), 404
+
+    proof = certificate_proof(cert)
+    if proof is None:
+        return jsonify({"error": "Certificate was changed after it was anchored; its batch no longer covers it"}), 409
+
+    batch = db.session.get(CertificateBatch, cert.batch_id)
+    return jsonify({
+        "batch_id": batch.batch_id,
+        "institution_id": batch.institution_id,
+        "merkle_root": batch.merkle_root,
+        "leaf_index": cert.batch_index,
+        "leaf_count": batch.leaf_count,
+        "certificate": [
+            cert.certificate_id, cert.institution_id, cert.student_number,
+            cert.student_name, cert.course_name, cert.graduation_year,
+        ],
+        "proof": proof_to_json(proof),
+    }), 200
+
+
+# ============================================================
+# Verify an Inclusion Proof
+# ============================================================
+@api.route('/certificates/verify-proof', methods=['POST'])
+def verify_certificate_proof():
+    """
+    Recomputes the root from the certificate fields and the proof, then
+    compares it with the stored root of the batch (one primary key lookup).
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        leaf = leaf_hash(data["certificate"])
+        root = root_from_proof(leaf, proof_from_json(data["proof"]))
+        batch_id = int(data["batch_id"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "certificate, proof and batch_id are required"}), 400
+
+    scope_to_row(CertificateBatch, batch_id)
+    batch = db.session.get(CertificateBatch, batch_id)
+    if not batch:
+        return jsonify({"valid": False, "reason": "unknown_batch"}), 200
+
+    return jsonify({
+        "valid": root.hex() == batch.merkle_root,
+        "computed_root": root.hex(),
+        "merkle_root": batch.merkle_root,
+    }), 200
@@ -0,0 +1,257 @@
+"""
+The public verification and lookup endpoints as an ASGI app (see asgi.py).
+
+Same URLs, parameters and JSON as the Flask routes:
+
+    GET       /verifications/lookup
+    GET, POST /verify-credential
+    POST      /api/v1/verify, /api/v1/verify/batch   (bearer token)
+
+Database reads go through SQLAlchemy's asyncio engine with the models from
+models.py, so a request waiting on the database holds no thread: one
+process keeps thousands of requests in flight, and only ASYNC_DB_POOL_SIZE
+of them hold a connection at a time. Config, Bloom filters, the API token
+cache, quotas and the revocation set are the same code the Flask routes
+use; every request runs inside an app context of a create_cli_app() app.
+"""
+from urllib.parse import parse_qs
+
+import orjson
+
+from models import db
+from utils.api_tokens import authenticate_token_async, consume_quota_async, hash_token
+from utils.async_db import create_async_db
+from utils.bloom import ensure_bloom_filters
+from utils.credentials import refresh_revocations_async, verify_credential
+from utils.lookups import lookup_student_numbers_async, public_lookup_result
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = {name: values[0] for name, values in parse_qs(scope["query_string"].decode("latin-1")).items()}
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        self.body = body
+
+    def json(self):
+        """The body as JSON, or None (like Flask's get_json(silent=True))."""
+        try:
+            return orjson.loads(self.body) if self.body else None
+        except orjson.JSONDecodeError:
+            return None
+
+    def form(self):
+        if not self.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+            return {}
+        return {name: values[0] for name, values in parse_qs(self.body.decode()).items()}
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# --------------------------
+# Handlers: (public app, request) -> (payload, status[, headers])
+# --------------------------
+async def lookup_student_number(public, request):
+    institution_id = _int(request.args.get("institution_id"))
+    student_number = request.args.get("student_number", "").strip()
+
+    if not institution_id or not student_number:
+        return {"error": "institution_id and student_number are required"}, 400
+
+    results = await lookup_student_numbers_async(public.sessions, institution_id, [student_number])
+    return {"student_number": student_number, **public_lookup_result(results[student_number])}, 200
+
+
+async def verify_credential_route(public, request):
+    if request.method == "POST":
+        data = request.json()
+        credential = (data.get("credential") if isinstance(data, dict) else None) or request.form().get("credential")
+    else:
+        credential = request.args.get("c")
+
+    if not credential:
+        return {"valid": False, "reason": "missing_credential"}, 400
+
+    # load the revocation set without blocking the loop; verify_credential() then uses it as is
+    await refresh_revocations_async(public.sessions)
+    fields, reason = verify_credential(credential)
+    if not fields:
+        return {"valid": False, "reason": reason}, 200
+
+    fields.pop("version")
+    return {"valid": True, "certificate": fields}, 200
+
+
+async def _authenticate(public, request):
+    """(TokenOwner, None), or (None, error response) as in token_required."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None, ({"error": "Missing bearer token"}, 401)
+
+    digest = hash_token(token.strip())
+    owner = await authenticate_token_async(public.sessions, digest)
+    if not owner:
+        return None, ({"error": "Invalid API token"}, 401)
+
+    retry_after = await consume_quota_async(public.sessions, digest)
+    if retry_after:
+        return None, ({"error": "API quota exceeded"}, 429, [("retry-after", str(retry_after))])
+    return owner, None
+
+
+def _payload_institution_id(data, owner):
+    """Lookups default to the token's own institution."""
+    return _int(data.get("institution_id") or owner.institution_id)
+
+
+def _outside_token_scope(institution_id, owner):
+    """Tokens only look up their own institution unless issued with scope "all"."""
+    return owner.scope != "all" and institution_id != owner.institution_id
+
+
+async def api_verify(public, request):
+    owner, error = await _authenticate(public, request)
+    if error:
+        return error
+
+    data = request.json()
+    data = data if isinstance(data, dict) else {}
+    institution_id = _payload_institution_id(data, owner)
+    student_number = str(data.get("student_number") or "").strip()
+
+    if not institution_id or not student_number:
+        return {"error": "student_number is required"}, 400
+    if _outside_token_scope(institution_id, owner):
+        return {"error": "This API token may only look up its own institution"}, 403
+
+    results = await lookup_student_numbers_async(public.sessions, institution_id, [student_number])
+    return {"institution_id": institution_id, "student_number": student_number, **results[student_number]}, 200
+
+
+async def api_verify_batch(public, request):
+    owner, error = await _authenticate(public, request)
+    if error:
+        return error
+
+    data = request.json()
+    data = data if isinstance(data, dict) else {}
+    institution_id = _payload_institution_id(data, owner)
+    student_numbers = data.get("student_numbers")
+
+    if not institution_id or not isinstance(student_numbers, list) or not student_numbers:
+        return {"error": "student_numbers must be a non-empty list"}, 400
+    if _outside_token_scope(institution_id, owner):
+        return {"error": "This API token may only look up its own institution"}, 403
+
+    max_size = public.config["API_BATCH_MAX_SIZE"]
+    if len(student_numbers) > max_size:
+        return {"error": f"At most {max_size} student numbers per call"}, 413
+
+    # de-duplicate while keeping the caller's order
+    student_numbers = list(dict.fromkeys(str(sn).strip() for sn in student_numbers if str(sn).strip()))
+    results = await lookup_student_numbers_async(public.sessions, institution_id, student_numbers)
+
+    return {
+        "institution_id": institution_id,
+        "results": [{"student_number": sn, **results[sn]} for sn in student_numbers],
+    }, 200
+
+
+ROUTES = {
+    "/verifications/lookup": ({"GET"}, lookup_student_number),
+    "/verify-credential": ({"GET", "POST"}, verify_credential_route),
+    "/api/v1/verify": ({"POST"}, api_verify),
+    "/api/v1/verify/batch": ({"POST"}, api_verify_batch),
+}
+
+
+# --------------------------
+# ASGI application
+# --------------------------
+class PublicLookupApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.engine = None
+        self.sessions = None
+
+    async def startup(self):
+        self.engine, self.sessions = create_async_db(self.flask_app)
+        with self.flask_app.app_context():
+            if self.config["BLOOM_FILTER_ENABLED"]:
+                # the one synchronous check, done before serving; lookups then only read the filter files
+                ensure_bloom_filters()
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+            await refresh_revocations_async(self.sessions)
+
+    async def shutdown(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        route = ROUTES.get(scope["path"].rstrip("/") or "/")
+        if route is None:
+            return await _respond(send, {"error": "Not found"}, 404)
+        methods, handler = route
+        if scope["method"] not in methods:
+            return await _respond(send, {"error": "Method not allowed"}, 405, [("allow", ", ".join(sorted(methods)))])
+
+        body = await _read_body(receive)
+        if body is None:
+            return await _respond(send, {"error": "Request body too large"}, 413)
+
+        with self.flask_app.app_context():
+            await _respond(send, *await handler(self, Request(scope, body)))
+
+
+async def _read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            return None
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+async def _respond(send, payload, status, headers=()):
+    body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + [(name.encode(), value.encode()) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,129 @@
+from flask import request, jsonify, session, url_for, Response, stream_with_context, send_file
+
+from .init import api
+from .helpers import login_required
+from models import db, ReportJob, User
+from utils.reports import (
+    FORMATS, REPORTS, ReportError, report_period, report_filename, stream_report,
+    report_job_path, rows_per_second,
+)
+from utils.roles import require_roles
+
+REPORT_ROLES = ("institution_admin", "hr", "gov_admin", "super_admin")
+
+
+def _report_args():
+    """(institution_id, date_from, date_to, format) from the query string; staff only ever get their own institution."""
+    institution_id = request.args.get("institution_id", type=int)
+    if session.get("role") in ("institution_admin", "hr"):
+        user = User.query.get(session["user_id"])
+        institution_id = user.institution_id if user else -1
+
+    date_from, date_to = report_period(request.args.get("month"), request.args.get("from"), request.args.get("to"))
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        raise ReportError(f"format must be one of {', '.join(FORMATS)}")
+    return institution_id, date_from, date_to, fmt
+
+
+def _job_json(job):
+    return {
+        "job_id": job.job_id,
+        "report": job.report,
+        "format": job.format,
+        "institution_id": job.institution_id,
+        "from": job.date_from.isoformat() if job.date_from else None,
+        "to": job.date_to.isoformat() if job.date_to else None,
+        "status": job.status,
+        "rows": job.row_count,
+        "bytes": job.byte_count,
+        "seconds": job.seconds,
+        "rows_per_second": rows_per_second(job.row_count, job.seconds),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "download_url": url_for("api.download_report_job", job_id=job.job_id) if job.status == "done" else None,
+    }
+
+
+def _own_job_or_404(job_id):
+    query = ReportJob.query.filter_by(job_id=job_id)
+    if session.get("role") not in ("gov_admin", "super_admin"):
+        query = query.filter_by(requested_by=session["user_id"])
+    return query.first_or_404()
+
+
+# ============================================================
+# Streamed Export
+# ============================================================
+@api.route('/reports/<report>', methods=['GET'])
+@login_required
+@require_roles(*REPORT_ROLES)
+def export_report(report):
+    if report not in REPORTS:
+        return jsonify({"error": f"report must be one of {', '.join(REPORTS)}"}), 404
+    try:
+        institution_id, date_from, date_to, fmt = _report_args()
+    except ReportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    chunks = stream_report(report, fmt, institution_id, date_from, date_to)
+    filename = report_filename(report, fmt, institution_id, date_from, date_to)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=FORMATS[fmt][0],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ============================================================
+# Background Export Jobs (run by `manage.py report-worker`)
+# ============================================================
+@api.route('/reports/<report>/jobs', methods=['POST'])
+@login_required
+@require_roles(*REPORT_ROLES)
+def queue_report_job(report):
+    if report not in REPORTS:
+        return jsonify({"error": f"report must be one of {', '.join(REPORTS)}"}), 404
+    try:
+        institution_id, date_from, date_to, fmt = _report_args()
+    except ReportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job = ReportJob(
+        report=report, format=fmt, institution_id=institution_id, date_from=date_from, date_to=date_to,
+        requested_by=session["user_id"], status="queued",
+        file_name=report_filename(report, fmt, institution_id, date_from, date_to),
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    response = jsonify(_job_json(job))
+    response.headers["Location"] = url_for("api.report_job_status", job_id=job.job_id)
+    return response, 202
+
+
+@api.route('/reports/jobs', methods=['GET'])
+@login_required
+@require_roles(*REPORT_ROLES)
+def list_report_jobs():
+    jobs = ReportJob.query.filter_by(requested_by=session["user_id"]).order_by(ReportJob.job_id.desc()).limit(100)
+    return jsonify([_job_json(job) for job in jobs]), 200
+
+
+@api.route('/reports/jobs/<int:job_id>', methods=['GET'])
+@login_required
+@require_roles(*REPORT_ROLES)
+def report_job_status(job_id):
+    return jsonify(_job_json(_own_job_or_404(job_id))), 200
+
+
+@api.route('/reports/jobs/<int:job_id>/download', methods=['GET'])
+@login_required
+@require_roles(*REPORT_ROLES)
+def download_report_job(job_id):
+    job = _own_job_or_404(job_id)
+    if job.status != "done":
+        return jsonify({"error": f"Report job is {job.status}"}), 409
+    return send_file(report_job_path(job), mimetype=FORMATS[job.format][0],
+                     as_attachment=True, download_name=job.file_name)
@@ -0,0 +1,28 @@
+from flask import request, jsonify, session
+
+from .init import api
+from .helpers import login_required
+from models import User
+from utils.stats import read_stats, parse_day
+
+
+# ============================================================
+# Statistics (reads rollup tables only)
+# ============================================================
+@api.route('/stats/json', methods=['GET'])
+@login_required
+def stats_json():
+    institution_id = request.args.get("institution_id", type=int)
+
+    # Institution staff only ever see their own institution
+    if session.get("role") in ("institution_admin", "hr"):
+        user = User.query.get(session["user_id"])
+        institution_id = user.institution_id if user else -1
+
+    try:
+        date_from = parse_day(request.args.get("from"))
+        date_to = parse_day(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD"}), 400
+
+    return jsonify(read_stats(institution_id, date_from, date_to)), 200
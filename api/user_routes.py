@@ -1,22 +1,22 @@
 # routes/users.py
 import secrets
 import string
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from flask import (
     flash, redirect, request, session, abort, render_template,
-    url_for, current_app, jsonify
+    url_for, jsonify
 )
 
-from itsdangerous import URLSafeTimedSerializer
-
 from .init import api
-from models import db, User, PasswordResetToken
+from models import db, User
 from schema.schemas import UserSchema
 from .helpers import login_required, enforce_institution_scope
 from utils.roles import require_roles
 from utils.audit import log_audit
 from utils.email_service import send_email
+from utils.reset_tokens import issue_reset_token, verify_reset_token
+from utils.idempotency import idempotent
 
 
 user_schema = UserSchema()
@@ -31,9 +31,6 @@ def generate_secure_password(length=12):
     return ''.join(secrets.choice(chars) for _ in range(length))
 
 
-def get_serializer():
-    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-
 def wants_json():
     return request.is_json or request.headers.get("Accept") == "application/json"
 
@@ -86,6 +83,7 @@ def api_get_users():
 # --------------------------
 @api.route("/users", methods=["POST"])
 @login_required
+@idempotent
 def create_user():
     try:
         payload = enforce_institution_scope(request.json or {})
@@ -95,15 +93,7 @@ def create_user():
         db.session.add(user)
         db.session.commit()
 
-        serializer = get_serializer()
-        token = serializer.dumps({"user_id": user.user_id})
-
-        prt = PasswordResetToken(
-            user_id=user.user_id,
-            token=token,
-            expires_at=datetime.utcnow() + timedelta(hours=24)
-        )
-        db.session.add(prt)
+        token = issue_reset_token(user.user_id, timedelta(hours=24))
         db.session.commit()
 
         reset_link = (
@@ -180,15 +170,7 @@ def admin_reset_password(id):
     try:
         user = User.query.get_or_404(id)
 
-        serializer = get_serializer()
-        token = serializer.dumps({"user_id": user.user_id})
-
-        prt = PasswordResetToken(
-            user_id=user.user_id,
-            token=token,
-            expires_at=datetime.utcnow() + timedelta(hours=1)
-        )
-        db.session.add(prt)
+        token = issue_reset_token(user.user_id, timedelta(hours=1))
         db.session.commit()
 
         reset_link = (
@@ -234,11 +216,9 @@ def reset_password_confirm():
     token = request.json.get("token") if request.is_json else request.form.get("token")
     password = request.json.get("password") if request.is_json else request.form.get("password")
 
-    prt = PasswordResetToken.query.filter_by(
-        token=token, used=False
-    ).first()
+    prt = verify_reset_token(token)
 
-    if not prt or prt.is_expired():
+    if not prt:
         if wants_json():
             abort(400, "Invalid or expired token")
 
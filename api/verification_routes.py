@@ -1,16 +1,33 @@
 from flask import (
     request, render_template, jsonify,
-    session, flash, redirect, url_for,
+    session, flash, redirect, url_for, current_app, abort, send_file,
 )
 from werkzeug.utils import secure_filename
+import io
+import json
 import os
 from datetime import datetime
 
 from config import Config
 from .init import api
-from models import db, Verification, Certificate, Institution, User
+from models import db, ArchivedVerification, Verification, Certificate, Institution, User
 from utils.email_service import send_email
+from utils.credentials import revoke_credentials
+from utils.bloom import bloom_filter_stats, might_have_student_number
+from utils.lookups import lookup_student_numbers, public_lookup_result
+from utils.matching import best_match, normalize_number
+from utils.confirmations import confirmation_key, open_task, attach_to_task, resolve_verification
+from utils.archive import archived_verification, read_archived_upload
+from utils.sharding import scope_to_institution, scope_to_row, each_shard, sharding_enabled
+from utils.tracing import span
+from utils.federation import get_federation_client, certificate_payload
+from utils.reminders import reminder_due, mark_reminded
+from utils.roles import require_roles
+from utils.http_cache import institution_list, make_etag, conditional_response
 from schema.schemas import VerificationSchema
+from schema.serializers import verification_serializer
+from .helpers import login_required
+from utils.idempotency import idempotent
 
 # ============================================================
 # Schemas
@@ -23,28 +40,90 @@ verifications_schema = VerificationSchema(many=True)
 # Background Verification Job
 # ============================================================
 def run_verification_job(verification_id):
-    ver = Verification.query.get(verification_id)
-    if not ver:
+    run_verification_jobs([verification_id])
+
+
+def run_verification_jobs(verification_ids, institution_id=None):
+    """Runs the given verifications; with institution_id, only those that institution answers."""
+    query = Verification.query.filter(Verification.verification_id.in_(verification_ids))
+    if institution_id is not None:
+        query = query.filter(Verification.verified_by_institution_id == institution_id)
+    verifications = query.all()
+    if not verifications:
         return
 
-    cert = Certificate.query.get(ver.certificate_id)
+    # a student number the institution's Bloom filter rules out is not_found without asking anyone
+    held = {
+        ver.verification_id for ver in verifications
+        if ver.certificate and may_hold_student_number(ver.verified_by_institution_id, ver.certificate.student_number)
+    }
+    remote_results = federated_results([ver for ver in verifications if ver.verification_id in held])
 
-    if cert:
-        ver.status = "valid"
-        ver.result_json = '{"verified": true}'
-        cert.verified = True
-    else:
-        ver.status = "not_found"
-        ver.result_json = '{"verified": false}'
+    for ver in verifications:
+        cert = ver.certificate if ver.verification_id in held else None
+        remote = remote_results.get(ver.verification_id)
+        status = job_outcome(cert, remote)
+
+        result = {"verified": status == "valid"}
+        if remote:
+            result["federation"] = remote
+        resolve_verification(ver, status, json.dumps(result))
+
+        if cert and status == "valid":
+            cert.verified = True
 
-    ver.verified_at = datetime.utcnow()
     db.session.commit()
 
 
+def federated_results(verifications):
+    """Asks each institution's own API about its certificates, all concurrently."""
+    if not current_app.config["FEDERATION_ENABLED"]:
+        return {}
+
+    institution_ids = {ver.verified_by_institution_id for ver in verifications}
+    api_urls = dict(
+        db.session.query(Institution.institution_id, Institution.api_url)
+        .filter(Institution.institution_id.in_(institution_ids), Institution.api_url.isnot(None))
+        .all()
+    )
+
+    pending = [ver for ver in verifications if ver.certificate and api_urls.get(ver.verified_by_institution_id)]
+    if not pending:
+        return {}
+
+    client = get_federation_client(current_app.config)
+    results = client.lookup_many([
+        (ver.verified_by_institution_id, api_urls[ver.verified_by_institution_id], certificate_payload(ver.certificate))
+        for ver in pending
+    ])
+    return {ver.verification_id: result for ver, result in zip(pending, results)}
+
+
+def may_hold_student_number(institution_id, student_number):
+    """False only if the institution definitely has no certificate with this number (either spelling)."""
+    if not student_number:
+        return True
+    return (might_have_student_number(institution_id, student_number)
+            or might_have_student_number(institution_id, normalize_number(student_number)))
+
+
+def job_outcome(cert, remote):
+    response = remote.get("response") if remote and remote.get("status") == "ok" else None
+
+    # The institution's own records win when they give a clear answer
+    if isinstance(response, dict) and "verified" in response:
+        if response["verified"]:
+            return "valid"
+        return "not_found" if response.get("found") is False else "invalid"
+
+    return "valid" if cert else "not_found"
+
+
 # ============================================================
 # Create Verification Request
 # ============================================================
 @api.route('/verifications/request', methods=['POST'])
+@idempotent
 def request_verification():
     # --- Collect form data ---
     student_name = request.form.get('student_name', '').strip()
@@ -59,10 +138,11 @@ def request_verification():
     # --- Validate required fields ---
     if not all([student_name, course_name, graduation_year, institution_id]):
         flash("All required fields must be filled.", "error")
-        return redirect(url_for("api.view_verifications"))
+        return redirect(url_for("api.verifications_page"))
 
     # --- Load institution ---
     inst = Institution.query.get_or_404(institution_id)
+    scope_to_institution(inst.institution_id)
 
     # --- Handle file upload ---
     file_path = None
@@ -73,21 +153,38 @@ def request_verification():
         os.makedirs(upload_folder, exist_ok=True)
 
         file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
+        with span("upload.save", **{"file.path": file_path}) as traced:
+            file.save(file_path)
+            if traced:
+                traced.set("file.size", os.path.getsize(file_path))
    
 
-    # --- Create certificate ---
-    cert = Certificate(
-        student_name=student_name,
-        student_number=student_number,
-        course_name=course_name,
-        graduation_year=int(graduation_year),
-        uploaded_by=user_id,
-        institution_id=inst.institution_id,
-        certificate_file=file_path  # <-- store path
-    )
-    db.session.add(cert)
-    db.session.commit()
+    # --- A student number the institution has never seen: nothing to share or link ---
+    known = may_hold_student_number(inst.institution_id, student_number)
+
+    # --- Identical request already with the institution? Share its review ---
+    key = confirmation_key(inst.institution_id, student_name, student_number, course_name, int(graduation_year))
+    task = open_task(key) if known else None
+
+    # --- Link to a certificate the institution already holds, or create one ---
+    match = None
+    if task:
+        cert = db.session.get(Certificate, task.certificate_id)
+    else:
+        match = best_match(inst.institution_id, student_name, student_number, course_name, int(graduation_year)) if known else None
+        cert = db.session.get(Certificate, match.certificate_id) if match else None
+    if cert is None:
+        cert = Certificate(
+            student_name=student_name,
+            student_number=student_number,
+            course_name=course_name,
+            graduation_year=int(graduation_year),
+            uploaded_by=user_id,
+            institution_id=inst.institution_id,
+            certificate_file=file_path  # <-- store path
+        )
+        db.session.add(cert)
+        db.session.commit()
 
     # --- Create verification record ---
     verification = Verification(
@@ -96,11 +193,32 @@ def request_verification():
         verified_by_institution_id=inst.institution_id,
         status="pending",
         method="manual_form",
-        requested_at=datetime.utcnow()
+        requested_at=datetime.utcnow(),
+        verification_file=file_path if task or match else None,
+        match_score=match.score if match else None
     )
+
+    # --- Exact match with a record the institution already verified: resolve now ---
+    if match and match.exact and match.verified:
+        verification.status = "valid"
+        verification.result_json = json.dumps({"verified": True, "matched_certificate_id": cert.certificate_id})
+        verification.verified_at = datetime.utcnow()
+        db.session.add(verification)
+        db.session.commit()
+
+        flash("Certificate matched a verified record and was verified immediately.", "success")
+        return redirect(url_for("api.verifications_page"))
+
+    opened = True
+    if key:
+        task, opened = attach_to_task(verification, inst.institution_id, cert.certificate_id, key, task)
     db.session.add(verification)
     db.session.commit()
 
+    if not opened:
+        flash("An identical request is already with the institution; its answer will apply to yours too.", "success")
+        return redirect(url_for("api.verifications_page"))
+
     # --- Build verification link ---
     verification_url = url_for(
         "api.view_verification",
@@ -110,37 +228,72 @@ def request_verification():
 
     # --- Send email ---
     if inst.contact_email:
+        matched = (
+            f"<b>Matched your record #{cert.certificate_id}</b> (score {match.score:.2f})<br><br>"
+            if match else ""
+        )
         send_email(
             to=inst.contact_email,
             subject="Certificate Verification Request",
             body=f"""
             A certificate verification request has been submitted.<br><br>
-            <b>Student:</b> {cert.student_name}<br>
-            <b>Student Number:</b> {cert.student_number}<br>
-            <b>Course:</b> {cert.course_name}<br>
-            <b>Year:</b> {cert.graduation_year}<br><br>
+            {matched}<b>Student:</b> {student_name}<br>
+            <b>Student Number:</b> {student_number}<br>
+            <b>Course:</b> {course_name}<br>
+            <b>Year:</b> {graduation_year}<br><br>
             <a href="{verification_url}">Click here to verify</a><br><br>
             <b>Message:</b><br>{message or 'No message'}
             """
         )
 
     flash("Certificate sent for verification successfully!", "success")
-    return redirect(url_for("api.view_verifications"))
+    return redirect(url_for("api.verifications_page"))
 
 # ============================================================
 # Manual Trigger
 # ============================================================
+RUN_ROLES = ("institution_admin", "gov_admin", "super_admin")
+
+
+def _run_scope():
+    """Institution admins only run their own institution's verifications; None for gov/super admins."""
+    if session.get("role") == "institution_admin":
+        return session.get("institution_id") or -1
+    return None
+
+
 @api.route('/verifications/run/<int:verification_id>', methods=['POST'])
+@login_required
+@require_roles(*RUN_ROLES)
 def run_now(verification_id):
+    scope_to_row(Verification, verification_id)
+    ver = Verification.query.get_or_404(verification_id)
+    if _run_scope() not in (None, ver.verified_by_institution_id):
+        abort(404)
     run_verification_job(verification_id)
     return jsonify({"message": "Verification executed."}), 200
 
 
+@api.route('/verifications/run', methods=['POST'])
+@login_required
+@require_roles(*RUN_ROLES)
+def run_many():
+    verification_ids = (request.get_json(silent=True) or {}).get("verification_ids") or []
+    if not isinstance(verification_ids, list) or not verification_ids:
+        return jsonify({"error": "verification_ids must be a non-empty list"}), 400
+
+    # each shard runs the ids it holds (of the caller's institution, for institution admins)
+    for _ in each_shard():
+        run_verification_jobs(verification_ids, institution_id=_run_scope())
+    return jsonify({"message": f"{len(verification_ids)} verifications executed."}), 200
+
+
 # ============================================================
 # Delete Verification
 # ============================================================
 @api.route('/verifications/<int:verification_id>', methods=['DELETE'])
 def delete_verification(verification_id):
+    scope_to_row(Verification, verification_id)
     ver = Verification.query.get_or_404(verification_id)
     db.session.delete(ver)
     db.session.commit()
@@ -161,7 +314,14 @@ def view_verification(verification_id):
         flash("Unauthorized access.", "error")
         return redirect(url_for("api.login"))
 
-    ver = Verification.query.get_or_404(verification_id)
+    scope_to_row(Verification, verification_id) or scope_to_row(ArchivedVerification, verification_id)
+    ver = db.session.get(Verification, verification_id)
+    # resolved long ago: read it back from the archive files (costs one extra read)
+    archived = ver is None
+    if archived:
+        ver = archived_verification(verification_id)
+        if ver is None:
+            abort(404)
     cert = Certificate.query.get(ver.certificate_id)
 
     if not cert:
@@ -172,18 +332,23 @@ def view_verification(verification_id):
         flash("You do not have permission to verify this certificate.", "error")
         return redirect(url_for("api.index"))
 
+    if request.method == "POST" and archived:
+        flash("This verification was archived and can no longer be changed.", "error")
+        return redirect(url_for("api.view_verification", verification_id=verification_id))
+
     if request.method == "POST":
         action = request.form.get("action")
 
+        # the answer also applies to every identical request waiting on the same task
         if action == "valid":
-            ver.status = "valid"
-            ver.result_json = '{"verified": true}'
+            resolve_verification(ver, "valid", '{"verified": true}')
             cert.verified = True
         elif action == "invalid":
-            ver.status = "invalid"
-            ver.result_json = '{"verified": false}'
-
-        ver.verified_at = datetime.utcnow()
+            resolve_verification(ver, "invalid", '{"verified": false}')
+            cert.verified = False
+            revoke_credentials(cert.certificate_id, reason="invalid")
+        else:
+            ver.verified_at = datetime.utcnow()
         db.session.commit()
 
         return render_template("verification_success.html", verification=ver)
@@ -192,39 +357,127 @@ def view_verification(verification_id):
         "verify_certificate.html",
         verification=ver,
         certificate=cert,
-        user=user
+        user=user,
+        archived=archived
     )
 
 
+# ============================================================
+# Download the File Uploaded with a Verification
+# ============================================================
+@api.route('/verifications/<int:verification_id>/file', methods=['GET'])
+@login_required
+def download_verification_file(verification_id):
+    """Serves the upload from disk, or from the uploads archive once it was moved there."""
+    scope_to_row(Verification, verification_id) or scope_to_row(ArchivedVerification, verification_id)
+    ver = db.session.get(Verification, verification_id) or archived_verification(verification_id)
+    if ver is None:
+        abort(404)
+
+    # the institution answering it, whoever requested it, and gov/super admins
+    cert = db.session.get(Certificate, ver.certificate_id) if ver.certificate_id else None
+    allowed = (
+        session.get("role") in ("gov_admin", "super_admin")
+        or ver.requested_by == session["user_id"]
+        or (cert is not None and cert.institution_id == session.get("institution_id"))
+    )
+    if not allowed:
+        abort(403)
+
+    if not ver.verification_file:
+        return jsonify({"error": "This verification has no file attached"}), 404
+    if os.path.isfile(ver.verification_file):
+        return send_file(ver.verification_file, as_attachment=True)
+
+    archived = read_archived_upload(ver.verification_file)
+    if archived is None:
+        return jsonify({"error": "File not found on server"}), 404
+    name, data = archived
+    return send_file(io.BytesIO(data), download_name=name, as_attachment=True)
+
+
 # ============================================================
 # View Verification Page (Form + Institutions)
 # ============================================================
 @api.route('/verifications', endpoint="verifications_page")
 def view_verifications():
-    institutions = Institution.query.all()
-    print(institutions)
-    return render_template(
-        "verifications.html",
-        institutions=institutions
+    generation, institutions = institution_list()
+    return conditional_response(
+        make_etag(generation, per_user=True),
+        lambda: render_template("verifications.html", institutions=institutions["rows"]),
+        private=True,
     )
 
 @api.route('/institutions/json')
 def institutions_json():
-    institutions = Institution.query.all()
-    return jsonify([
-        {"id": inst.institution_id, "name": inst.institution_name, "email": inst.contact_email}
-        for inst in institutions
-    ])
+    generation, institutions = institution_list()
+    return conditional_response(
+        make_etag(generation),
+        lambda: current_app.response_class(institutions["json"], mimetype="application/json"),
+    )
+
+# ============================================================
+# Student Number Lookup (Bloom filter fast path)
+# ============================================================
+@api.route('/verifications/lookup', methods=['GET'])
+def lookup_student_number():
+    institution_id = request.args.get('institution_id', type=int)
+    student_number = request.args.get('student_number', '').strip()
+
+    if not institution_id or not student_number:
+        return jsonify({"error": "institution_id and student_number are required"}), 400
+
+    # Definite misses are answered from the shared Bloom filter without a query;
+    # the endpoint is public, so it only says whether the record exists
+    result = lookup_student_numbers(institution_id, [student_number])[student_number]
+    return jsonify({"student_number": student_number, **public_lookup_result(result)}), 200
+
+
+@api.route('/verifications/lookup/stats', methods=['GET'])
+@require_roles("gov_admin", "super_admin")
+def lookup_filter_stats():
+    return jsonify(bloom_filter_stats()), 200
+
+
+# ============================================================
+# List Verifications (JSON, fast serializer)
+# ============================================================
+@api.route('/verifications/json', methods=['GET'])
+@login_required
+def verifications_json():
+    institution_id = request.args.get("institution_id", type=int)
+    status = request.args.get("status")
+
+    # Institution staff only ever see their own institution
+    if session.get("role") in ("institution_admin", "hr"):
+        user = User.query.get(session["user_id"])
+        institution_id = user.institution_id if user else -1
+
+    stmt = verification_serializer.select().order_by(Verification.verification_id)
+    if institution_id is not None:
+        stmt = stmt.where(Verification.verified_by_institution_id == institution_id)
+        scope_to_institution(institution_id)
+    if status:
+        stmt = stmt.where(Verification.status == status)
+
+    if institution_id is None and sharding_enabled():
+        return verification_serializer.response_across_shards(stmt, "verification_id")
+    return verification_serializer.response(stmt)
+
 
 # ============================================================
 # Send Reminder Email
 # ============================================================
 @api.route('/verifications/remind/<int:verification_id>', methods=['POST'])
 def send_verification_reminder(verification_id):
+    scope_to_row(Verification, verification_id)
     ver = Verification.query.get_or_404(verification_id)
     cert = Certificate.query.get_or_404(ver.certificate_id)
     inst = Institution.query.get_or_404(ver.verified_by_institution_id)
 
+    if not reminder_due(ver):
+        return jsonify({"message": "A reminder was already sent recently.", "status": "info"}), 429
+
     # Build verification link
     verification_url = url_for(
         "api.view_verification",
@@ -234,7 +487,7 @@ def send_verification_reminder(verification_id):
 
     # Send reminder email
     if inst.contact_email:
-        send_email(
+        delivered = send_email(
             to=inst.contact_email,
             subject="Reminder: Certificate Verification Pending",
             body=f"""
@@ -247,5 +500,9 @@ def send_verification_reminder(verification_id):
             <a href="{verification_url}">Click here to verify</a>
             """
         )
+        if not delivered:
+            return jsonify({"message": "The reminder email could not be sent.", "status": "error"}), 502
+        mark_reminded(ver)
+        db.session.commit()
 
     return jsonify({"message": "Reminder sent successfully!"}), 200
@@ -2,7 +2,10 @@ from flask import redirect, request, url_for, session, flash, render_template
 from .init import api
 from .helpers import login_required
 from models import Institution, User, Certificate, Verification
+from sqlalchemy import select
 from schema.schemas import UserSchema 
+from utils.http_cache import institution_list, make_etag, conditional_response
+from utils.streaming import page_args, keyset_page, stream_page
 
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
@@ -25,8 +28,12 @@ def index():
 @api.route('/institutions/view')
 @login_required
 def view_institutions():
-    items = Institution.query.all()
-    return render_template('institutions.html', institutions=items)
+    generation, institutions = institution_list()
+    return conditional_response(
+        make_etag(generation, per_user=True),
+        lambda: render_template('institutions.html', institutions=institutions["rows"]),
+        private=True,
+    )
 
 @api.route("/users/view", methods=["GET"])
 @login_required
@@ -46,15 +53,30 @@ def view_users():
 @api.route('/certificates/view')
 @login_required
 def view_certificates():
-    certificates = Certificate.query.all()
-    if not certificates:
-        flash("No certificates available.", "info")
-    return render_template('certificates.html', certificates=certificates)
+    after, before, per_page = page_args()
+    stmt = select(
+        Certificate.certificate_id, Certificate.student_name, Certificate.graduation_year,
+        Certificate.verified, Certificate.certificate_file, Certificate.institution_id,
+    )
 
+    # names come from the cached institution list rather than a join (institutions may sit in another database)
+    page = keyset_page(stmt, Certificate.certificate_id, after, before, per_page)
+    return stream_page('certificates.html', certificates=page, page=page,
+                       institution_names=institution_list()[1]["names"])
 
-@api.route('/verifications/view')
+
+@api.route('/verifications/view', endpoint="verification_list")
 @login_required
-def view_verifications():
-    items = Verification.query.all()
-    return render_template('verifications.html', verifications=items)
+def view_verification_list():
+    after, before, per_page = page_args()
+    stmt = select(
+        Verification.verification_id, Verification.status, Verification.method,
+        Verification.requested_at, Verification.verified_at,
+        Certificate.certificate_id, Certificate.student_name, Certificate.course_name,
+        Verification.verified_by_institution_id,
+    ).outerjoin(Certificate, Verification.certificate_id == Certificate.certificate_id)
+
+    page = keyset_page(stmt, Verification.verification_id, after, before, per_page)
+    return stream_page('verification_list.html', verifications=page, page=page,
+                       institution_names=institution_list()[1]["names"])
 
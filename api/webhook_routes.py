@@ -0,0 +1,63 @@
+from flask import current_app, request, jsonify, session
+
+from .init import api
+from .helpers import login_required
+from models import db, WebhookEndpoint
+from utils.roles import require_roles
+from utils.webhooks import generate_webhook_secret, delivery_stats, url_error
+from utils.idempotency import idempotent
+
+
+def _endpoint_json(endpoint):
+    return {
+        "endpoint_id": endpoint.endpoint_id,
+        "url": endpoint.url,
+        "is_active": endpoint.is_active,
+        "created_at": endpoint.created_at.isoformat() if endpoint.created_at else None,
+    }
+
+
+# ============================================================
+# Register Webhook (secret is returned once)
+# ============================================================
+@api.route('/webhooks', methods=['POST'])
+@login_required
+@idempotent
+def create_webhook():
+    url = ((request.get_json(silent=True) or {}).get("url") or request.form.get("url") or "").strip()
+    error = url_error(url, current_app.config["WEBHOOK_ALLOW_PRIVATE_URLS"])
+    if error:
+        return jsonify({"error": error}), 400
+
+    endpoint = WebhookEndpoint(user_id=session["user_id"], url=url, secret=generate_webhook_secret())
+    db.session.add(endpoint)
+    db.session.commit()
+
+    return jsonify({**_endpoint_json(endpoint), "secret": endpoint.secret}), 201
+
+
+@api.route('/webhooks', methods=['GET'])
+@login_required
+def list_webhooks():
+    endpoints = WebhookEndpoint.query.filter_by(user_id=session["user_id"]).order_by(WebhookEndpoint.endpoint_id)
+    return jsonify([_endpoint_json(endpoint) for endpoint in endpoints]), 200
+
+
+@api.route('/webhooks/<int:id>', methods=['DELETE'])
+@login_required
+def delete_webhook(id):
+    endpoint = WebhookEndpoint.query.filter_by(endpoint_id=id, user_id=session["user_id"]).first_or_404()
+    # keep the row so queued deliveries stay traceable; the worker skips inactive endpoints
+    endpoint.is_active = False
+    db.session.commit()
+    return '', 204
+
+
+# ============================================================
+# Delivery Metrics
+# ============================================================
+@api.route('/webhooks/stats', methods=['GET'])
+@login_required
+@require_roles("gov_admin", "super_admin")
+def webhook_stats():
+    return jsonify(delivery_stats(request.args.get("window_minutes", 60, type=int))), 200
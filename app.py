@@ -1,12 +1,35 @@
+import os
+
+import click
 from flask import Flask
-from flask_migrate import Migrate     # ← Add this
+
 from models import db
-from api.views import api
-from schema.schemas import ma
 from config import Config
-import os 
+from utils import db_routing, sharding, tracing
+
+
+class LazyMigrateCommands(click.Group):
+    """
+    `flask db ...` without importing Flask-Migrate and alembic (~0.35 s) until
+    a db command is actually used, so web workers and scripts never pay for it.
+    """
+
+    def __init__(self, app):
+        super().__init__("db", help="Perform database migrations.")
+        self.app = app
+
+    def _commands(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_cli_group
+
+        if "migrate" not in self.app.extensions:
+            Migrate(self.app, db)
+        return db_cli_group
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        # hand parsing and invocation over to the real Flask-Migrate group
+        return self._commands().make_context(info_name, args, parent=parent, **extra)
 
-migrate = Migrate()  # ← Create migrate instance
 
 def create_app():
     app = Flask(__name__)
@@ -16,10 +39,46 @@ def create_app():
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
 
+    from schema.schemas import ma
+    from utils import live_updates, compression
+
+    db_routing.init_app(app)
+    live_updates.configure(app.config)
     db.init_app(app)
+    sharding.init_app(app)
+    tracing.init_app(app)
     ma.init_app(app)
-    migrate.init_app(app, db)
+    app.cli.add_command(LazyMigrateCommands(app))
+
+    # Route modules are imported with the blueprint, i.e. only by apps that serve HTTP
+    from api.init import api
     app.register_blueprint(api)
+    compression.init_app(app)
 
     return app
 
+
+def create_cli_app():
+    """Config and the model layer only; used by manage.py for admin commands."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    db_routing.init_app(app)
+    db.init_app(app)
+    sharding.init_app(app)
+
+    # keep rollups, caches and outbox in step with writes made from the CLI
+    import utils.model_events  # noqa: F401
+
+    return app
+
+
+def create_asgi_app():
+    """The public verification and lookup endpoints on the asyncio engine; served by asgi.py."""
+    from api.public_asgi import PublicLookupApp
+
+    app = create_cli_app()
+    if app.config["SQLALCHEMY_SHARD_URIS"]:
+        # one asyncio engine per database; serve these routes from the Flask app instead
+        raise RuntimeError("The ASGI lookup app does not support DATABASE_SHARD_URLS")
+    return PublicLookupApp(app)
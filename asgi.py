@@ -0,0 +1,4 @@
+from app import create_asgi_app
+
+# uvicorn asgi:app
+app = create_asgi_app()
@@ -0,0 +1,153 @@
+"""
+Public lookup endpoints under concurrency: the WSGI app under gunicorn
+(gunicorn.conf.py, gthread) against the ASGI app (asgi.py) under uvicorn.
+Each server gets the same bearer-token /api/v1/verify requests from an
+increasing number of concurrent clients; reports throughput, latency and
+failed requests (including 60 s timeouts) per level. Needs uvicorn and
+the async driver for the database (aiosqlite for the default scratch
+SQLite database). Set DATABASE_URL to run against PostgreSQL/MySQL, where
+queries involve real network waits.
+
+    python benchmarks/asgi_bench.py [requests per level] [concurrency levels...]
+"""
+import asyncio
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+scratch = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(scratch, 'asgi.db')}")
+os.environ["BLOOM_FILTER_FOLDER"] = os.path.join(scratch, "bloom")
+
+from app import create_cli_app
+from models import db, Certificate, Institution
+from utils.api_tokens import generate_api_token
+
+CERTIFICATES = 20000
+PORT = 8766
+
+SERVERS = {  # label -> (command, extra environment)
+    "gunicorn gthread, 1 x 4 threads": ([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                                         "-b", f"127.0.0.1:{PORT}"], {"GUNICORN_WORKERS": "1"}),
+    "gunicorn gthread, default": ([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                                   "-b", f"127.0.0.1:{PORT}"], {}),
+    "uvicorn asgi:app, 1 process": ([sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(PORT),
+                                     "--log-level", "warning", "--backlog", "4096"], {}),
+}
+
+
+def seed():
+    app = create_cli_app()
+    token, digest = generate_api_token()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Institution.__table__.insert(), [
+            {"institution_id": 1, "institution_name": "Institution 1", "api_token_hash": digest}
+        ])
+        db.session.execute(Certificate.__table__.insert(), [
+            {"certificate_id": i, "student_name": f"Student {i}", "student_number": f"S{i:06d}",
+             "course_name": "BSc Computer Science", "graduation_year": 2000 + i % 25, "institution_id": 1,
+             "verified": i % 2 == 0}
+            for i in range(1, CERTIFICATES + 1)
+        ])
+        db.session.commit()
+    return token
+
+
+async def post(reader, writer, path, headers, body):
+    """One HTTP/1.1 request on a kept-alive connection; returns the status code."""
+    head = f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(f"{head}Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    status_line, *lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length:"))
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def wait_until_up(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", PORT)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+async def run_level(token, requests, concurrency):
+    """concurrency clients, each on its own kept-alive connection (a lean client, so the server is measured)."""
+    headers = {"Authorization": f"Bearer {token}"}
+    timings, failed = [], 0
+    pending = iter(range(requests))
+
+    async def attempt(connection, body):
+        connection = connection or await asyncio.open_connection("127.0.0.1", PORT)
+        return connection, await asyncio.wait_for(post(*connection, "/api/v1/verify", headers, body), 60) == 200
+
+    async def client_loop():
+        nonlocal failed
+        connection = None
+        for i in pending:
+            body = f'{{"student_number": "S{1 + i * 7919 % CERTIFICATES:06d}"}}'.encode()
+            start = time.perf_counter()
+            try:
+                try:
+                    connection, ok = await attempt(connection, body)
+                except (ConnectionResetError, asyncio.IncompleteReadError):
+                    if connection is None:
+                        raise
+                    # a recycled worker closed the kept-alive connection; retry once, like browsers and proxies
+                    connection[1].close()
+                    connection, ok = await attempt(None, body)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, StopIteration, ValueError):
+                ok = False
+                if connection:
+                    connection[1].close()
+                connection = None
+            timings.append(time.perf_counter() - start)
+            failed += not ok
+        if connection:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    return requests / elapsed, statistics.median(timings), timings[int(len(timings) * 0.99)], failed
+
+
+def main(requests, levels):
+    token = seed()
+    env = dict(os.environ, COMPRESS_ENABLED="false", GUNICORN_ACCESS_LOG="", API_TOKEN_QUOTA_PER_MINUTE="100000000")
+
+    print(f"{requests:,} requests per level, {os.cpu_count()} CPU(s), {env['DATABASE_URL'].split(':')[0]}")
+    print(f"{'server':<32} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'failed':>7}")
+    for label, (command, extra_env) in SERVERS.items():
+        process = subprocess.Popen(command, cwd=ROOT, env={**env, **extra_env}, start_new_session=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            asyncio.run(wait_until_up())
+            for concurrency in levels:
+                rate, p50, p99, failed = asyncio.run(run_level(token, requests, concurrency))
+                print(f"{label:<32} {concurrency:>8} {rate:>8,.0f} {p50 * 1000:>8.1f} {p99 * 1000:>9.1f} {failed:>7}")
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+
+    shutil.rmtree(scratch)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+         [int(level) for level in sys.argv[2:]] or [10, 100, 1000])
@@ -0,0 +1,96 @@
+"""
+Response compression: bytes on the wire and server time per encoding for
+the main list endpoints and pages, plus an estimated transfer time on a
+slow link. Uses a scratch SQLite database.
+
+    python benchmarks/compression_bench.py [certificates] [link_mbit]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+
+from app import create_app
+from models import db, Certificate, Institution, User, Verification
+from utils.compression import brotli
+
+REPEAT = 5
+
+
+def seed(n):
+    db.session.execute(Institution.__table__.insert(), [
+        {"institution_id": i, "institution_name": f"Institution {i}", "address": f"{i} Main Road",
+         "contact_email": f"registrar{i}@example.ac.mw"}
+        for i in range(1, 51)
+    ])
+    db.session.execute(User.__table__.insert(), [
+        {"user_id": i, "username": f"user{i}", "full_name": f"User {i}", "email": f"user{i}@example.com",
+         "password_hash": "x", "role": "super_admin" if i == 1 else "hr", "institution_id": None if i == 1 else i % 50 + 1}
+        for i in range(1, 201)
+    ])
+    db.session.execute(Certificate.__table__.insert(), [
+        {"certificate_id": i, "student_name": f"Student {i}", "student_number": f"STU{i:07d}",
+         "course_name": "BSc Computer Science", "graduation_year": 2020 + i % 6, "institution_id": i % 50 + 1,
+         "uploaded_at": datetime(2026, 1, 1)}
+        for i in range(1, n + 1)
+    ])
+    db.session.execute(Verification.__table__.insert(), [
+        {"verification_id": i, "certificate_id": i, "verified_by_institution_id": 2, "status": "pending",
+         "method": "manual_form", "requested_at": datetime(2026, 1, 1)}
+        for i in range(1, min(n, 500) + 1)
+    ])
+    db.session.commit()
+
+
+def measure(client, path, encoding):
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        body = response.get_data()
+        timings.append(time.perf_counter() - start)
+    return len(body), sorted(timings)[REPEAT // 2], response.headers.get("Content-Encoding", "identity")
+
+
+def main(n, link_mbit):
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(n)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, username="user1", role="super_admin")
+    dashboard = app.test_client()
+    with dashboard.session_transaction() as session:
+        session.update(user_id=3, username="user3", role="hr")
+
+    encodings = [None, "gzip"] + (["br"] if brotli else [])
+    bytes_per_second = link_mbit * 1_000_000 / 8
+    print(f"{n:,} certificates, median of {REPEAT}, transfer estimated at {link_mbit} Mbit/s"
+          + ("" if brotli else " (brotli not installed)"))
+    print(f"{'path':<24} {'encoding':<9} {'bytes':>10} {'ratio':>6} {'server ms':>10} {'total ms':>9}")
+
+    for c, path in ((client, "/certificates"), (client, "/institutions/json"), (client, "/users/view"),
+                    (client, "/certificates/view"), (dashboard, "/institution/dashboard"),
+                    (client, "/static/user.js")):
+        baseline = None
+        for encoding in encodings:
+            size, server, used = measure(c, path, encoding)
+            baseline = baseline or size
+            total = server + size / bytes_per_second
+            print(f"{path:<24} {used:<9} {size:>10,} {size / baseline:>6.2f} {server * 1000:>10.1f} {total * 1000:>9.1f}")
+
+    os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 10)
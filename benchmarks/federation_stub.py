@@ -0,0 +1,93 @@
+"""
+Local stub institution APIs for exercising the federation client.
+
+Starts three servers on localhost - fast, slow (sleeps longer than the
+timeout) and failing (HTTP 503) - then fires concurrent lookups at them and
+prints the merged results, retry counts and circuit breaker states.
+
+    python benchmarks/federation_stub.py [lookups_per_institution]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from utils.federation import FederationClient
+
+
+def make_handler(delay=0.0, status=200):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+            time.sleep(delay)
+            body = json.dumps({
+                "found": True,
+                "verified": payload.get("student_number", "").endswith("0"),
+            }).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # the client gave up on the slow institution (timeout)
+
+
+def start(handler):
+    server = QuietServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/verify"
+
+
+def main(n):
+    config = {key: getattr(Config, key) for key in dir(Config) if key.startswith("FEDERATION_")}
+    config.update(FEDERATION_TIMEOUT_SECONDS=0.5, FEDERATION_RETRIES=2, FEDERATION_BACKOFF_SECONDS=0.05,
+                  FEDERATION_BREAKER_FAILURES=3)
+
+    institutions = {
+        1: ("fast", start(make_handler())),
+        2: ("slow", start(make_handler(delay=1.0))),
+        3: ("failing", start(make_handler(status=503))),
+        4: ("rejecting", start(make_handler(status=400))),
+    }
+    client = FederationClient(config)
+
+    for round_no in (1, 2):
+        queries = [
+            (inst_id, url, {"student_number": f"STU{i:04d}"})
+            for inst_id, (_, url) in institutions.items()
+            for i in range(n)
+        ]
+        start_time = time.perf_counter()
+        results = client.lookup_many(queries)
+        elapsed = time.perf_counter() - start_time
+
+        print(f"round {round_no}: {len(queries)} lookups in {elapsed * 1000:.0f} ms")
+        for inst_id, (name, _) in institutions.items():
+            statuses = {}
+            for result in results:
+                if result["institution_id"] == inst_id:
+                    key = result["status"] + (" (cached)" if result.get("cached") else "")
+                    statuses[key] = statuses.get(key, 0) + 1
+            print(f"  {name:<9} {statuses}  breaker={client.breaker(inst_id).state}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
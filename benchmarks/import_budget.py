@@ -0,0 +1,88 @@
+"""
+Startup import budget. Runs the CLI app and the web app factory in fresh
+interpreters under `python -X importtime` and prints the total import time
+and the heaviest top-level imports.
+
+It exits non-zero, so it can run as a CI check, in two cases. First, when
+a scenario imports a module it must not load: the CLI must stay off
+routes, marshmallow, alembic and httpx, and the web app off alembic and
+httpx. Second, when an optional millisecond budget is exceeded. Timings
+vary between machines; the module rules do not.
+
+    python benchmarks/import_budget.py [--cli-budget-ms N] [--web-budget-ms N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "cli": "from app import create_cli_app; import manage; create_cli_app()",
+    "web": "from app import create_app; create_app()",
+}
+
+FORBIDDEN = {
+    "cli": ("api", "schema", "marshmallow", "flask_marshmallow", "flask_migrate", "alembic", "httpx"),
+    "web": ("flask_migrate", "alembic", "httpx"),
+}
+
+
+def profile(code, runs=3):
+    """Best of `runs`: (total import ms, wall ms, top-level [(cumulative ms, module)], all module names)."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        wall = (time.perf_counter() - start) * 1000
+
+        total, top, modules = 0, [], set()
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            total += int(self_us)
+            modules.add(name.strip())
+            if not name.startswith("  "):  # top-level import (no nesting indent)
+                top.append((int(cumulative_us) / 1000, name.strip()))
+
+        run = (total / 1000, wall, sorted(top, reverse=True), modules)
+        if best is None or run[0] < best[0]:
+            best = run
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cli-budget-ms", type=float)
+    parser.add_argument("--web-budget-ms", type=float)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    budgets = {"cli": args.cli_budget_ms, "web": args.web_budget_ms}
+    failures = []
+    for name, code in SCENARIOS.items():
+        total, wall, top, modules = profile(code)
+        budget = f" (budget {budgets[name]:.0f} ms)" if budgets[name] else ""
+        print(f"{name}: imports {total:.0f} ms{budget}, process {wall:.0f} ms, {len(modules)} modules")
+        for cumulative, module in top[:args.top]:
+            print(f"    {cumulative:8.1f} ms  {module}")
+
+        loaded = sorted(m for m in modules if m.split(".")[0] in FORBIDDEN[name])
+        if loaded:
+            failures.append(f"{name} imports {', '.join(loaded)}")
+        if budgets[name] and total > budgets[name]:
+            failures.append(f"{name} import time {total:.0f} ms exceeds {budgets[name]:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Load test: the development server as run.py starts it (debug, reloader)
+against the gunicorn profile in gunicorn.conf.py, with and without
+preload_app. Each server is started on a scratch SQLite database and hit
+by concurrent keep-alive clients requesting the institution list, single
+certificates and the login page. Reports startup time, throughput,
+latency, errors, requests retried after a worker recycled its kept-alive
+connection, and the memory of the whole process tree (PSS, so pages
+shared copy-on-write between workers are counted once).
+
+    python benchmarks/load_test.py [requests] [concurrency]
+"""
+import http.client
+import os
+import random
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+scratch = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'load.db')}"
+os.environ["BLOOM_FILTER_FOLDER"] = os.path.join(scratch, "bloom")
+
+from app import create_cli_app
+from models import db, Certificate, Institution
+
+CERTIFICATES = 5000
+PORT = 8765
+
+GUNICORN = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{PORT}"]
+SERVERS = {  # label -> (command, extra environment)
+    "dev server (run.py)": ([sys.executable, "-c",
+                             f"from run import app; app.run(port={PORT}, debug=True, use_reloader=True)"], {}),
+    "gunicorn, preload": (GUNICORN, {}),
+    "gunicorn, no preload": (GUNICORN, {"GUNICORN_PRELOAD": "false"}),
+}
+
+
+def seed():
+    app = create_cli_app()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Institution.__table__.insert(), [
+            {"institution_id": i, "institution_name": f"Institution {i}", "contact_email": f"registry@inst{i}.ac.mw"}
+            for i in range(1, 21)
+        ])
+        db.session.execute(Certificate.__table__.insert(), [
+            {"certificate_id": i, "student_name": f"Student {i}", "student_number": f"S{i:06d}",
+             "course_name": "BSc Computer Science", "graduation_year": 2000 + i % 25, "institution_id": 1 + i % 20}
+            for i in range(1, CERTIFICATES + 1)
+        ])
+        db.session.commit()
+
+
+def get(connection, path):
+    connection.request("GET", path)
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def wait_until_up(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            get(http.client.HTTPConnection("127.0.0.1", PORT, timeout=5), "/login")
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def tree_pss_kb(pid):
+    """Proportional set size of pid and all its descendants."""
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/smaps_rollup") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+def load(requests, concurrency):
+    rng = random.Random(7)
+    paths = [rng.choice(("/institutions/json", f"/certificates/{rng.randint(1, CERTIFICATES)}", "/login"))
+             for _ in range(requests)]
+    timings, counts, lock = [], {"errors": 0, "retried": 0}, threading.Lock()
+
+    def client(share):
+        connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+        for path in share:
+            start = time.perf_counter()
+            retried = False
+            try:
+                try:
+                    ok = get(connection, path) == 200
+                except (ConnectionResetError, http.client.RemoteDisconnected):
+                    # a recycled worker closed the kept-alive connection; retry once, like browsers and proxies
+                    retried = True
+                    connection.close()
+                    ok = get(connection, path) == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+            elapsed = time.perf_counter() - start
+            with lock:
+                timings.append(elapsed)
+                counts["errors"] += not ok
+                counts["retried"] += retried
+
+    threads = [threading.Thread(target=client, args=(paths[i::concurrency],)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(timings), counts
+
+
+def main(requests, concurrency):
+    seed()
+    env = dict(os.environ, COMPRESS_ENABLED="false")
+
+    print(f"{requests:,} requests, {concurrency} concurrent clients, {os.cpu_count()} CPU(s)")
+    print(f"{'server':<22} {'start s':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'retried':>8} {'PSS MB':>8}")
+    for label, (command, extra_env) in SERVERS.items():
+        began = time.perf_counter()
+        process = subprocess.Popen(command, cwd=ROOT, env={**env, **extra_env}, start_new_session=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up()
+            startup = time.perf_counter() - began
+            load(min(requests, 200), concurrency)  # let every worker take its first requests
+            elapsed, timings, counts = load(requests, concurrency)
+            memory = tree_pss_kb(process.pid) / 1024
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+        print(f"{label:<22} {startup:>8.2f} {len(timings) / elapsed:>8,.0f} "
+              f"{statistics.median(timings) * 1000:>8.1f} {timings[int(len(timings) * 0.99)] * 1000:>8.1f} "
+              f"{counts['errors']:>7} {counts['retried']:>8} {memory:>8.1f}")
+
+    shutil.rmtree(scratch)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000, int(sys.argv[2]) if len(sys.argv) > 2 else 16)
@@ -0,0 +1,121 @@
+"""
+Matching throughput: builds certificate_match_keys for N certificates and
+times best_match() for requests that copy a record exactly, misspell the
+name, reorder it and reformat the student number, or describe nobody on
+file. Reports key build rate, per-request latency, and how often the
+request was linked to the right record, to a wrong one, or left unlinked
+(a new certificate). Uses a scratch SQLite database.
+
+    python benchmarks/matching_bench.py [certificates] [requests]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+
+from app import create_cli_app
+from models import db, Certificate, Institution
+from utils.matching import best_match, rebuild_match_keys
+
+FIRST = ("John Mary Peter Grace Joseph Esther James Ruth Daniel Agnes Moses Chikondi Thoko Kondwani "
+         "Tiwonge Mphatso Chisomo Limbani Takondwa Yamikani Blessings Patience Gift Memory Innocent "
+         "Chimwemwe Dalitso Madalitso Kettie Lusungu Wezi Tadala Chifundo Pemphero Thandiwe Alinafe").split()
+LAST = ("Banda Phiri Mwale Chirwa Nyirenda Mbewe Kumwenda Zulu Tembo Gondwe Msiska Kamanga Mkandawire "
+        "Chisale Moyo Mvula Kaunda Nkhoma Chavula Mhango Munthali Ngwira Kachingwe Mlenga Chimwaza "
+        "Lungu Sakala Jere Chiumia Mzumara Kalua Mussa Ndovi Chakwera Malenga Kapito Mponda Chipeta").split()
+COURSES = ("BSc Computer Science", "BA Economics", "BEd Mathematics", "BSc Nursing", "LLB Law",
+           "BCom Accounting", "BSc Agriculture", "BA Public Administration")
+INSTITUTIONS = 10
+
+
+def person(rng, i):
+    name = f"{rng.choice(FIRST)} {rng.choice(FIRST)} {rng.choice(LAST)}" if i % 4 == 0 else \
+        f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+    year = rng.randint(2000, 2025)
+    return {
+        "certificate_id": i, "student_name": name, "student_number": f"U{i % INSTITUTIONS}/{year}/{i:07d}",
+        "course_name": rng.choice(COURSES), "graduation_year": year, "institution_id": 1 + i % INSTITUTIONS,
+        "verified": True,
+    }
+
+
+def misspell(rng, name):
+    parts = name.split()
+    word = parts[-1]
+    k = rng.randrange(1, len(word))
+    parts[-1] = rng.choice((word[:k] + word[k + 1:], word[:k] + rng.choice("aeiou") + word[k + 1:]))
+    return " ".join(parts)
+
+
+def main(total, requests):
+    app = create_cli_app()
+    rng = random.Random(42)
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Institution.__table__.insert(), [
+            {"institution_id": i, "institution_name": f"Institution {i}"} for i in range(1, INSTITUTIONS + 1)
+        ])
+        records = {}
+        for start in range(1, total + 1, 50000):
+            chunk = [person(rng, i) for i in range(start, min(start + 50000, total + 1))]
+            db.session.execute(Certificate.__table__.insert(), chunk)
+            records.update((row["certificate_id"], row) for row in rng.sample(chunk, min(len(chunk), requests)))
+        db.session.commit()
+
+        start = time.perf_counter()
+        keys = rebuild_match_keys()
+        elapsed = time.perf_counter() - start
+        print(f"{total:,} certificates: {keys:,} match keys built in {elapsed:.1f} s "
+              f"({total / elapsed:,.0f} certificates/s)")
+
+        sample = rng.sample(sorted(records.values(), key=lambda row: row["certificate_id"]), requests)
+        variants = {
+            "exact copy": lambda row: row,
+            "misspelled name": lambda row: {**row, "student_name": misspell(rng, row["student_name"])},
+            "reordered, number reformatted": lambda row: {
+                **row, "student_name": " ".join(reversed(row["student_name"].split())).upper(),
+                "student_number": row["student_number"].replace("/", "-").lower(),
+            },
+            "name only, year off by one": lambda row: {
+                **row, "student_number": "", "graduation_year": row["graduation_year"] + 1,
+            },
+            "nobody on file": lambda row: {
+                **row, "student_name": misspell(rng, f"{rng.choice(FIRST)} {rng.choice(LAST)}"),
+                "student_number": f"X{rng.randrange(10**9)}",
+            },
+        }
+
+        print(f"{'request':<31} {'req/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'right':>7} {'wrong':>7} {'new':>7}")
+        for label, make in variants.items():
+            timings, right, wrong = [], 0, 0
+            for row in sample:
+                submitted = make(row)
+                args = (submitted["institution_id"], submitted["student_name"], submitted["student_number"],
+                        submitted["course_name"], submitted["graduation_year"])
+                begin = time.perf_counter()
+                match = best_match(*args)
+                timings.append(time.perf_counter() - begin)
+                if match is not None:
+                    if label != "nobody on file" and match.certificate_id == row["certificate_id"]:
+                        right += 1
+                    else:
+                        wrong += 1
+            timings.sort()
+            unlinked = len(sample) - right - wrong
+            print(f"{label:<31} {len(timings) / sum(timings):>8,.0f} {statistics.median(timings) * 1000:>7.2f} "
+                  f"{timings[int(len(timings) * 0.99)] * 1000:>7.2f} {right / len(sample):>7.1%} "
+                  f"{wrong / len(sample):>7.1%} {unlinked / len(sample):>7.1%}")
+
+    os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000, int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
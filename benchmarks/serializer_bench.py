@@ -0,0 +1,78 @@
+"""
+List serialization: marshmallow dump of ORM objects vs the generated
+Core-row serializer + orjson, on a scratch SQLite database.
+
+    python benchmarks/serializer_bench.py [rows]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+
+from app import create_app
+from models import db, Certificate, Verification
+from schema.schemas import CertificateSchema, VerificationSchema
+from schema.serializers import certificate_serializer, verification_serializer
+
+
+def timed(label, n, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {n / elapsed:12,.0f} rows/s")
+    return result
+
+
+def seed(n):
+    now = datetime(2026, 1, 1, 9, 30)
+    db.session.execute(Certificate.__table__.insert(), [
+        {"certificate_id": i, "student_name": f"Student {i}", "student_number": f"STU{i:07d}",
+         "course_name": "BSc Computer Science", "graduation_year": 2020 + i % 6, "institution_id": 1 + i % 20,
+         "verified": i % 3 == 0, "uploaded_at": now + timedelta(seconds=i)}
+        for i in range(1, n + 1)
+    ])
+    db.session.execute(Verification.__table__.insert(), [
+        {"verification_id": i, "certificate_id": i, "verified_by_institution_id": 1 + i % 20,
+         "status": "valid" if i % 2 else "pending", "method": "manual_form",
+         "requested_at": now + timedelta(seconds=i), "reminder_count": 0}
+        for i in range(1, n + 1)
+    ])
+    db.session.commit()
+
+
+def compare(name, model, schema_class, serializer, n):
+    print(name)
+    schema = schema_class(many=True)
+
+    def marshmallow_path():
+        return json.dumps(schema.dump(db.session.query(model).order_by(*serializer.columns[:1]).all())).encode()
+
+    def fast_path():
+        return serializer.dumps(serializer.select().order_by(*serializer.columns[:1]))
+
+    slow = timed("  ORM + marshmallow dump + json", n, marshmallow_path)
+    db.session.expunge_all()
+    fast = timed("  Core rows + generated + orjson", n, fast_path)
+    print(f"  identical output: {json.loads(slow) == json.loads(fast)}")
+
+
+def main(n):
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(n)
+        print(f"{n:,} rows")
+        compare("certificates", Certificate, CertificateSchema, certificate_serializer, n)
+        compare("verifications", Verification, VerificationSchema, verification_serializer, n)
+    os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,90 @@
+"""
+Certificate list page: time to first byte, total time and peak Python
+memory for the old render (query.all() + render_template) vs the streamed
+keyset page, as the table grows. Uses a scratch SQLite database.
+
+    python benchmarks/streaming_bench.py [sizes...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+os.environ["COMPRESS_ENABLED"] = "false"
+
+from flask import render_template
+
+from app import create_app
+from models import db, Certificate, Institution
+
+
+def grow(total, start):
+    db.session.execute(Certificate.__table__.insert(), [
+        {"certificate_id": i, "student_name": f"Student {i}", "graduation_year": 2020 + i % 6,
+         "institution_id": 1 + i % 10, "verified": i % 2 == 0, "uploaded_at": datetime(2026, 1, 1)}
+        for i in range(start + 1, total + 1)
+    ])
+    db.session.commit()
+
+
+def measure(client, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first = time.perf_counter() - start
+    size += sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    response.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak, size
+
+
+def main(sizes):
+    app = create_app()
+
+    # the pre-streaming implementation, kept here for comparison
+    @app.route("/bench/certificates-all")
+    def certificates_all():
+        return render_template("certificates.html", certificates=Certificate.query.all(), page=None)
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Institution.__table__.insert(), [
+            {"institution_id": i, "institution_name": f"Institution {i}"} for i in range(1, 11)
+        ])
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, username="bench", role="super_admin")
+
+    print(f"{'rows':>8} {'variant':<26} {'TTFB ms':>9} {'total ms':>9} {'peak MB':>8} {'bytes':>12}")
+    rows = 0
+    for n in sizes:
+        with app.app_context():
+            grow(n, rows)
+        rows = n
+        middle = n // 2
+        for label, path in (
+            ("all() + render_template", "/bench/certificates-all"),
+            ("streamed, first page", "/certificates/view"),
+            ("streamed, middle page", f"/certificates/view?after={middle}"),
+            ("streamed, 5000 rows", f"/certificates/view?after={middle}&per_page=5000"),
+        ):
+            first, total, peak, size = measure(client, path)
+            print(f"{n:>8,} {label:<26} {first * 1000:>9.1f} {total * 1000:>9.1f} {peak / 2**20:>8.1f} {size:>12,}")
+
+    os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 50000, 200000])
@@ -6,6 +6,138 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'super-secret'
 
+    # Read replicas (comma separated URIs); empty means everything uses the primary
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+    # Seconds a client keeps reading from the primary after it wrote something
+    SQLALCHEMY_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5))
+
+    # Per-institution shards (comma separated name=URI); empty means one database (see utils/sharding.py)
+    SQLALCHEMY_SHARD_URIS = dict(
+        entry.strip().split('=', 1) for entry in os.environ.get('DATABASE_SHARD_URLS', '').split(',') if entry.strip()
+    )
+    SHARD_ID_STRIDE = int(os.environ.get('SHARD_ID_STRIDE', 64))  # most shards ever; new ids on a shard step by this
+    SHARD_FANOUT_WORKERS = int(os.environ.get('SHARD_FANOUT_WORKERS', 8))  # shards queried at once by admin views
+
+    # Signed certificate credentials (HMAC-SHA256)
+    CREDENTIAL_SECRET_KEY = os.environ.get('CREDENTIAL_SECRET_KEY') or SECRET_KEY
+    CREDENTIAL_REVOCATION_REFRESH_SECONDS = int(os.environ.get('CREDENTIAL_REVOCATION_REFRESH_SECONDS', 60))
+
+    # Maximum number of certificates hashed into one Merkle batch
+    MERKLE_BATCH_SIZE = int(os.environ.get('MERKLE_BATCH_SIZE', 100000))
+
+    # Bloom filters for instant not_found answers on student number lookups
+    BLOOM_FILTER_ENABLED = os.environ.get('BLOOM_FILTER_ENABLED', 'true').lower() == 'true'
+    BLOOM_FILTER_FOLDER = os.environ.get('BLOOM_FILTER_FOLDER')  # defaults to instance/bloom
+    BLOOM_FILTER_FALSE_POSITIVE_RATE = float(os.environ.get('BLOOM_FILTER_FALSE_POSITIVE_RATE', 0.01))
+    BLOOM_FILTER_MIN_CAPACITY = int(os.environ.get('BLOOM_FILTER_MIN_CAPACITY', 10000))
+    BLOOM_FILTER_REBUILD_DELETED_RATIO = float(os.environ.get('BLOOM_FILTER_REBUILD_DELETED_RATIO', 0.2))
+
+    # Bearer token API
+    # per-process cache: a rotated or deactivated token keeps working in other workers for up to this long
+    API_TOKEN_CACHE_SECONDS = int(os.environ.get('API_TOKEN_CACHE_SECONDS', 60))
+    API_TOKEN_QUOTA_PER_MINUTE = int(os.environ.get('API_TOKEN_QUOTA_PER_MINUTE', 600))
+    API_BATCH_MAX_SIZE = 1000
+
+    # Federated lookups against Institution.api_url
+    FEDERATION_ENABLED = os.environ.get('FEDERATION_ENABLED', 'false').lower() == 'true'
+    FEDERATION_TIMEOUT_SECONDS = float(os.environ.get('FEDERATION_TIMEOUT_SECONDS', 5))
+    FEDERATION_RETRIES = int(os.environ.get('FEDERATION_RETRIES', 2))
+    FEDERATION_BACKOFF_SECONDS = float(os.environ.get('FEDERATION_BACKOFF_SECONDS', 0.2))
+    FEDERATION_MAX_CONNECTIONS = int(os.environ.get('FEDERATION_MAX_CONNECTIONS', 100))
+    FEDERATION_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('FEDERATION_MAX_CONNECTIONS_PER_HOST', 10))
+    FEDERATION_BREAKER_FAILURES = int(os.environ.get('FEDERATION_BREAKER_FAILURES', 5))
+    FEDERATION_BREAKER_RESET_SECONDS = float(os.environ.get('FEDERATION_BREAKER_RESET_SECONDS', 30))
+    FEDERATION_CACHE_SECONDS = float(os.environ.get('FEDERATION_CACHE_SECONDS', 300))
+    FEDERATION_CACHE_SIZE = int(os.environ.get('FEDERATION_CACHE_SIZE', 10000))  # answers kept per process, least recently used evicted
+
+    # Webhook delivery (see `manage.py webhook-worker`)
+    WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 8))
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 100))
+    WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 8))
+    WEBHOOK_BACKOFF_SECONDS = float(os.environ.get('WEBHOOK_BACKOFF_SECONDS', 30))
+    WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get('WEBHOOK_TIMEOUT_SECONDS', 10))
+    WEBHOOK_POLL_SECONDS = float(os.environ.get('WEBHOOK_POLL_SECONDS', 2))
+    WEBHOOK_ALLOW_PRIVATE_URLS = os.environ.get('WEBHOOK_ALLOW_PRIVATE_URLS', 'false').lower() == 'true'  # local development only
+
+    # Pending verification reminders (see `manage.py reminder-sweeper`)
+    APP_BASE_URL = os.environ.get('APP_BASE_URL', 'http://localhost:5000')  # for links in emails sent outside a request
+    REMINDER_SLA_HOURS = float(os.environ.get('REMINDER_SLA_HOURS', 72))
+    REMINDER_INTERVAL_HOURS = float(os.environ.get('REMINDER_INTERVAL_HOURS', 24))
+    REMINDER_MAX_COUNT = int(os.environ.get('REMINDER_MAX_COUNT', 5))
+    REMINDER_SWEEP_MINUTES = float(os.environ.get('REMINDER_SWEEP_MINUTES', 60))
+
+    # HTTP caching of the institution list (ETag + generation counter)
+    INSTITUTION_CACHE_CHECK_SECONDS = float(os.environ.get('INSTITUTION_CACHE_CHECK_SECONDS', 2))  # how often other workers' changes are picked up
+    INSTITUTION_CACHE_MAX_AGE = int(os.environ.get('INSTITUTION_CACHE_MAX_AGE', 0))  # 0 = browsers revalidate every time
+
+    # Live dashboard updates (Server-Sent Events)
+    LIVE_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_HEARTBEAT_SECONDS', 25))
+    LIVE_QUEUE_SIZE = int(os.environ.get('LIVE_QUEUE_SIZE', 200))  # slow clients are dropped and reconnect
+    LIVE_BACKLOG_SIZE = int(os.environ.get('LIVE_BACKLOG_SIZE', 100))  # replayed on reconnect via Last-Event-ID
+    LIVE_POLL_SECONDS = float(os.environ.get('LIVE_POLL_SECONDS', 1))  # how often each worker reads other workers' events
+    LIVE_EVENT_RETENTION_SECONDS = int(os.environ.get('LIVE_EVENT_RETENTION_SECONDS', 3600))
+    LIVE_MAX_STREAMS = int(os.environ.get('LIVE_MAX_STREAMS', 0))  # open streams per worker, 0 = no limit (gunicorn.conf.py sets it for gthread)
+
+    # Password reset / invitation links (see `manage.py sweep-reset-tokens`)
+    PASSWORD_RESET_MAX_AGE_SECONDS = int(os.environ.get('PASSWORD_RESET_MAX_AGE_SECONDS', 24 * 3600))  # upper bound for any link
+    PASSWORD_RESET_SWEEP_CHUNK = int(os.environ.get('PASSWORD_RESET_SWEEP_CHUNK', 1000))
+    PASSWORD_RESET_SWEEP_MINUTES = float(os.environ.get('PASSWORD_RESET_SWEEP_MINUTES', 60))
+
+    # Matching verification requests to existing certificates (see utils/matching.py)
+    MATCH_ENABLED = os.environ.get('MATCH_ENABLED', 'true').lower() == 'true'
+    MATCH_LINK_THRESHOLD = float(os.environ.get('MATCH_LINK_THRESHOLD', 0.85))  # link instead of creating a new certificate
+    MATCH_AMBIGUITY_MARGIN = float(os.environ.get('MATCH_AMBIGUITY_MARGIN', 0.05))  # no link if the runner-up scores this close
+    MATCH_COURSE_AGREEMENT = float(os.environ.get('MATCH_COURSE_AGREEMENT', 0.8))  # fuzzy links need this course similarity and the same year
+    MATCH_MAX_POSTINGS = int(os.environ.get('MATCH_MAX_POSTINGS', 100))  # keys shared by more certificates are ignored
+    MATCH_CANDIDATES = int(os.environ.get('MATCH_CANDIDATES', 20))  # scored field by field per request
+
+    # Idempotency-Key handling (see utils/idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 3600))  # how long responses are replayed
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 30))  # copies wait this long for the first request
+    IDEMPOTENCY_POLL_SECONDS = float(os.environ.get('IDEMPOTENCY_POLL_SECONDS', 0.1))  # polling interval across processes
+    IDEMPOTENCY_PURGE_CHUNK = int(os.environ.get('IDEMPOTENCY_PURGE_CHUNK', 1000))
+
+    # ASGI app for the public lookup endpoints (see asgi.py); the URL defaults to DATABASE_URL with an async driver
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 20))
+    ASYNC_DB_MAX_OVERFLOW = int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 10))
+    ASYNC_DB_POOL_TIMEOUT = float(os.environ.get('ASYNC_DB_POOL_TIMEOUT', 30))  # requests queue this long for a connection
+
+    # Cold storage of resolved verifications (see `manage.py archive-verifications`)
+    ARCHIVE_FOLDER = os.environ.get('ARCHIVE_FOLDER')  # defaults to instance/archive
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 12))  # resolved before the start of the month this many months ago
+    ARCHIVE_CHUNK_SIZE = int(os.environ.get('ARCHIVE_CHUNK_SIZE', 500))  # verifications per gzip member and transaction
+
+    # Report exports (see utils/reports.py and `manage.py report-worker`)
+    REPORT_FOLDER = os.environ.get('REPORT_FOLDER')  # background job files; defaults to instance/reports
+    REPORT_CHUNK_ROWS = int(os.environ.get('REPORT_CHUNK_ROWS', 5000))  # rows fetched per server-side cursor round trip
+    REPORT_CHUNK_BYTES = int(os.environ.get('REPORT_CHUNK_BYTES', 64 * 1024))  # CSV handed to the compressor at a time
+    REPORT_COMPRESS_LEVEL = int(os.environ.get('REPORT_COMPRESS_LEVEL', 6))
+    REPORT_POLL_SECONDS = float(os.environ.get('REPORT_POLL_SECONDS', 5))
+
+    # Tracing (see utils/tracing.py); off unless TRACE_EXPORT is set
+    TRACE_EXPORT = os.environ.get('TRACE_EXPORT')  # file for OTLP JSON lines, or an OTLP/HTTP URL, e.g. http://localhost:4318/v1/traces
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))  # share of requests traced; upstream traceparent decisions win
+    TRACE_SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', 'undiziwa')
+    TRACE_EXPORT_SECONDS = float(os.environ.get('TRACE_EXPORT_SECONDS', 5))  # finished spans are sent in batches this often
+    TRACE_QUEUE_SIZE = int(os.environ.get('TRACE_QUEUE_SIZE', 10000))  # spans waiting for export; more are dropped
+    TRACE_MAX_STATEMENT = int(os.environ.get('TRACE_MAX_STATEMENT', 1000))  # SQL text kept per span (never parameters)
+
+    # Streamed list pages (certificates, verifications)
+    LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', 100))
+    LIST_PAGE_SIZE_MAX = int(os.environ.get('LIST_PAGE_SIZE_MAX', 5000))
+    STREAM_CHUNK_BYTES = int(os.environ.get('STREAM_CHUNK_BYTES', 8192))  # rendered HTML is sent in pieces of about this size
+
+    # Response compression (gzip, plus brotli when the brotli package is installed)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))  # bytes; smaller bodies are sent as is
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    COMPRESS_MIMETYPES = {
+        'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+        'application/javascript', 'application/json', 'image/svg+xml',
+    }
+
     # Uploads folder configuration
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
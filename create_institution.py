@@ -1,32 +1,13 @@
 import sys
-from app import create_app, db
-from models import Institution
 
-app = create_app()
-app.app_context().push()
-
-def create_institution(name, email, phone):
-    existing = Institution.query.filter_by(institution_name=name).first()
-    if existing:
-        print(f"Institution '{name}' already exists with ID {existing.institution_id}.")
-        return existing
-
-    institution = Institution(
-        institution_name=name,
-        contact_email=email,
-        contact_phone=phone,
-        api_url="",
-        api_token="",
-        is_active=True
-    )
-    db.session.add(institution)
-    db.session.commit()
-    print(f"Institution '{name}' created with ID {institution.institution_id}.")
-    return institution
+from app import create_cli_app
+from manage import create_institution
 
 if __name__ == "__main__":
     if len(sys.argv) != 4:
         print("Usage: python create_institution.py <name> <email> <phone>")
+        print("(Same as: python manage.py create-institution --help)")
     else:
         _, name, email, phone = sys.argv
-        create_institution(name, email, phone)
+        with create_cli_app().app_context():
+            create_institution(name, email, phone)
@@ -0,0 +1,74 @@
+# gunicorn.conf.py
+"""
+Production profile; gunicorn reads it automatically when started from the
+project directory:
+
+    gunicorn run:app
+
+Every setting can be overridden with a GUNICORN_* environment variable.
+The app is imported once in the master (preload_app) and reference data is
+loaded there before forking, so workers share it copy-on-write; each
+worker then drops the database connections it inherited. Workers are
+recycled after max_requests (with jitter, so they do not all restart at
+once) and given graceful_timeout to finish in-flight requests.
+"""
+import multiprocessing
+import os
+
+
+def _env(name, default, cast=str):
+    return cast(os.environ.get(f"GUNICORN_{name}", default))
+
+
+wsgi_app = "run:app"
+bind = _env("BIND", "0.0.0.0:8000")
+
+# gthread: requests mostly wait on the database, so a few threads per process
+# keep the CPU busy without multiplying memory. Use gevent for many open
+# dashboard event streams (see "Live Dashboard Updates" in readme.md).
+worker_class = _env("WORKER_CLASS", "gthread")
+workers = _env("WORKERS", multiprocessing.cpu_count() * 2 + 1, int)
+threads = _env("THREADS", 4, int)
+worker_connections = _env("WORKER_CONNECTIONS", 1000, int)  # gevent / eventlet only
+
+if worker_class == "gevent":
+    # patch before the preloaded app creates its locks, queues and sockets in
+    # the master; workers inherit the patched modules when they fork
+    from gevent import monkey
+    monkey.patch_all()
+
+# A dashboard event stream holds a gthread thread for as long as it is open,
+# so thread workers keep at least half their threads for ordinary requests.
+# Under gevent an idle stream is a parked greenlet; it only holds one of the
+# worker_connections, and a quarter of those stay free for requests.
+raw_env = []
+if "LIVE_MAX_STREAMS" not in os.environ:
+    if worker_class == "gthread":
+        raw_env.append(f"LIVE_MAX_STREAMS={max(threads // 2, 1)}")
+    elif worker_class == "gevent":
+        raw_env.append(f"LIVE_MAX_STREAMS={max(worker_connections * 3 // 4, 1)}")
+
+preload_app = _env("PRELOAD", "true").lower() == "true"
+
+max_requests = _env("MAX_REQUESTS", 2000, int)
+max_requests_jitter = _env("MAX_REQUESTS_JITTER", 200, int)
+timeout = _env("TIMEOUT", 60, int)
+graceful_timeout = _env("GRACEFUL_TIMEOUT", 30, int)
+keepalive = _env("KEEPALIVE", 5, int)
+
+accesslog = _env("ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = _env("LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # the app is already imported in the master when preloading
+    if server.cfg.preload_app:
+        from utils.prefork import warm_shared_state
+        warm_shared_state(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from utils.prefork import after_fork
+        after_fork(server.app.wsgi())
@@ -0,0 +1,315 @@
+"""
+Admin commands. These start with only the config and model layer
+(create_cli_app), so they skip route modules, marshmallow and alembic:
+
+    python manage.py --help
+    python manage.py create-user admin "System Admin" admin@ex.com 088899901 Admin super_admin
+"""
+import json
+import time
+from datetime import datetime
+
+import click
+
+from app import create_cli_app
+from models import db, User, Institution
+
+VALID_ROLES = ('hr', 'institution_admin', 'gov_admin', 'super_admin')
+
+
+@click.group()
+@click.pass_context
+def cli(ctx):
+    """Undiziwa administration."""
+    if ctx.invoked_subcommand in ("compress-static", "reminder-sweeper"):
+        return  # these need no app context / the full app
+    app = create_cli_app()
+    ctx.with_resource(app.app_context())
+    ctx.obj = app
+
+
+# --------------------------
+# Users and institutions
+# --------------------------
+def create_institution(name, email, phone):
+    existing = Institution.query.filter_by(institution_name=name).first()
+    if existing:
+        print(f"Institution '{name}' already exists with ID {existing.institution_id}.")
+        return existing
+
+    institution = Institution(
+        institution_name=name,
+        contact_email=email,
+        contact_phone=phone,
+        api_url="",
+        is_active=True
+    )
+    db.session.add(institution)
+    db.session.commit()
+    print(f"Institution '{name}' created with ID {institution.institution_id}.")
+    return institution
+
+
+def create_user(username, full_name, email, phone, password, role, institution_id=None, is_active=True):
+    from werkzeug.security import generate_password_hash
+
+    if role not in VALID_ROLES:
+        print(f"Invalid role '{role}'. Valid roles: {VALID_ROLES}")
+        return
+
+    # Check for existing user by email or username
+    if User.query.filter_by(email=email).first():
+        print(f"User with email '{email}' already exists.")
+        return
+    if User.query.filter_by(username=username).first():
+        print(f"User with username '{username}' already exists.")
+        return
+
+    # Validate institution
+    if institution_id:
+        institution = db.session.get(Institution, institution_id)
+        if not institution:
+            print(f"Institution with id {institution_id} not found.")
+            return
+    else:
+        institution = create_institution("Default Institution", "default@inst.com", "0000000000")
+        institution_id = institution.institution_id
+
+    user = User(
+        username=username,
+        full_name=full_name,
+        email=email,
+        phone=phone,
+        password_hash=generate_password_hash(password),
+        role=role,
+        institution_id=institution_id,
+        is_active=is_active,
+        created_at=datetime.utcnow()
+    )
+    db.session.add(user)
+    db.session.commit()
+    print(f"User '{full_name}' ({username}) with role '{role}' created successfully.")
+    return user
+
+
+@cli.command("create-user")
+@click.argument("username")
+@click.argument("full_name")
+@click.argument("email")
+@click.argument("phone")
+@click.argument("password")
+@click.argument("role", type=click.Choice(VALID_ROLES))
+@click.option("--institution-id", type=int, help="Defaults to a 'Default Institution', created if needed.")
+@click.option("--inactive", is_flag=True, help="Create the account disabled.")
+def create_user_command(username, full_name, email, phone, password, role, institution_id, inactive):
+    """Create a user account."""
+    create_user(username, full_name, email, phone, password, role, institution_id, not inactive)
+
+
+@cli.command("create-institution")
+@click.argument("name")
+@click.argument("email")
+@click.argument("phone")
+def create_institution_command(name, email, phone):
+    """Create an institution (no-op if the name exists)."""
+    create_institution(name, email, phone)
+
+
+# --------------------------
+# Maintenance
+# --------------------------
+@cli.command("anchor-certificates")
+@click.option("--institution-id", type=int)
+def anchor_certificates(institution_id):
+    """Hash verified, unbatched certificates into Merkle batches."""
+    from utils.merkle import anchor_pending_certificates
+
+    batches = anchor_pending_certificates(institution_id)
+    if not batches:
+        print("No certificates waiting to be anchored.")
+    for batch in batches:
+        print(f"Batch {batch.batch_id}: institution {batch.institution_id}, "
+              f"{batch.leaf_count} certificates, root {batch.merkle_root}")
+
+
+@cli.command("build-bloom-filters")
+def build_bloom_filters():
+    """Rebuild the student number Bloom filters."""
+    from utils.bloom import rebuild_bloom_filters, bloom_filter_stats
+
+    rebuild_bloom_filters()
+    print(json.dumps(bloom_filter_stats(), indent=2))
+
+
+@cli.command("build-match-keys")
+def build_match_keys():
+    """Rebuild the keys used to match verification requests to certificates."""
+    from utils.matching import rebuild_match_keys
+
+    print(f"Wrote {rebuild_match_keys()} match keys.")
+
+
+@cli.command("backfill-stats")
+def backfill_stats():
+    """Rebuild the statistics rollup tables from the verifications table and the archive."""
+    from utils.stats import backfill_stats
+
+    result = backfill_stats()
+    print(f"Rebuilt statistics rollups: {result['daily_rows']} daily rows, "
+          f"{result['turnaround_rows']} turnaround rows.")
+
+
+@cli.command("archive-verifications")
+@click.option("--months", type=int, help="Archive verifications resolved before the start of the month this many months ago "
+                                         "(default ARCHIVE_AFTER_MONTHS).")
+def archive_verifications(months):
+    """Move old resolved verifications and their uploads to the monthly archive files."""
+    from utils.archive import archive_verifications
+
+    result = archive_verifications(months=months)
+    print(f"Archived {result['verifications']} verification(s) and {result['uploads']} upload(s)"
+          + (f" into {', '.join(result['months'])}." if result["months"] else "."))
+
+
+@cli.command("export-report")
+@click.argument("report", type=click.Choice(("certificates", "verifications", "turnaround")))
+@click.option("--format", "fmt", type=click.Choice(("csv", "gzip", "zip")), default="gzip", show_default=True)
+@click.option("--institution-id", type=int, help="Defaults to all institutions.")
+@click.option("--month", help="YYYY-MM; or use --from/--to.")
+@click.option("--from", "date_from", help="YYYY-MM-DD, inclusive.")
+@click.option("--to", "date_to", help="YYYY-MM-DD, inclusive.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Defaults to a descriptive name in the current directory.")
+def export_report(report, fmt, institution_id, month, date_from, date_to, output):
+    """Stream a certificates / verifications / turnaround report to a file."""
+    from utils.reports import ReportError, report_period, report_filename, write_report, rows_per_second
+
+    try:
+        date_from, date_to = report_period(month, date_from, date_to)
+    except ReportError as e:
+        raise click.BadParameter(str(e))
+    output = output or report_filename(report, fmt, institution_id, date_from, date_to)
+    result = write_report(output, report, fmt, institution_id, date_from, date_to)
+    print(f"Wrote {result['rows']:,} rows ({result['bytes']:,} bytes) to {output} in {result['seconds']:.2f}s "
+          f"({rows_per_second(result['rows'], result['seconds']) or 0:,} rows/s).")
+
+
+@cli.command("split-shards")
+@click.option("--purge", is_flag=True, help="Delete the copied rows from the primary database afterwards.")
+def split_shards(purge):
+    """Copy each institution's certificates and verifications to its shard (DATABASE_SHARD_URLS)."""
+    from utils.sharding import ShardScopeError, split_into_shards
+
+    try:
+        summary = split_into_shards(purge=purge)
+    except ShardScopeError as e:
+        raise click.ClickException(str(e))
+    for name, counts in summary.items():
+        print(f"Shard {name}: {counts['institutions']} new institution(s), {counts['rows']:,} rows copied.")
+    if purge:
+        print("Copied rows removed from the primary database.")
+
+
+@cli.command("compress-static")
+def compress_static():
+    """Write .gz/.br copies of static assets for the compression middleware."""
+    import os
+    from config import Config
+    from utils.compression import compress_static
+
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    config = {key: getattr(Config, key) for key in dir(Config) if key.startswith("COMPRESS_")}
+    for name, original, compressed in compress_static(folder, config):
+        print(f"{name}: {original} -> {compressed} bytes")
+
+
+@cli.command("sweep-reset-tokens")
+@click.option("--once", is_flag=True, help="Run one sweep and exit (for cron).")
+@click.pass_obj
+def sweep_reset_tokens(app, once):
+    """Delete used and expired password reset tokens."""
+    from utils.reset_tokens import sweep_reset_tokens
+
+    while True:
+        print(f"Deleted {sweep_reset_tokens()} used or expired reset token(s).")
+        if once:
+            break
+        time.sleep(app.config["PASSWORD_RESET_SWEEP_MINUTES"] * 60)
+
+
+@cli.command("purge-idempotency-keys")
+def purge_idempotency_keys():
+    """Delete stored Idempotency-Key responses past their TTL."""
+    from utils.idempotency import purge_idempotency_keys
+
+    print(f"Deleted {purge_idempotency_keys()} expired idempotency key(s).")
+
+
+# --------------------------
+# Workers
+# --------------------------
+@cli.command("webhook-worker")
+@click.option("--once", is_flag=True, help="Run one delivery round and exit.")
+@click.pass_obj
+def webhook_worker(app, once):
+    """Deliver queued webhook events."""
+    from utils.webhooks import WebhookDispatcher
+
+    dispatcher = WebhookDispatcher(app.config)
+    print(f"Webhook worker started with {app.config['WEBHOOK_WORKERS']} senders.")
+    try:
+        while True:
+            metrics = dispatcher.deliver_due()
+            if metrics["batches"]:
+                print(f"Delivered {metrics['delivered']}, failed {metrics['failed']} in {metrics['batches']} batches; "
+                      f"avg latency {metrics['avg_latency_seconds']}s, queue depth {metrics['queue_depth']}")
+            if once:
+                break
+            if not metrics["batches"]:
+                time.sleep(app.config["WEBHOOK_POLL_SECONDS"])
+    finally:
+        dispatcher.close()
+
+
+@cli.command("report-worker")
+@click.option("--once", is_flag=True, help="Run the queued jobs and exit.")
+@click.pass_obj
+def report_worker(app, once):
+    """Run queued background report exports."""
+    from utils.reports import run_queued_report_jobs, rows_per_second
+
+    while True:
+        for job in run_queued_report_jobs():
+            if job.status == "done":
+                print(f"Report job {job.job_id} ({job.report}, {job.format}): {job.row_count:,} rows in {job.seconds:.2f}s "
+                      f"({rows_per_second(job.row_count, job.seconds) or 0:,} rows/s).")
+            else:
+                print(f"Report job {job.job_id} ({job.report}, {job.format}) failed: {job.error}")
+        if once:
+            break
+        time.sleep(app.config["REPORT_POLL_SECONDS"])
+
+
+@cli.command("reminder-sweeper")
+@click.option("--once", is_flag=True, help="Run one sweep and exit (for cron).")
+def reminder_sweeper(once):
+    """Email each institution a digest of its overdue verifications."""
+    # digests link to verification pages, so url_for needs the routes
+    from app import create_app
+    from utils.reminders import sweep_reminders
+
+    app = create_app()
+    with app.app_context():
+        interval = app.config["REMINDER_SWEEP_MINUTES"] * 60
+        while True:
+            sent = sweep_reminders()
+            for institution_id, count in sent.items():
+                print(f"Institution {institution_id}: digest with {count} pending verification(s) sent.")
+            if not sent:
+                print("No overdue verifications.")
+            if once:
+                break
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    cli()
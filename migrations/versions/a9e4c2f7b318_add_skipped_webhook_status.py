@@ -0,0 +1,35 @@
+"""Add skipped webhook delivery status
+
+Revision ID: a9e4c2f7b318
+Revises: f7d3a9c1e485
+Create Date: 2026-10-22 15:40:27.904162
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4c2f7b318'
+down_revision = 'f7d3a9c1e485'
+branch_labels = None
+depends_on = None
+
+OLD_STATUS = sa.Enum('pending', 'delivered', 'dead', name='webhook_delivery_status')
+NEW_STATUS = sa.Enum('pending', 'delivered', 'dead', 'skipped', name='webhook_delivery_status')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TYPE webhook_delivery_status ADD VALUE IF NOT EXISTS 'skipped'")
+        return
+    with op.batch_alter_table('webhook_deliveries', schema=None) as batch_op:
+        batch_op.alter_column('status', existing_type=OLD_STATUS, type_=NEW_STATUS, existing_nullable=True)
+
+
+def downgrade():
+    op.execute("UPDATE webhook_deliveries SET status = 'dead' WHERE status = 'skipped'")
+    if op.get_bind().dialect.name == 'postgresql':
+        return  # PostgreSQL cannot drop an enum value; 'skipped' stays unused
+    with op.batch_alter_table('webhook_deliveries', schema=None) as batch_op:
+        batch_op.alter_column('status', existing_type=NEW_STATUS, type_=OLD_STATUS, existing_nullable=True)
@@ -2,8 +2,9 @@ from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class Institution(db.Model):
     __tablename__ = 'institutions'
@@ -13,6 +14,8 @@ class Institution(db.Model):
     contact_phone = db.Column(db.String(20))
     api_url = db.Column(db.Text)
     api_token = db.Column(db.Text)
+    api_token_hash = db.Column(db.String(64), unique=True, index=True)  # SHA-256 of the API token
+    api_token_scope = db.Column(db.String(20), default='institution')  # 'institution' (its own records) or 'all'
     is_active = db.Column(db.Boolean, default=True)
     address = db.Column(db.String(255))
 
@@ -49,11 +52,15 @@ class PasswordResetToken(db.Model):
     __tablename__ = 'password_reset_tokens'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
-    token = db.Column(db.String(255), unique=True, nullable=False)
+    token_digest = db.Column(db.String(64), nullable=False)  # sha256 of the emailed token
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
     used = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index('ix_password_reset_tokens_digest_used', 'token_digest', 'used'),
+    )
+
     def is_expired(self):
         return datetime.utcnow() > self.expires_at
 
@@ -75,6 +82,35 @@ class Certificate(db.Model):
     verified = db.Column(db.Boolean, default=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Merkle anchoring: the batch this certificate was hashed into and its leaf position
+    batch_id = db.Column(db.Integer, db.ForeignKey('certificate_batches.batch_id'), index=True)
+    batch_index = db.Column(db.Integer)
+
+
+class CertificateMatchKey(db.Model):
+    """Normalized / phonetic / trigram keys of a certificate, for matching requests to records (see utils.matching)."""
+    __tablename__ = 'certificate_match_keys'
+    id = db.Column(db.Integer, primary_key=True)
+    certificate_id = db.Column(db.Integer, db.ForeignKey('certificates.certificate_id'), nullable=False, index=True)
+    institution_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(8), nullable=False)  # number, name, sound, tri
+    key = db.Column(db.String(40), nullable=False)
+
+    __table_args__ = (
+        # covering: candidate lookups never touch the table itself
+        db.Index('ix_certificate_match_keys_lookup', 'institution_id', 'kind', 'key', 'certificate_id'),
+    )
+
+
+class CertificateBatch(db.Model):
+    __tablename__ = 'certificate_batches'
+    batch_id = db.Column(db.Integer, primary_key=True)
+    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.institution_id'), index=True)
+    merkle_root = db.Column(db.String(64), nullable=False)  # hex SHA-256
+    leaf_count = db.Column(db.Integer, nullable=False)
+    leaf_hashes = db.Column(db.LargeBinary)  # the 32-byte leaves in batch_index order, as anchored
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 
 class Verification(db.Model):
     __tablename__ = 'verifications'
@@ -113,4 +149,199 @@ class Verification(db.Model):
     requested_at = db.Column(db.DateTime, default=datetime.utcnow)
     verified_at = db.Column(db.DateTime)
 
+    # reminder emails sent to the institution while pending
+    last_reminded_at = db.Column(db.DateTime)
+    reminder_count = db.Column(db.Integer, default=0)
+
+    # score of the existing certificate this request was matched to (see utils.matching)
+    match_score = db.Column(db.Float)
+
+    # identical pending requests share one institution review (see utils.confirmations)
+    task_id = db.Column(db.Integer, db.ForeignKey('confirmation_tasks.task_id'), index=True)
+
     certificate = db.relationship("Certificate", backref="verifications")
+
+    __table_args__ = (
+        db.Index('ix_verifications_status_requested_at', 'status', 'requested_at'),
+    )
+
+
+class ArchivedVerification(db.Model):
+    """Index of a verification moved to a monthly archive file (see utils.archive), plus what the stats rollups need."""
+    __tablename__ = 'verification_archive'
+    verification_id = db.Column(db.Integer, primary_key=True)
+    verified_by_institution_id = db.Column(db.Integer)
+    certificate_id = db.Column(db.Integer)  # no foreign key: the certificate may be deleted later
+    status = db.Column(db.String(20))
+    method = db.Column(db.String(20))
+    requested_at = db.Column(db.DateTime)
+    verified_at = db.Column(db.DateTime)
+    archive_month = db.Column(db.String(7), nullable=False)  # YYYY-MM, names the archive file
+    block_offset = db.Column(db.BigInteger, nullable=False)  # gzip member holding the record
+    block_length = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ArchivedUpload(db.Model):
+    """An upload moved into a monthly uploads archive file (see utils.archive), found by its original path."""
+    __tablename__ = 'archived_uploads'
+    path = db.Column(db.String(512), primary_key=True)  # the verification_file of every verification that used it
+    archive_month = db.Column(db.String(7), nullable=False)  # YYYY-MM, names the uploads file
+    offset = db.Column(db.BigInteger, nullable=False)  # gzip member holding the file
+    length = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ConfirmationTask(db.Model):
+    """One institution review shared by every identical pending verification request."""
+    __tablename__ = 'confirmation_tasks'
+    task_id = db.Column(db.Integer, primary_key=True)
+    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.institution_id'), index=True)
+    certificate_id = db.Column(db.Integer, db.ForeignKey('certificates.certificate_id'))
+    request_key = db.Column(db.String(64), nullable=False)  # see utils.confirmations.confirmation_key
+    open_key = db.Column(db.String(64), unique=True)  # request_key while open, NULL once resolved
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, resolved
+    outcome = db.Column(db.String(20))
+    requester_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)
+
+
+class RevokedCredential(db.Model):
+    __tablename__ = 'revoked_credentials'
+    # credentials of this certificate issued at or before revoked_at are void
+    certificate_id = db.Column(db.Integer, primary_key=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    reason = db.Column(db.String(100))
+
+
+class WebhookEndpoint(db.Model):
+    __tablename__ = 'webhook_endpoints'
+    endpoint_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
+    url = db.Column(db.Text, nullable=False)
+    secret = db.Column(db.String(64), nullable=False)  # HMAC key for payload signatures
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class WebhookDelivery(db.Model):
+    __tablename__ = 'webhook_deliveries'
+    delivery_id = db.Column(db.Integer, primary_key=True)
+    endpoint_id = db.Column(db.Integer, db.ForeignKey('webhook_endpoints.endpoint_id'), nullable=False)
+    event = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(
+        db.Enum('pending', 'delivered', 'dead', 'skipped', name='webhook_delivery_status'),
+        default='pending'
+    )
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_webhook_deliveries_due', 'status', 'next_attempt_at'),
+    )
+
+
+class LiveEvent(db.Model):
+    """Dashboard events, shared by all worker processes through polling (utils.live_updates)."""
+    __tablename__ = 'live_events'
+    event_id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.Integer, nullable=False)  # institution_id
+    event_type = db.Column(db.String(50), nullable=False)
+    data = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_live_events_channel_event_id', 'channel', 'event_id'),
+    )
+
+
+class VerificationDailyStat(db.Model):
+    """Rollup: verifications requested per day, institution, status and method."""
+    __tablename__ = 'verification_daily_stats'
+    day = db.Column(db.Date, primary_key=True)
+    institution_id = db.Column(db.Integer, primary_key=True)  # 0 when unknown
+    status = db.Column(db.String(20), primary_key=True)
+    method = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class VerificationTurnaroundStat(db.Model):
+    """Rollup: histogram of requested_at -> verified_at per day (of verified_at) and institution."""
+    __tablename__ = 'verification_turnaround_stats'
+    day = db.Column(db.Date, primary_key=True)
+    institution_id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)  # see utils.stats.turnaround_bucket
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CacheGeneration(db.Model):
+    """Version counter per cached data set; bumped whenever the underlying rows change."""
+    __tablename__ = 'cache_generations'
+    name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a request sent with an Idempotency-Key, replayed to retries (see utils.idempotency)."""
+    __tablename__ = 'idempotency_keys'
+    key_digest = db.Column(db.String(64), primary_key=True)  # sha256 of caller + key
+    request_digest = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # in_progress, completed
+    response_status = db.Column(db.Integer)
+    response_headers = db.Column(db.Text)  # JSON list of [name, value]
+    response_body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ApiQuotaWindow(db.Model):
+    """Requests made with an API token in a one-minute window, shared by all workers (see utils.api_tokens)."""
+    __tablename__ = 'api_quota_windows'
+    token_hash = db.Column(db.String(64), primary_key=True)
+    window_start = db.Column(db.Integer, primary_key=True)  # minutes since the epoch
+    requests = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReportJob(db.Model):
+    """A report export run in the background by `manage.py report-worker` (see utils.reports)."""
+    __tablename__ = 'report_jobs'
+    job_id = db.Column(db.Integer, primary_key=True)
+    report = db.Column(db.String(30), nullable=False)  # certificates, verifications, turnaround
+    format = db.Column(db.String(10), nullable=False)  # csv, gzip, zip
+    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.institution_id'))  # NULL = all
+    date_from = db.Column(db.Date)
+    date_to = db.Column(db.Date)
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.user_id'), index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    file_name = db.Column(db.String(200))  # in REPORT_FOLDER once done
+    row_count = db.Column(db.Integer)
+    byte_count = db.Column(db.BigInteger)
+    seconds = db.Column(db.Float)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_report_jobs_status_created_at', 'status', 'created_at'),
+    )
+
+
+class InstitutionShard(db.Model):
+    """Shard map: the shard holding an institution's certificates and verifications (see utils.sharding)."""
+    __tablename__ = 'institution_shards'
+    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.institution_id'), primary_key=True)
+    shard = db.Column(db.String(50), nullable=False, index=True)
+    assigned_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ShardSequence(db.Model):
+    """Next id per table on one shard; steps by SHARD_ID_STRIDE from the shard's own offset, so ids stay unique across shards."""
+    __tablename__ = 'shard_sequences'
+    name = db.Column(db.String(50), primary_key=True)  # table name
+    next_id = db.Column(db.BigInteger, nullable=False)
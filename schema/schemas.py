@@ -12,7 +12,6 @@ class InstitutionSchema(ma.Schema):
     contact_email = fields.Email()
     contact_phone = fields.Str()
     api_url = fields.Str(dump_only=True)    
-    api_token = fields.Str(dump_only=True)  
     
     class Meta:
         model = Institution
@@ -39,14 +38,41 @@ class UserSchema(ma.SQLAlchemySchema):
     password = fields.String(load_only=True)
 
 
-class CertificateSchema(ma.Schema):
+class CertificateSchema(ma.SQLAlchemySchema):
     class Meta:
         model = Certificate
-        include_fk = True
         load_instance = True
+        include_fk = True
+
+    certificate_id = auto_field(dump_only=True)
+    student_name = auto_field(required=True)
+    student_number = auto_field()
+    course_name = auto_field()
+    graduation_year = auto_field()
+    certificate_file = auto_field(dump_only=True)
+    institution_id = auto_field(dump_only=True)   # set from the session (see certificate_routes)
+    uploaded_by = auto_field(dump_only=True)
+    verified = auto_field(dump_only=True)         # only institutions verify, through verification requests
+    uploaded_at = auto_field(dump_only=True)
+    batch_id = auto_field(dump_only=True)
+    batch_index = auto_field(dump_only=True)
 
-class VerificationSchema(ma.Schema):
+
+class VerificationSchema(ma.SQLAlchemySchema):
     class Meta:
         model = Verification
+        load_instance = True
         include_fk = True
-        load_instance = True
\ No newline at end of file
+
+    verification_id = auto_field(dump_only=True)
+    certificate_id = auto_field()
+    requested_by = auto_field()
+    verified_by_institution_id = auto_field()
+    status = auto_field()
+    method = auto_field()
+    verification_file = auto_field(dump_only=True)
+    result_json = auto_field(dump_only=True)
+    requested_at = auto_field(dump_only=True)
+    verified_at = auto_field(dump_only=True)
+    last_reminded_at = auto_field(dump_only=True)
+    reminder_count = auto_field(dump_only=True)
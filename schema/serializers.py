@@ -0,0 +1,57 @@
+"""
+Fast JSON serialization for list endpoints.
+
+A RowSerializer is generated once per marshmallow schema: it selects exactly
+the columns the schema dumps with a Core select(), so rows come back as
+plain tuples without building ORM objects, and the row -> dict step is a
+prebuilt function instead of marshmallow's per-field dump. orjson encodes
+the result (naive datetimes as ISO 8601, matching marshmallow's output).
+"""
+import orjson
+from flask import current_app
+from sqlalchemy import select
+
+from models import db
+from schema.schemas import CertificateSchema, VerificationSchema
+
+
+class RowSerializer:
+    def __init__(self, schema_class):
+        schema = schema_class()
+        model = schema_class.Meta.model
+        self.fields = list(schema.dump_fields)
+        self.columns = [getattr(model, schema.dump_fields[name].attribute or name) for name in self.fields]
+        self.to_dict = self._compile(self.fields)
+
+    @staticmethod
+    def _compile(fields):
+        # rows are tuples in field order, so zip() pairs each value with its field name
+        fields = tuple(fields)
+        return lambda row: dict(zip(fields, row))
+
+    def select(self):
+        return select(*self.columns)
+
+    def rows(self, stmt, chunk_size=5000):
+        result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+        to_dict = self.to_dict
+        return [to_dict(row) for row in result]
+
+    def dumps(self, stmt):
+        return orjson.dumps(self.rows(stmt))
+
+    def response(self, stmt, status=200):
+        return current_app.response_class(self.dumps(stmt), status=status, mimetype="application/json")
+
+    def response_across_shards(self, stmt, order_by, status=200):
+        """response() for a list that spans institutions; stmt must be ordered by the order_by field."""
+        from utils.sharding import fan_out_rows
+
+        to_dict = self.to_dict
+        rows = fan_out_rows(stmt, key=self.fields.index(order_by))
+        body = orjson.dumps([to_dict(row) for row in rows])
+        return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+certificate_serializer = RowSerializer(CertificateSchema)
+verification_serializer = RowSerializer(VerificationSchema)
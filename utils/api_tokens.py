@@ -0,0 +1,144 @@
+# utils/api_tokens.py
+import hashlib
+import hmac
+import secrets
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ApiQuotaWindow, Institution
+
+# scope "institution": lookups of the token's own institution only; "all": any institution
+TokenOwner = namedtuple("TokenOwner", "institution_id scope")
+
+# token digest -> (TokenOwner, cached_at)
+_token_cache = {}
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def generate_api_token():
+    """Returns (token, digest). Only the digest is stored; the token is shown once."""
+    token = secrets.token_hex(16)
+    return token, hash_token(token)
+
+
+def _cached_institution(digest):
+    cached = _token_cache.get(digest)
+    if cached and time.time() - cached[1] < current_app.config["API_TOKEN_CACHE_SECONDS"]:
+        return cached[0]
+    return None
+
+
+def _token_query(digest):
+    return (
+        db.select(Institution.institution_id, Institution.api_token_hash, Institution.api_token_scope)
+        .where(Institution.api_token_hash == digest, Institution.is_active.isnot(False))
+        .limit(1)
+    )
+
+
+def _remember(digest, inst):
+    if not inst or not hmac.compare_digest(inst.api_token_hash, digest):
+        _token_cache.pop(digest, None)
+        return None
+
+    owner = TokenOwner(inst.institution_id, inst.api_token_scope or "institution")
+    _token_cache[digest] = (owner, time.time())
+    return owner
+
+
+def authenticate_token(digest):
+    """Returns the TokenOwner of the token with this digest, or None."""
+    cached = _cached_institution(digest)
+    if cached:
+        return cached
+    return _remember(digest, db.session.execute(_token_query(digest)).first())
+
+
+async def authenticate_token_async(session_factory, digest):
+    """authenticate_token() for the ASGI app; opens a session only on a cache miss."""
+    cached = _cached_institution(digest)
+    if cached:
+        return cached
+    async with session_factory() as session:
+        return _remember(digest, (await session.execute(_token_query(digest))).first())
+
+
+def forget_token(digest):
+    """
+    Drops the token from this process's cache. Other worker processes keep
+    accepting a rotated or deactivated token until their cached entry is
+    API_TOKEN_CACHE_SECONDS old. Its quota rows go with the caller's commit.
+    """
+    _token_cache.pop(digest, None)
+    db.session.execute(ApiQuotaWindow.__table__.delete().where(ApiQuotaWindow.token_hash == digest))
+
+
+# --------------------------
+# Quota: fixed one-minute windows in api_quota_windows
+# --------------------------
+def _quota_statements(digest):
+    """(take, open, purge, seconds until the window resets) for the current window."""
+    limit = current_app.config["API_TOKEN_QUOTA_PER_MINUTE"]
+    now = time.time()
+    window = int(now // 60)
+    table = ApiQuotaWindow.__table__
+    token = table.c.token_hash == digest
+
+    # one request of the window's quota; no row changes once it is used up
+    take = (
+        table.update()
+        .where(token, table.c.window_start == window, table.c.requests < limit)
+        .values(requests=table.c.requests + 1)
+    )
+    open_window = table.insert().values(token_hash=digest, window_start=window, requests=1)
+    purge = table.delete().where(token, table.c.window_start < window)
+    return take, open_window, purge, int(60 - now % 60) + 1
+
+
+def consume_quota(digest):
+    """
+    Counts the request against the token's quota, shared by every worker
+    process (and the ASGI app) through the database. Returns seconds until
+    the window resets if the quota is exhausted, else 0.
+    """
+    take, open_window, purge, retry_after = _quota_statements(digest)
+    with db.engine.begin() as conn:
+        if conn.execute(take).rowcount:
+            return 0
+    try:
+        # first request of the window: the token's older windows go with it
+        with db.engine.begin() as conn:
+            conn.execute(purge)
+            conn.execute(open_window)
+        return 0
+    except IntegrityError:
+        # the window exists: used up, or opened by another worker just now
+        with db.engine.begin() as conn:
+            return 0 if conn.execute(take).rowcount else retry_after
+
+
+async def consume_quota_async(session_factory, digest):
+    """consume_quota() for the ASGI app."""
+    take, open_window, purge, retry_after = _quota_statements(digest)
+    async with session_factory() as session:
+        taken = (await session.execute(take)).rowcount
+        await session.commit()
+    if taken:
+        return 0
+    try:
+        async with session_factory() as session:
+            await session.execute(purge)
+            await session.execute(open_window)
+            await session.commit()
+        return 0
+    except IntegrityError:
+        async with session_factory() as session:
+            taken = (await session.execute(take)).rowcount
+            await session.commit()
+        return 0 if taken else retry_after
@@ -0,0 +1,292 @@
+# utils/archive.py
+"""
+Cold storage for resolved verifications.
+
+archive_verifications() moves verifications resolved before the start of
+the month ARCHIVE_AFTER_MONTHS ago out of the verifications table, into
+append-only files in ARCHIVE_FOLDER, one pair per month of verified_at:
+
+    verifications-YYYY-MM.jsonl.gz  one gzip member per chunk, a JSON line per verification
+    uploads-YYYY-MM.gz              one gzip member per uploaded file
+
+Uploads go with them once nothing live refers to them any more (no
+certificate and no remaining verification). verification_archive keeps one
+small row per verification: where its gzip member is, and the fields the
+statistics backfill and the reports need. archived_uploads maps each moved upload's
+original path to its gzip member, so every archived verification that
+used the file finds it, whichever chunk it was archived in. A lookup reads
+and decompresses only that member; decoded members are cached, as archive
+files never change.
+
+Each chunk is written and fsynced before its rows are deleted, in one
+transaction, and moved uploads are removed only after that commit. A
+crash leaves at most unreferenced bytes in an archive file and the rows
+in place, which the next run archives again. The rows are deleted with
+Core statements, so the statistics rollups, live updates and webhooks do
+not treat archiving as deleting.
+"""
+import fcntl
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app
+
+from models import db, ArchivedUpload, ArchivedVerification, Certificate, Verification
+from utils.sharding import each_shard, fan_out
+
+RESOLVED_STATUSES = ("valid", "invalid", "not_found")
+
+
+# --------------------------
+# Files
+# --------------------------
+def archive_folder():
+    folder = current_app.config.get("ARCHIVE_FOLDER") or os.path.join(current_app.instance_path, "archive")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _records_path(month):
+    return os.path.join(archive_folder(), f"verifications-{month}.jsonl.gz")
+
+
+def _uploads_path(month):
+    return os.path.join(archive_folder(), f"uploads-{month}.gz")
+
+
+@contextmanager
+def _archive_lock():
+    """One archiving run at a time, so offsets taken before a write stay correct."""
+    with open(os.path.join(archive_folder(), ".lock"), "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _append(fh, data):
+    """Appends data and returns (offset, length)."""
+    offset = fh.seek(0, os.SEEK_END)
+    fh.write(data)
+    return offset, len(data)
+
+
+def _sync(handles):
+    for fh in handles:
+        fh.flush()
+        os.fsync(fh.fileno())
+        fh.close()
+
+
+def archive_cutoff(now, months):
+    """First day of the month `months` before now's month."""
+    index = now.year * 12 + now.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+# --------------------------
+# Archiving
+# --------------------------
+def _record(row):
+    return {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in row._mapping.items()
+    }
+
+
+def _referenced_uploads(paths, ids):
+    table = Verification.__table__
+    referenced = set(db.session.execute(
+        db.select(Certificate.certificate_file).where(Certificate.certificate_file.in_(paths))
+    ).scalars())
+    referenced.update(db.session.execute(
+        db.select(table.c.verification_file)
+        .where(table.c.verification_file.in_(paths), table.c.verification_id.notin_(ids))
+    ).scalars())
+    return referenced
+
+
+def _unreferenced_uploads(rows):
+    """Upload paths in rows that no certificate or remaining verification (on any shard) refers to."""
+    paths = {row.verification_file for row in rows if row.verification_file}
+    if not paths:
+        return set()
+
+    ids = [row.verification_id for row in rows]
+    referenced = set().union(*fan_out(_referenced_uploads, paths, ids))
+    return {path for path in paths - referenced if os.path.isfile(path)}
+
+
+def _archive_chunk(rows, now):
+    """Writes rows to their month files, then swaps them for index rows. Returns the upload paths moved."""
+    table = Verification.__table__
+    moved = _unreferenced_uploads(rows)
+
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row.verified_at.strftime("%Y-%m"), []).append(row)
+
+    index_rows, upload_rows, handles, placed = [], [], [], set()
+    try:
+        for month, month_rows in by_month.items():
+            records = []
+            uploads = None
+            for row in month_rows:
+                path = row.verification_file
+                if path in moved and path not in placed:
+                    if uploads is None:
+                        uploads = open(_uploads_path(month), "ab")
+                        handles.append(uploads)
+                    with open(path, "rb") as fh:
+                        offset, length = _append(uploads, gzip.compress(fh.read(), compresslevel=6))
+                    upload_rows.append({"path": path, "archive_month": month, "offset": offset,
+                                        "length": length, "archived_at": now})
+                    placed.add(path)
+                records.append(_record(row))
+
+            block = gzip.compress("".join(json.dumps(record) + "\n" for record in records).encode(), compresslevel=6)
+            fh = open(_records_path(month), "ab")
+            handles.append(fh)
+            offset, length = _append(fh, block)
+            index_rows.extend({
+                "verification_id": row.verification_id,
+                "verified_by_institution_id": row.verified_by_institution_id,
+                "certificate_id": row.certificate_id,
+                "status": row.status,
+                "method": row.method,
+                "requested_at": row.requested_at,
+                "verified_at": row.verified_at,
+                "archive_month": month,
+                "block_offset": offset,
+                "block_length": length,
+                "archived_at": now,
+            } for row in month_rows)
+    finally:
+        _sync(handles)
+
+    # a row archived by an earlier, interrupted run is replaced by this copy
+    ids = [row.verification_id for row in rows]
+    archive = ArchivedVerification.__table__
+    db.session.execute(archive.delete().where(archive.c.verification_id.in_(ids)))
+    db.session.execute(archive.insert(), index_rows)
+    if upload_rows:
+        uploads_index = ArchivedUpload.__table__
+        db.session.execute(uploads_index.delete().where(uploads_index.c.path.in_(placed)))
+        db.session.execute(uploads_index.insert(), upload_rows)
+    db.session.execute(table.delete().where(table.c.verification_id.in_(ids)))
+    db.session.commit()
+    return placed
+
+
+def archive_verifications(now=None, months=None, chunk_size=None):
+    """
+    Archives every verification resolved before archive_cutoff(now, months).
+    Returns {"verifications": n, "uploads": n, "months": [YYYY-MM, ...]}.
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    months = config["ARCHIVE_AFTER_MONTHS"] if months is None else months
+    chunk_size = chunk_size or config["ARCHIVE_CHUNK_SIZE"]
+    cutoff = archive_cutoff(now, months)
+    table = Verification.__table__
+
+    archived, uploads, touched = 0, 0, set()
+    with _archive_lock():
+        for _ in each_shard():
+            _backfill_certificate_ids()
+
+            last_id = 0
+            while True:
+                # keyset over the primary key: one pass over the table however many chunks
+                rows = db.session.execute(
+                    db.select(table)
+                    .where(table.c.verification_id > last_id, table.c.status.in_(RESOLVED_STATUSES),
+                           table.c.verified_at < cutoff)
+                    .order_by(table.c.verification_id)
+                    .limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].verification_id
+
+                for path in _archive_chunk(rows, now):
+                    os.remove(path)
+                    uploads += 1
+                archived += len(rows)
+                touched.update(row.verified_at.strftime("%Y-%m") for row in rows)
+
+    return {"verifications": archived, "uploads": uploads, "months": sorted(touched)}
+
+
+def _backfill_certificate_ids():
+    """Fills certificate_id of index rows written before the column existed, reading each of their blocks once."""
+    archive = ArchivedVerification.__table__
+    blocks = db.session.execute(
+        db.select(archive.c.archive_month, archive.c.block_offset, archive.c.block_length)
+        .where(archive.c.certificate_id.is_(None))
+        .distinct()
+    ).all()
+    fill = (
+        archive.update()
+        .where(archive.c.verification_id == db.bindparam("b_id"), archive.c.certificate_id.is_(None))
+        .values(certificate_id=db.bindparam("b_certificate_id"))
+    )
+    for month, offset, length in blocks:
+        records = _read_block(_records_path(month), offset, length)
+        values = [
+            {"b_id": verification_id, "b_certificate_id": record["certificate_id"]}
+            for verification_id, record in records.items() if record.get("certificate_id") is not None
+        ]
+        if values:
+            db.session.execute(fill, values)
+        db.session.commit()
+
+
+# --------------------------
+# Lookups
+# --------------------------
+@lru_cache(maxsize=64)
+def _read_block(path, offset, length):
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        data = gzip.decompress(fh.read(length))
+    return {record["verification_id"]: record for record in map(json.loads, data.splitlines())}
+
+
+def archived_record(verification_id):
+    """The archived verification as a dict of its columns, or None."""
+    entry = db.session.get(ArchivedVerification, verification_id)
+    if entry is None:
+        return None
+    block = _read_block(_records_path(entry.archive_month), entry.block_offset, entry.block_length)
+    return block.get(verification_id)
+
+
+def archived_verification(verification_id):
+    """A detached, read-only Verification rebuilt from the archive, or None."""
+    record = archived_record(verification_id)
+    if record is None:
+        return None
+    columns = {column.key: column for column in Verification.__table__.columns}
+    values = {}
+    for name, value in record.items():
+        if name in columns and value is not None and isinstance(columns[name].type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        if name in columns:
+            values[name] = value
+    return Verification(**values)
+
+
+def read_archived_upload(path):
+    """(file name, bytes) of an upload moved into the archive, by its original path; None if it was not moved."""
+    upload = db.session.get(ArchivedUpload, path) if path else None
+    if upload is None:
+        return None
+    with open(_uploads_path(upload.archive_month), "rb") as fh:
+        fh.seek(upload.offset)
+        return os.path.basename(path), gzip.decompress(fh.read(upload.length))
@@ -0,0 +1,40 @@
+# utils/async_db.py
+"""
+SQLAlchemy asyncio engine for the ASGI app (asgi.py).
+
+It reads the same database as the Flask app, with the same models, through
+an async driver: aiosqlite for SQLite, asyncpg for PostgreSQL, aiomysql for
+MySQL. Install the one you need alongside uvicorn. ASYNC_DATABASE_URL
+overrides the URL derived from the Flask app's engine.
+"""
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from models import db
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+
+def async_database_url(url):
+    """The same database with its async driver, e.g. postgresql+psycopg2://… -> postgresql+asyncpg://…"""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def create_async_db(app):
+    """(engine, session factory) for app's database. Opens no connection yet."""
+    config = app.config
+    url = config["ASYNC_DATABASE_URL"]
+    if not url:
+        # Flask-SQLAlchemy has already resolved relative SQLite paths against the instance folder
+        with app.app_context():
+            url = async_database_url(db.engine.url)
+
+    engine = create_async_engine(
+        url,
+        pool_size=config["ASYNC_DB_POOL_SIZE"],
+        max_overflow=config["ASYNC_DB_MAX_OVERFLOW"],
+        pool_timeout=config["ASYNC_DB_POOL_TIMEOUT"],
+    )
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
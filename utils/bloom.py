@@ -0,0 +1,406 @@
+# utils/bloom.py
+"""
+Per-institution Bloom filters over Certificate.student_number.
+
+Each filter lives in its own file under BLOOM_FILTER_FOLDER and is mapped
+with mmap(MAP_SHARED), so every worker process reads (and updates) the same
+pages instead of holding a private copy. A small manifest.json records the
+build generation and the highest certificate_id covered; workers reload
+their mappings when another process rebuilds the files. While a rebuild is
+swapping files in, the manifest is marked "building" and lookups fall back
+to the database; inserts wait for the rebuild and then go to the new files.
+
+A filter never returns a false negative for a committed certificate that
+went through the ORM, so "not in the filter" is a definite not_found.
+Deletes cannot clear bits; they are counted and trigger a rebuild once
+they make up BLOOM_FILTER_REBUILD_DELETED_RATIO of the keys.
+"""
+import fcntl
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect
+
+from models import db, Certificate
+from utils.sharding import each_shard
+
+MAGIC = b"UBLM"
+VERSION = 1
+# magic, version, num_hashes, num_bits, count (+ padding to 32 bytes)
+HEADER = struct.Struct("<4sIIQQ4x")
+
+_filters = {}           # institution_id -> BloomFilter
+_manifest = None
+_manifest_mtime = None
+_checked_pid = None     # pid that already compared the manifest with the database
+
+
+def normalize_student_number(student_number):
+    return (student_number or "").strip().upper()
+
+
+def optimal_size(capacity, false_positive_rate):
+    capacity = max(capacity, 1)
+    num_bits = math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))
+    num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+    return num_bits, num_hashes
+
+
+def _positions(key, num_hashes, num_bits):
+    digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % num_bits for i in range(num_hashes)]
+
+
+class BloomFilter:
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, "r+b")
+        self._mm = mmap.mmap(self._fh.fileno(), 0)
+        magic, version, self.num_hashes, self.num_bits, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a Bloom filter file")
+
+    @classmethod
+    def create(cls, path, capacity, false_positive_rate, keys=()):
+        """Builds the filter in memory and swaps it into place atomically."""
+        num_bits, num_hashes = optimal_size(capacity, false_positive_rate)
+        data = bytearray(HEADER.size + (num_bits + 7) // 8)
+        count = 0
+        for key in keys:
+            for pos in _positions(key, num_hashes, num_bits):
+                data[HEADER.size + (pos >> 3)] |= 1 << (pos & 7)
+            count += 1
+        HEADER.pack_into(data, 0, MAGIC, VERSION, num_hashes, num_bits, count)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    @property
+    def count(self):
+        return HEADER.unpack_from(self._mm, 0)[4]
+
+    def __contains__(self, key):
+        mm = self._mm
+        offset = HEADER.size
+        return all(
+            mm[offset + (pos >> 3)] & (1 << (pos & 7))
+            for pos in _positions(key, self.num_hashes, self.num_bits)
+        )
+
+    def add(self, key):
+        # flock serialises the read-modify-write of shared bytes across workers
+        fcntl.flock(self._fh, fcntl.LOCK_EX)
+        try:
+            mm = self._mm
+            offset = HEADER.size
+            for pos in _positions(key, self.num_hashes, self.num_bits):
+                mm[offset + (pos >> 3)] |= 1 << (pos & 7)
+            struct.pack_into("<Q", mm, 20, self.count + 1)
+        finally:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+
+    def stats(self):
+        bits_set = int.from_bytes(self._mm[HEADER.size:], "little").bit_count()
+        fill_ratio = bits_set / self.num_bits
+        return {
+            "keys": self.count,
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "bytes": len(self._mm),
+            "fill_ratio": round(fill_ratio, 6),
+            "estimated_false_positive_rate": fill_ratio ** self.num_hashes,
+        }
+
+    def close(self):
+        self._mm.close()
+        self._fh.close()
+
+
+# --------------------------
+# Files & manifest
+# --------------------------
+def bloom_folder():
+    folder = current_app.config.get("BLOOM_FILTER_FOLDER") or os.path.join(current_app.instance_path, "bloom")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _filter_path(institution_id):
+    return os.path.join(bloom_folder(), f"institution_{institution_id}.bloom")
+
+
+def _manifest_path():
+    return os.path.join(bloom_folder(), "manifest.json")
+
+
+@contextmanager
+def _folder_lock():
+    with open(os.path.join(bloom_folder(), ".lock"), "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _read_manifest():
+    try:
+        with open(_manifest_path()) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(manifest):
+    tmp_path = f"{_manifest_path()}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_path, _manifest_path())
+
+
+def _close_filters():
+    for bloom in _filters.values():
+        bloom.close()
+    _filters.clear()
+
+
+def _sync_manifest():
+    """Picks up manifest changes made by other workers (one stat() per call)."""
+    global _manifest, _manifest_mtime
+
+    try:
+        # the inode and size too: the "building" and finished manifests of a
+        # fast rebuild can share an mtime tick
+        st = os.stat(_manifest_path())
+        mtime = (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        mtime = None
+
+    if mtime == _manifest_mtime:
+        return _manifest
+
+    manifest = _read_manifest()
+    if not manifest or not _manifest or manifest["generation"] != _manifest["generation"]:
+        _close_filters()
+    _manifest, _manifest_mtime = manifest, mtime
+    return _manifest
+
+
+def _get_filter(institution_id):
+    bloom = _filters.get(institution_id)
+    if bloom is None:
+        path = _filter_path(institution_id)
+        if not os.path.exists(path):
+            return None
+        bloom = _filters[institution_id] = BloomFilter(path)
+    return bloom
+
+
+# --------------------------
+# Build
+# --------------------------
+def rebuild_bloom_filters():
+    """Rebuilds every filter from one streamed scan of the certificates table."""
+    config = current_app.config
+    fpr = config["BLOOM_FILTER_FALSE_POSITIVE_RATE"]
+    min_capacity = config["BLOOM_FILTER_MIN_CAPACITY"]
+
+    with _folder_lock():
+        previous = _read_manifest()
+        # files are replaced one by one below; until the new generation is
+        # written, lookups must not trust a mapping of either build
+        _write_manifest(dict(previous or {"generation": 0}, building=True))
+        try:
+            max_id, keys = _build_all(min_capacity, fpr)
+        except BaseException:
+            if previous:
+                _write_manifest(previous)
+            else:
+                os.remove(_manifest_path())
+            raise
+
+        _write_manifest({
+            "generation": (previous or {"generation": 0})["generation"] + 1,
+            "max_certificate_id": max_id,
+            "keys": keys,
+            "deleted": 0,
+            "built_at": time.time(),
+        })
+
+    _sync_manifest()
+
+
+def _build_all(min_capacity, fpr):
+    """Writes a filter per institution and removes stale ones; returns (max_certificate_id, keys)."""
+    max_id = _max_certificate_id()
+    counts = {}
+    for _ in each_shard():
+        counts.update(
+            db.session.query(Certificate.institution_id, func.count())
+            .filter(Certificate.institution_id.isnot(None), Certificate.certificate_id <= max_id)
+            .group_by(Certificate.institution_id)
+            .all()
+        )
+
+    current_id, keys, built = None, [], set()
+    for institution_id, student_number in _student_numbers(max_id):
+        if institution_id != current_id:
+            if current_id is not None:
+                _build_one(current_id, keys, counts, min_capacity, fpr)
+                built.add(current_id)
+            current_id, keys = institution_id, []
+        keys.append(normalize_student_number(student_number))
+    if current_id is not None:
+        _build_one(current_id, keys, counts, min_capacity, fpr)
+        built.add(current_id)
+
+    for name in os.listdir(bloom_folder()):
+        if name.endswith(".bloom") and int(name[len("institution_"):-len(".bloom")]) not in built:
+            os.remove(os.path.join(bloom_folder(), name))
+    return max_id, sum(counts.values())
+
+
+def _max_certificate_id():
+    return max(db.session.query(func.max(Certificate.certificate_id)).scalar() or 0 for _ in each_shard())
+
+
+def _student_numbers(max_id):
+    """(institution_id, student_number) grouped by institution; an institution's rows are all on one shard."""
+    for _ in each_shard():
+        yield from (
+            db.session.query(Certificate.institution_id, Certificate.student_number)
+            .filter(Certificate.institution_id.isnot(None), Certificate.certificate_id <= max_id)
+            .order_by(Certificate.institution_id)
+            .execution_options(stream_results=True)
+            .yield_per(5000)
+        )
+
+
+def _build_one(institution_id, keys, counts, min_capacity, fpr):
+    capacity = max(min_capacity, 2 * counts.get(institution_id, len(keys)))
+    BloomFilter.create(_filter_path(institution_id), capacity, fpr, keys).close()
+
+
+def ensure_bloom_filters():
+    """
+    Builds the filters if they are missing or behind the database (e.g.
+    certificates inserted while no worker was running). Runs once per process.
+    """
+    global _checked_pid
+
+    if _checked_pid == os.getpid():
+        return
+    _checked_pid = os.getpid()
+
+    manifest = _sync_manifest()
+    max_id = _max_certificate_id()
+    deleted_ratio = current_app.config["BLOOM_FILTER_REBUILD_DELETED_RATIO"]
+
+    if (
+        not manifest
+        or manifest.get("building")
+        or max_id > manifest["max_certificate_id"]
+        or manifest["deleted"] > deleted_ratio * max(manifest["keys"], 1)
+    ):
+        rebuild_bloom_filters()
+
+
+# --------------------------
+# Lookups & reporting
+# --------------------------
+def might_have_student_number(institution_id, student_number):
+    """False means the institution definitely has no such certificate."""
+    if not current_app.config["BLOOM_FILTER_ENABLED"]:
+        return True
+
+    ensure_bloom_filters()
+    manifest = _sync_manifest()
+    if manifest and manifest.get("building"):
+        return True  # a rebuild is swapping the files; let the database answer
+    bloom = _get_filter(int(institution_id))
+    if bloom is None:
+        return False
+    return normalize_student_number(student_number) in bloom
+
+
+def bloom_filter_stats():
+    ensure_bloom_filters()
+    manifest = _sync_manifest() or {}
+
+    institutions = {}
+    for name in sorted(os.listdir(bloom_folder())):
+        if name.endswith(".bloom"):
+            institution_id = int(name[len("institution_"):-len(".bloom")])
+            institutions[institution_id] = _get_filter(institution_id).stats()
+
+    return {
+        "generation": manifest.get("generation"),
+        "max_certificate_id": manifest.get("max_certificate_id"),
+        "deleted_since_build": manifest.get("deleted"),
+        "total_bytes": sum(item["bytes"] for item in institutions.values()),
+        "institutions": institutions,
+    }
+
+
+# --------------------------
+# Keep filters current from ORM events
+# --------------------------
+def _record_change(manifest, certificate_id=None, deleted=0):
+    """Caller holds _folder_lock()."""
+    if certificate_id:
+        manifest["max_certificate_id"] = max(manifest["max_certificate_id"], certificate_id)
+        manifest["keys"] += 1
+    manifest["deleted"] += deleted
+    _write_manifest(manifest)
+
+
+@event.listens_for(Certificate, "after_update")
+def _update_certificate(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.student_number.history.has_changes() or attrs.institution_id.history.has_changes():
+        _add_certificate(mapper, connection, target)
+
+
+@event.listens_for(Certificate, "after_insert")
+def _add_certificate(mapper, connection, target):
+    if not has_app_context() or not current_app.config["BLOOM_FILTER_ENABLED"]:
+        return
+    if target.institution_id is None:
+        return
+
+    # under the folder lock a rebuild is either finished (and _sync_manifest
+    # remaps to its files) or not started, so the key never lands in a replaced file
+    with _folder_lock():
+        if not _sync_manifest():
+            return  # nothing built yet; the first lookup builds from the table
+        bloom = _get_filter(target.institution_id)
+        if bloom is None:
+            bloom = _filters[target.institution_id] = BloomFilter.create(
+                _filter_path(target.institution_id),
+                current_app.config["BLOOM_FILTER_MIN_CAPACITY"],
+                current_app.config["BLOOM_FILTER_FALSE_POSITIVE_RATE"],
+            )
+        bloom.add(normalize_student_number(target.student_number))
+        _record_change(_read_manifest(), certificate_id=target.certificate_id)
+
+
+@event.listens_for(Certificate, "after_delete")
+def _remove_certificate(mapper, connection, target):
+    if not has_app_context() or not current_app.config["BLOOM_FILTER_ENABLED"]:
+        return
+    with _folder_lock():
+        manifest = _read_manifest()
+        if manifest:
+            _record_change(manifest, deleted=1)
@@ -0,0 +1,234 @@
+# utils/compression.py
+"""
+WSGI response compression.
+
+Encoding is negotiated from Accept-Encoding (br when the brotli package is
+installed, otherwise gzip). Only COMPRESS_MIMETYPES are compressed, and
+bodies with a known Content-Length below COMPRESS_MIN_SIZE are left alone.
+Responses without a Content-Length (generators, streamed templates) are
+compressed chunk by chunk with a sync flush after each chunk, so nothing
+is buffered and the client still sees data as it is produced.
+
+Requests for /static/<file> are answered from <file>.br / <file>.gz when
+such a precompressed copy exists (see compress_static()).
+"""
+import gzip
+import mimetypes
+import os
+import zlib
+
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts (q > 0), preferred first among those we support."""
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    supported = (["br"] if brotli else []) + ["gzip"]
+    wildcard = accepted.get("*", 0)
+    return [enc for enc in supported if accepted.get(enc, wildcard) > 0]
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31: gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, wsgi_app, config, static_url_path="/static", static_folder=None):
+        self.wsgi_app = wsgi_app
+        self.min_size = config["COMPRESS_MIN_SIZE"]
+        self.gzip_level = config["COMPRESS_GZIP_LEVEL"]
+        self.brotli_quality = config["COMPRESS_BROTLI_QUALITY"]
+        self.mimetypes = set(config["COMPRESS_MIMETYPES"])
+        self.static_prefix = static_url_path.rstrip("/") + "/"
+        self.static_folder = static_folder
+
+    def _stream(self, encoding):
+        if encoding == "br":
+            return _BrotliStream(self.brotli_quality)
+        return _GzipStream(self.gzip_level)
+
+    def __call__(self, environ, start_response):
+        encodings = accepted_encodings(environ.get("HTTP_ACCEPT_ENCODING"))
+        if not encodings:
+            return self.wsgi_app(environ, start_response)
+
+        path = environ.get("PATH_INFO", "")
+        if self.static_folder and path.startswith(self.static_prefix):
+            precompressed = self._precompressed(environ, start_response, path, encodings)
+            if precompressed is not None:
+                return precompressed
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            # the real start_response is called once we know whether to compress
+            return lambda data: captured.setdefault("written", []).append(data)
+
+        app_iter = self.wsgi_app(environ, capture)
+        if "status" not in captured:
+            # generator apps only call start_response once iteration starts
+            iterator = iter(app_iter)
+            captured.setdefault("written", []).append(next(iterator, b""))
+            app_iter = ClosingIterator(iterator, getattr(app_iter, "close", None))
+        return self._respond(app_iter, captured, encodings[0], start_response)
+
+    # --------------------------
+    # Dynamic responses
+    # --------------------------
+    def _should_compress(self, status, headers):
+        code = int(status.split(" ", 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+
+        header = {name.lower(): value for name, value in headers}
+        if "content-encoding" in header or "no-transform" in header.get("cache-control", ""):
+            return False
+        if header.get("content-type", "").split(";")[0].strip().lower() not in self.mimetypes:
+            return False
+        length = header.get("content-length")
+        return length is None or int(length) >= self.min_size
+
+    def _respond(self, app_iter, captured, encoding, start_response):
+        status, headers = captured["status"], captured["headers"]
+        if not self._should_compress(status, headers):
+            write = start_response(status, headers, captured["exc_info"])
+            for data in captured.get("written", ()):
+                write(data)
+            return app_iter
+
+        buffered = any(name.lower() == "content-length" for name, _ in headers)
+        vary = [value for name, value in headers if name.lower() == "vary"] + ["Accept-Encoding"]
+        headers = [
+            (name, _weak_etag(value) if name.lower() == "etag" else value)
+            for name, value in headers
+            if name.lower() not in ("content-length", "vary")
+        ]
+        headers.append(("Content-Encoding", encoding))
+        headers.append(("Vary", ", ".join(vary)))
+        stream = self._stream(encoding)
+
+        if buffered:
+            # the body is already in memory; compress it in one go and keep a Content-Length
+            try:
+                body = b"".join(captured.get("written", [])) + b"".join(app_iter)
+            finally:
+                if hasattr(app_iter, "close"):
+                    app_iter.close()
+            compressed = stream.compress(body) + stream.finish()
+            headers.append(("Content-Length", str(len(compressed))))
+            start_response(status, headers, captured["exc_info"])
+            return [compressed]
+
+        start_response(status, headers, captured["exc_info"])
+        return self._compress_iter(app_iter, stream, captured.get("written", []))
+
+    @staticmethod
+    def _compress_iter(app_iter, stream, written):
+        try:
+            for data in written:
+                yield stream.compress(data)
+            for data in app_iter:
+                if data:
+                    yield stream.compress(data)
+            yield stream.finish()
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+
+    # --------------------------
+    # Precompressed static files
+    # --------------------------
+    def _precompressed(self, environ, start_response, path, encodings):
+        relative = path[len(self.static_prefix):]
+        for encoding in encodings:
+            suffix = PRECOMPRESSED_SUFFIXES[encoding]
+            candidate = os.path.join(self.static_folder, relative + suffix)
+            if os.path.isfile(candidate) and os.path.realpath(candidate).startswith(os.path.realpath(self.static_folder)):
+                break
+        else:
+            return None
+
+        content_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+
+        def fix_headers(status, headers, exc_info=None):
+            headers = [(name, value) for name, value in headers if name.lower() != "content-type"]
+            headers += [("Content-Type", content_type), ("Content-Encoding", encoding), ("Vary", "Accept-Encoding")]
+            return start_response(status, headers, exc_info)
+
+        # let Flask's static view serve the compressed copy (conditional requests, caching headers)
+        environ = dict(environ, PATH_INFO=path + suffix)
+        return self.wsgi_app(environ, fix_headers)
+
+
+def _weak_etag(value):
+    # the compressed body is a different representation of the same resource
+    return value if value.startswith("W/") else "W/" + value
+
+
+def init_app(app):
+    if app.config["COMPRESS_ENABLED"]:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app, app.config, app.static_url_path or "/static", app.static_folder
+        )
+
+
+def compress_static(folder, config):
+    """Writes <file>.gz (and <file>.br with brotli installed) next to each compressible static file."""
+    written = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.endswith((".gz", ".br")):
+                continue
+            path = os.path.join(root, name)
+            if mimetypes.guess_type(name)[0] not in config["COMPRESS_MIMETYPES"]:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < config["COMPRESS_MIN_SIZE"]:
+                continue
+
+            outputs = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli:
+                outputs[".br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in outputs.items():
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+                written.append((os.path.relpath(path + suffix, folder), len(data), len(compressed)))
+    return written
@@ -0,0 +1,104 @@
+# utils/confirmations.py
+"""
+Fan-in of identical verification requests.
+
+Requests for the same institution, student, student number, course and
+year are the same question, however many employers ask it. The first one opens a
+ConfirmationTask and notifies the institution; later ones attach to the
+open task without creating a certificate or sending another email. When
+the institution answers any of them, resolve_verification() copies the
+answer to every pending request on the task and closes it. Each
+requester still gets their own status change (and webhook / live event).
+
+ConfirmationTask.open_key is unique and only set while the task is open,
+so two concurrent first requests cannot open two tasks for one key.
+"""
+import hashlib
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ConfirmationTask, Verification
+from utils.matching import normalize_name, normalize_number
+
+
+def confirmation_key(institution_id, student_name, student_number, course_name, graduation_year):
+    """
+    Identifies identical requests; None without a student number (nothing
+    reliable to key on). The name is part of the key: a request naming
+    someone else under the same number is a different claim and gets its
+    own review.
+    """
+    number = normalize_number(student_number)
+    if not number:
+        return None
+    raw = f"{institution_id}|{normalize_name(student_name)}|{number}|{normalize_name(course_name)}|{graduation_year}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def open_task(key):
+    return ConfirmationTask.query.filter_by(open_key=key).first() if key else None
+
+
+def attach_to_task(verification, institution_id, certificate_id, key, task=None):
+    """
+    Puts the (not yet flushed) verification on the open task for key,
+    opening one if needed. Returns (task, opened); opened is True for the
+    request that should notify the institution.
+    """
+    task = task or open_task(key)
+    if task is None:
+        try:
+            with db.session.begin_nested():
+                task = ConfirmationTask(
+                    institution_id=institution_id, certificate_id=certificate_id,
+                    request_key=key, open_key=key,
+                )
+                db.session.add(task)
+        except IntegrityError:
+            # opened concurrently by another request (and maybe answered already)
+            return attach_to_task(verification, institution_id, certificate_id, key)
+        else:
+            verification.task_id = task.task_id
+            return task, True
+
+    task.requester_count = ConfirmationTask.requester_count + 1
+    verification.task_id = task.task_id
+    verification.certificate_id = task.certificate_id
+    return task, False
+
+
+def resolve_verification(ver, status, result_json, now=None):
+    """Sets the outcome on ver and every other pending request on its task. Returns the verifications changed."""
+    now = now or datetime.utcnow()
+    resolved = [ver]
+    if ver.task_id is not None:
+        resolved += (
+            Verification.query
+            .filter(Verification.task_id == ver.task_id, Verification.status == "pending",
+                    Verification.verification_id != ver.verification_id)
+            .all()
+        )
+        ConfirmationTask.query.filter_by(task_id=ver.task_id).update({
+            "status": "resolved", "outcome": status, "open_key": None, "resolved_at": now,
+        })
+
+    for item in resolved:
+        item.status = status
+        item.result_json = result_json
+        item.verified_at = now
+    return resolved
+
+
+def group_by_task(verifications):
+    """[(verification, requester count)], one entry per confirmation task, in the original order."""
+    groups, by_task = [], {}
+    for ver in verifications:
+        if ver.task_id is None:
+            groups.append([ver, 1])
+        elif ver.task_id in by_task:
+            by_task[ver.task_id][1] += 1
+        else:
+            by_task[ver.task_id] = [ver, 1]
+            groups.append(by_task[ver.task_id])
+    return [tuple(group) for group in groups]
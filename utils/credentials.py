@@ -0,0 +1,157 @@
+# utils/credentials.py
+import asyncio
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import event, inspect
+
+from models import db, Certificate, RevokedCredential
+from utils.db_routing import RoutingSession
+
+CREDENTIAL_VERSION = 1
+
+# Positional layout of the signed payload. A list keeps the encoding canonical
+# and compact enough for a QR code.
+CREDENTIAL_FIELDS = (
+    "version", "certificate_id", "institution_id", "student_number",
+    "student_name", "course_name", "graduation_year", "issued_at",
+)
+# Certificate columns copied into credentials; changing one voids those already issued
+CERTIFICATE_CREDENTIAL_COLUMNS = ("institution_id", "student_number", "student_name", "course_name", "graduation_year")
+
+# certificate_id -> unix time of revocation; credentials issued before it are void
+_revoked = {}
+_revoked_loaded_at = 0.0
+_revoked_lock = threading.Lock()
+_revoked_async_lock = asyncio.Lock()  # one reload at a time in the ASGI app
+
+
+def get_credential_serializer():
+    return URLSafeSerializer(
+        current_app.config["CREDENTIAL_SECRET_KEY"],
+        salt="certificate-credential",
+        signer_kwargs={"digest_method": hashlib.sha256},
+    )
+
+
+def issue_credential(cert):
+    payload = [
+        CREDENTIAL_VERSION,
+        cert.certificate_id,
+        cert.institution_id,
+        cert.student_number,
+        cert.student_name,
+        cert.course_name,
+        cert.graduation_year,
+        int(time.time()),
+    ]
+    return get_credential_serializer().dumps(payload)
+
+
+def verify_credential(token):
+    """
+    Validates a credential without touching the certificates table.
+    Returns (fields, None) on success or (None, reason) on failure.
+    """
+    try:
+        payload = get_credential_serializer().loads(token)
+    except BadSignature:
+        return None, "invalid_signature"
+
+    if not isinstance(payload, list) or len(payload) != len(CREDENTIAL_FIELDS):
+        return None, "malformed"
+
+    fields = dict(zip(CREDENTIAL_FIELDS, payload))
+    if fields["version"] != CREDENTIAL_VERSION:
+        return None, "unsupported_version"
+
+    if is_revoked(fields["certificate_id"], fields["issued_at"]):
+        return None, "revoked"
+
+    return fields, None
+
+
+# --------------------------
+# Revocation set
+# --------------------------
+def _revocations_stale():
+    return time.time() - _revoked_loaded_at >= current_app.config["CREDENTIAL_REVOCATION_REFRESH_SECONDS"]
+
+
+_REVOCATIONS_QUERY = db.select(RevokedCredential.certificate_id, RevokedCredential.revoked_at)
+
+
+def _load_revocations(rows):
+    global _revoked, _revoked_loaded_at
+    _revoked = {cid: _epoch(revoked_at) for cid, revoked_at in rows}
+    _revoked_loaded_at = time.time()
+
+
+def refresh_revocations():
+    if not _revocations_stale():
+        return
+
+    with _revoked_lock:
+        if _revocations_stale():
+            _load_revocations(db.session.execute(_REVOCATIONS_QUERY).all())
+
+
+async def refresh_revocations_async(session_factory):
+    """refresh_revocations() for the ASGI app; afterwards is_revoked() needs no query."""
+    if not _revocations_stale():
+        return
+
+    async with _revoked_async_lock:
+        if _revocations_stale():
+            async with session_factory() as session:
+                _load_revocations((await session.execute(_REVOCATIONS_QUERY)).all())
+
+
+def is_revoked(certificate_id, issued_at):
+    refresh_revocations()
+    revoked_at = _revoked.get(certificate_id)
+    return revoked_at is not None and issued_at <= revoked_at
+
+
+def revoke_credentials(certificate_id, reason=None):
+    """Voids every credential issued so far for the certificate. Caller commits."""
+    _revoke(db.session, certificate_id, reason)
+
+
+def _revoke(session, certificate_id, reason):
+    entry = session.get(RevokedCredential, certificate_id) or RevokedCredential(certificate_id=certificate_id)
+    entry.revoked_at = datetime.utcnow()
+    entry.reason = reason
+    session.add(entry)
+    # this process's revocation set follows once the revocation is committed
+    session.info.setdefault("revoked_credentials", {})[certificate_id] = _epoch(entry.revoked_at)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _revoke_changed_certificates(session, flush_context, instances):
+    changed = [
+        obj.certificate_id for obj in session.dirty
+        if isinstance(obj, Certificate) and obj.certificate_id is not None
+        and any(inspect(obj).attrs[column].history.has_changes() for column in CERTIFICATE_CREDENTIAL_COLUMNS)
+    ]
+    with session.no_autoflush:
+        for certificate_id in changed:
+            _revoke(session, certificate_id, "updated")
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _apply_revocations(session):
+    _revoked.update(session.info.pop("revoked_credentials", {}))
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_revocations(session):
+    session.info.pop("revoked_credentials", None)
+
+
+def _epoch(naive_utc):
+    return naive_utc.replace(tzinfo=timezone.utc).timestamp()
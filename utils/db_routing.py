@@ -0,0 +1,193 @@
+# utils/db_routing.py
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.util import find_tables
+
+REPLICA_BIND_PREFIX = "replica_"
+SHARD_BIND_PREFIX = "shard_"
+STICKY_SESSION_KEY = "_db_primary_until"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# One institution's data; with shards configured these tables live in the institution's shard (see utils.sharding)
+SHARDED_TABLES = frozenset({
+    "certificates", "certificate_match_keys", "certificate_batches",
+    "verifications", "confirmation_tasks", "verification_archive",
+})
+
+# Explicit override set by use_primary() / use_replica(): "primary", "replica" or None
+_forced_route = ContextVar("db_forced_route", default=None)
+# Shard set by use_shard(); the request's own institution otherwise
+_shard_scope = ContextVar("db_shard_scope", default=None)
+
+
+class ShardScopeError(RuntimeError):
+    """A query on a sharded table with no shard in scope."""
+
+
+class RoutingSession(Session):
+    """
+    Session that sends writes to the primary engine and reads to a replica.
+
+    Reads go to a replica only for safe requests (GET/HEAD) that have not
+    written anything yet and whose client is not inside the read-your-writes
+    window opened by a previous write. Outside a request (CLI, jobs) reads
+    use the primary unless wrapped in use_replica().
+
+    With shards configured, statements on SHARDED_TABLES go to one shard
+    instead: the one a flush writes to (see utils.sharding), else the one
+    set by use_shard(), else the request's institution, else the one this
+    session last wrote to (so objects just committed can be read back).
+    Shards have no replicas.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+        if bind is None and engine is self._db.engines.get(None) and shard_engines(self._db) \
+                and _is_sharded(mapper, clause):
+            return self._shard_engine()
+
+        if bind is not None or self._flushing or isinstance(clause, sa.sql.dml.UpdateBase):
+            _mark_write()
+            return engine
+
+        # Models with their own __bind_key__ are never rerouted
+        if engine is not self._db.engines.get(None):
+            return engine
+
+        replicas = replica_engines(self._db)
+        if not replicas or not _reads_from_replica():
+            return engine
+
+        return random.choice(replicas)
+
+    def _shard_engine(self):
+        name = self.info.get("flush_shard") if self._flushing else None
+        name = name or current_shard() or self.info.get("last_shard")
+        if name is None:
+            raise ShardScopeError("No shard in scope for a query on an institution's data; "
+                                  "wrap it in use_shard() or fan it out (utils.sharding)")
+        engine = self._db.engines.get(SHARD_BIND_PREFIX + name)
+        if engine is None:
+            raise ShardScopeError(f"Unknown shard {name!r}")
+        return engine
+
+
+def replica_engines(db):
+    return [
+        engine for key, engine in sorted(db.engines.items(), key=lambda item: str(item[0]))
+        if key and key.startswith(REPLICA_BIND_PREFIX)
+    ]
+
+
+def shard_engines(db):
+    """{shard name: engine}, empty unless SQLALCHEMY_SHARD_URIS is set."""
+    return {
+        key[len(SHARD_BIND_PREFIX):]: engine for key, engine in db.engines.items()
+        if key and key.startswith(SHARD_BIND_PREFIX)
+    }
+
+
+def _is_sharded(mapper, clause):
+    if mapper is not None:
+        return sa.inspect(mapper).local_table.name in SHARDED_TABLES
+    return clause is not None and any(
+        getattr(table, "name", None) in SHARDED_TABLES for table in find_tables(clause, include_crud=True)
+    )
+
+
+def current_shard():
+    """The shard set by use_shard(), else the one of the institution the current request acts for, else None."""
+    return _shard_scope.get() or _request_shard()
+
+
+def _request_shard():
+    """Cached on g once known."""
+    if not has_request_context():
+        return None
+    if g.get("_db_shard") is None:
+        resolver = current_app.extensions.get("db_shard_resolver")
+        g._db_shard = resolver() if resolver else None
+    return g._db_shard
+
+
+def _mark_write():
+    if has_request_context():
+        g._db_wrote = True
+
+
+def _reads_from_replica():
+    forced = _forced_route.get()
+    if forced is not None:
+        return forced == "replica"
+
+    if not has_request_context():
+        return False
+
+    if g.get("_db_wrote") or request.method in WRITE_METHODS:
+        return False
+
+    return session.get(STICKY_SESSION_KEY, 0) < time.time()
+
+
+@contextmanager
+def use_primary():
+    token = _forced_route.set("primary")
+    try:
+        yield
+    finally:
+        _forced_route.reset(token)
+
+
+@contextmanager
+def use_replica():
+    """Route reads to a replica, e.g. for reporting queries run outside a request."""
+    token = _forced_route.set("replica")
+    try:
+        yield
+    finally:
+        _forced_route.reset(token)
+
+
+@contextmanager
+def use_shard(name):
+    """Send statements on sharded tables to the named shard (None: no override)."""
+    token = _shard_scope.set(name)
+    try:
+        yield
+    finally:
+        _shard_scope.reset(token)
+
+
+def init_app(app):
+    """
+    Registers one bind per SQLALCHEMY_REPLICA_URIS and SQLALCHEMY_SHARD_URIS
+    entry. Must run before db.init_app(app) so Flask-SQLAlchemy creates the
+    replica and shard engines.
+    """
+    uris = app.config.get("SQLALCHEMY_REPLICA_URIS") or []
+    shards = app.config.get("SQLALCHEMY_SHARD_URIS") or {}
+    if not uris and not shards:
+        return
+
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for i, uri in enumerate(uris):
+        binds[f"{REPLICA_BIND_PREFIX}{i}"] = uri
+    for name, uri in shards.items():
+        binds[f"{SHARD_BIND_PREFIX}{name}"] = uri
+    app.config["SQLALCHEMY_BINDS"] = binds
+    if not uris:
+        return
+
+    @app.after_request
+    def keep_primary_after_write(response):
+        # Read-your-writes: this client reads from the primary for a while
+        if g.get("_db_wrote") or request.method in WRITE_METHODS:
+            session[STICKY_SESSION_KEY] = time.time() + app.config["SQLALCHEMY_REPLICA_STICKY_SECONDS"]
+        return response
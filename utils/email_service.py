@@ -3,9 +3,12 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+from utils.tracing import span
+
 def send_email(to, subject, body, from_email="noreply@example.com", smtp_server="smtp.example.com", smtp_port=587, username="", password=""):
     """
-    Sends a simple email using SMTP.
+    Sends a simple email using SMTP. Returns True if the server accepted it,
+    False (after logging the error) if not.
     """
     msg = MIMEMultipart()
     msg["From"] = from_email
@@ -14,12 +17,18 @@ def send_email(to, subject, body, from_email="noreply@example.com", smtp_server=
 
     msg.attach(MIMEText(body, "html"))  # HTML body
 
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            if username and password:
-                server.login(username, password)
-            server.sendmail(from_email, to, msg.as_string())
-        print(f"Email sent to {to}")
-    except Exception as e:
-        print(f"Failed to send email to {to}: {e}")
+    # connect, STARTTLS, login and send, as one span when the request is traced
+    with span("smtp.send", "client", **{"server.address": smtp_server, "server.port": smtp_port}) as traced:
+        try:
+            with smtplib.SMTP(smtp_server, smtp_port) as server:
+                server.starttls()
+                if username and password:
+                    server.login(username, password)
+                server.sendmail(from_email, to, msg.as_string())
+            print(f"Email sent to {to}")
+            return True
+        except Exception as e:
+            if traced:
+                traced.record_error(e)
+            print(f"Failed to send email to {to}: {e}")
+            return False
@@ -0,0 +1,227 @@
+# utils/federation.py
+"""
+Concurrent lookups against institutions' own records systems (Institution.api_url).
+
+All requests of a process share one httpx.AsyncClient running on a background
+event loop thread, so connections are pooled and kept alive across jobs.
+Each institution has its own circuit breaker; each host its own connection
+limit. Successful answers are cached for FEDERATION_CACHE_SECONDS, at most
+FEDERATION_CACHE_SIZE of them (least recently used go first). Timeouts,
+connection errors, 429 and 5xx are retried; any other 4xx is the
+institution rejecting the request and is returned at once.
+
+The institution API is expected to accept
+    POST <api_url>  {"student_number", "student_name", "course_name", "graduation_year"}
+and answer with a JSON object, e.g. {"found": true, "verified": true}.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+
+class CircuitBreaker:
+    """
+    closed -> open after N consecutive failures -> half_open after reset_timeout.
+    half_open lets a single trial request through; its outcome closes or reopens
+    the breaker. A trial that never reports back is replaced after reset_timeout.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "open":
+            return False
+        if state == "half_open":
+            now = time.monotonic()
+            if self.trial_started is not None and now - self.trial_started < self.reset_timeout:
+                return False
+            self.trial_started = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold or self.state == "half_open":
+            self.opened_at = time.monotonic()
+        self.trial_started = None
+
+
+class TTLCache:
+    """Bounded LRU of (expires_at, value); only used from the client's event loop thread."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return item[1]
+
+    def set(self, key, value):
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+
+def _retryable(error):
+    """Transport errors, 429 and 5xx may pass; other 4xx will not."""
+    import httpx
+
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class FederationClient:
+    def __init__(self, config):
+        self.config = config
+        self.breakers = {}        # institution_id -> CircuitBreaker
+        self.cache = TTLCache(    # (api_url, sorted payload items) -> response
+            config["FEDERATION_CACHE_SIZE"], config["FEDERATION_CACHE_SECONDS"],
+        )
+        self._host_limits = {}    # host -> asyncio.Semaphore
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="federation-loop", daemon=True)
+        self._thread.start()
+
+    def breaker(self, institution_id):
+        breaker = self.breakers.get(institution_id)
+        if breaker is None:
+            breaker = self.breakers[institution_id] = CircuitBreaker(
+                self.config["FEDERATION_BREAKER_FAILURES"],
+                self.config["FEDERATION_BREAKER_RESET_SECONDS"],
+            )
+        return breaker
+
+    def lookup_many(self, queries):
+        """
+        queries: [(institution_id, api_url, payload), ...]
+        Runs them concurrently and returns one result dict per query, in order.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._lookup_many(queries), self._loop)
+        return future.result()
+
+    async def _lookup_many(self, queries):
+        if self._client is None:
+            import httpx  # deferred: costs ~0.1 s at import and most processes never federate
+
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.config["FEDERATION_TIMEOUT_SECONDS"]),
+                limits=httpx.Limits(
+                    max_connections=self.config["FEDERATION_MAX_CONNECTIONS"],
+                    max_keepalive_connections=self.config["FEDERATION_MAX_CONNECTIONS"],
+                ),
+            )
+        return await asyncio.gather(*(self._lookup(*query) for query in queries))
+
+    def _host_limit(self, api_url):
+        host = urlsplit(api_url).netloc
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = self._host_limits[host] = asyncio.Semaphore(
+                self.config["FEDERATION_MAX_CONNECTIONS_PER_HOST"]
+            )
+        return semaphore
+
+    async def _lookup(self, institution_id, api_url, payload):
+        import httpx
+
+        result = {"institution_id": institution_id}
+
+        cache_key = (api_url, tuple(sorted(payload.items())))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return {**result, "status": "ok", "cached": True, "response": cached}
+
+        breaker = self.breaker(institution_id)
+        if not breaker.allow():
+            return {**result, "status": "circuit_open"}
+
+        retries = self.config["FEDERATION_RETRIES"]
+        backoff = self.config["FEDERATION_BACKOFF_SECONDS"]
+        started = time.perf_counter()
+
+        for attempt in range(retries + 1):
+            try:
+                async with self._host_limit(api_url):
+                    response = await self._client.post(api_url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                if isinstance(e, httpx.HTTPStatusError) and not _retryable(e):
+                    # the institution answered; it just refused this request
+                    breaker.record_success()
+                    return {**result, "status": "error", "error": str(e),
+                            "http_status": e.response.status_code, "attempts": attempt + 1}
+                if attempt == retries:
+                    breaker.record_failure()
+                    return {**result, "status": "error", "error": str(e) or type(e).__name__,
+                            "attempts": attempt + 1}
+                # exponential backoff with full jitter
+                await asyncio.sleep(random.uniform(0, backoff * 2 ** attempt))
+                continue
+
+            breaker.record_success()
+            self.cache.set(cache_key, data)
+            return {**result, "status": "ok", "cached": False, "response": data,
+                    "attempts": attempt + 1, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+_clients = {}  # pid -> FederationClient (threads do not survive a fork)
+_clients_lock = threading.Lock()
+
+
+def get_federation_client(config):
+    pid = os.getpid()
+    client = _clients.get(pid)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(pid)
+            if client is None:
+                _clients.clear()
+                client = _clients[pid] = FederationClient(config)
+    return client
+
+
+def certificate_payload(cert):
+    return {
+        "student_number": cert.student_number,
+        "student_name": cert.student_name,
+        "course_name": cert.course_name,
+        "graduation_year": cert.graduation_year,
+    }
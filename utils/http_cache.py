@@ -0,0 +1,170 @@
+# utils/http_cache.py
+"""
+Response caching for rarely changing reference data (the institution list).
+
+A row in cache_generations is incremented in the same transaction as any
+Institution insert, update or delete. Each worker keeps the institution
+list precomputed for the generation it last saw and re-checks the counter
+at most every INSTITUTION_CACHE_CHECK_SECONDS (immediately after its own
+writes). Responses carry an ETag derived from the generation, so
+revalidating clients get a 304 without the list being rebuilt or rendered.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import current_app, make_response, request, session
+from sqlalchemy import event
+
+from models import db, CacheGeneration, Institution
+from utils.db_routing import RoutingSession, use_primary
+
+INSTITUTIONS = "institutions"
+
+
+# --------------------------
+# Generation counters
+# --------------------------
+@event.listens_for(RoutingSession, "after_flush")
+def _bump_institution_generation(session, flush_context):
+    if not any(isinstance(obj, Institution) for obj in (*session.new, *session.dirty, *session.deleted)):
+        return
+
+    table = CacheGeneration.__table__
+    result = session.execute(
+        table.update().where(table.c.name == INSTITUTIONS).values(generation=table.c.generation + 1)
+    )
+    if not result.rowcount:
+        session.execute(table.insert().values(name=INSTITUTIONS, generation=1))
+    session.info.setdefault("changed_generations", set()).add(INSTITUTIONS)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _invalidate_local_caches(session):
+    for name in session.info.pop("changed_generations", ()):
+        _caches[name].invalidate()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_generation_changes(session):
+    session.info.pop("changed_generations", None)
+
+
+def read_generation(name):
+    # a lagging replica would pin the old list for another check interval
+    with use_primary():
+        return db.session.query(CacheGeneration.generation).filter(CacheGeneration.name == name).scalar() or 0
+
+
+# --------------------------
+# Precomputed data sets
+# --------------------------
+class GenerationCache:
+    """Holds one computed value per process, rebuilt when its generation moves."""
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self._lock = threading.Lock()
+        self._generation = None
+        self._value = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def get(self):
+        """Returns (generation, value)."""
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at < current_app.config["INSTITUTION_CACHE_CHECK_SECONDS"]:
+            return self._generation, self._value
+
+        with self._lock:
+            generation = read_generation(self.name)
+            if generation != self._generation:
+                self._value = self.build()
+                self._generation = generation
+            self._checked_at = now
+            return self._generation, self._value
+
+
+def _build_institution_list():
+    rows = [
+        {
+            "institution_id": institution_id,
+            "institution_name": name,
+            "address": address,
+            "contact_email": email,
+            "contact_phone": phone,
+            # short names used by the verification form and the JSON endpoint
+            "id": institution_id,
+            "name": name,
+            "email": email,
+        }
+        for institution_id, name, address, email, phone in db.session.query(
+            Institution.institution_id, Institution.institution_name, Institution.address,
+            Institution.contact_email, Institution.contact_phone,
+        ).order_by(Institution.institution_id)
+    ]
+    body = json.dumps([{"id": r["id"], "name": r["name"], "email": r["email"]} for r in rows]).encode()
+    names = {r["institution_id"]: r["institution_name"] for r in rows}
+    return {"rows": rows, "json": body, "names": names}
+
+
+_caches = {INSTITUTIONS: GenerationCache(INSTITUTIONS, _build_institution_list)}
+
+
+def institution_list():
+    """(generation, {"rows": [...], "json": bytes, "names": {id: name}}) for the current institution table."""
+    return _caches[INSTITUTIONS].get()
+
+
+# --------------------------
+# Conditional responses
+# --------------------------
+_templates_version = None
+
+
+def templates_version():
+    """Changes when templates are deployed, so cached pages are not reused across releases."""
+    global _templates_version
+    if _templates_version is None:
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        _templates_version = max(
+            (os.stat(os.path.join(root, f)).st_mtime_ns for root, _, files in os.walk(folder) for f in files),
+            default=0,
+        )
+    return _templates_version
+
+
+def make_etag(generation, per_user=False):
+    key = f"{INSTITUTIONS}:{generation}"
+    if per_user:
+        # pages render the user's name and role in the layout
+        key += f":{templates_version()}:{session.get('user_id')}:{session.get('username')}:{session.get('role')}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def conditional_response(etag, render, private=False):
+    """
+    304 if the client already holds this version, otherwise render().
+    Responses carrying flashed messages are one-off and never cached.
+    """
+    if "_flashes" in session:
+        response = make_response(render())
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    # weak comparison: compressed responses carry W/ versions of the same tag
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+
+    max_age = current_app.config["INSTITUTION_CACHE_MAX_AGE"]
+    scope = "private" if private else "public"
+    response.headers["Cache-Control"] = f"{scope}, max-age={max_age}" if max_age else f"{scope}, no-cache"
+    response.set_etag(etag)
+    return response
@@ -0,0 +1,237 @@
+# utils/idempotency.py
+"""
+Idempotency-Key support for state-changing endpoints.
+
+A client that may send the same request twice (double-clicked submit,
+retried upload) sends an `Idempotency-Key` header, or an
+`idempotency_key` form field for plain HTML forms. The first request
+with a given key runs; its response is stored in idempotency_keys for
+IDEMPOTENCY_TTL_SECONDS and replayed to every later request with that key
+(marked `Idempotent-Replayed: true`). Keys are scoped to the caller:
+logged-in user, API token or client address.
+
+Copies that arrive while the first is still running are coalesced:
+inside one process they wait on the leader's result (single flight); in
+other processes they see the claimed row and poll it until the response
+is stored. Reusing a key with a different body is rejected with 422.
+Responses with a 5xx status are not stored, so the client can retry.
+Secrets shown once (SECRET_FIELDS in a JSON response, e.g. a new webhook
+signing secret or API token) are never stored: replays carry null instead.
+
+Bookkeeping uses its own connection to the primary, independent of the
+view's session and transaction.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, g, jsonify, request, session
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+
+HEADER = "Idempotency-Key"
+FORM_FIELD = "idempotency_key"
+MAX_KEY_LENGTH = 255
+STORED_HEADERS = ("content-type", "location", "retry-after")
+SECRET_FIELDS = ("secret", "api_token")
+
+
+class _Flight:
+    """The in-process leader for a key; followers wait on `done`."""
+
+    def __init__(self, request_digest):
+        self.request_digest = request_digest
+        self.done = threading.Event()
+        self.result = None  # (status, headers, body) once the leader has a response
+
+
+_flights = {}  # key digest -> _Flight
+_lock = threading.Lock()
+
+
+# --------------------------
+# Request identity
+# --------------------------
+def _caller():
+    if session.get("user_id"):
+        return f"user:{session['user_id']}"
+    if g.get("api_institution_id"):
+        return f"token:{g.api_institution_id}"
+    return f"addr:{request.remote_addr}"
+
+
+def _request_digest():
+    """sha256 over method, path, query and body (form fields and uploaded file contents for forms)."""
+    digest = hashlib.sha256(f"{request.method}\0{request.path}\0{request.query_string.decode()}\0".encode())
+    if request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        for name, value in sorted(request.form.items(multi=True)):
+            if name not in (FORM_FIELD, "csrf_token"):
+                digest.update(f"{name}\0{value}\0".encode())
+        for name, upload in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"{name}\0{upload.filename}\0".encode())
+            for chunk in iter(lambda: upload.stream.read(65536), b""):
+                digest.update(chunk)
+            upload.stream.seek(0)
+    else:
+        digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+# --------------------------
+# Stored responses
+# --------------------------
+def _snapshot(response):
+    headers = [[name, value] for name, value in response.headers if name.lower() in STORED_HEADERS]
+    return response.status_code, headers, _redacted(response)
+
+
+def _redacted(response):
+    """The body to store: SECRET_FIELDS of a JSON object are nulled, the client got them once."""
+    body = response.get_data()
+    if not response.is_json:
+        return body
+    data = response.get_json(silent=True)
+    if not isinstance(data, dict) or not any(data.get(name) is not None for name in SECRET_FIELDS):
+        return body
+    return json.dumps({**data, **{name: None for name in SECRET_FIELDS if name in data}}).encode()
+
+
+def _replay(result):
+    status, headers, body = result
+    response = current_app.response_class(body, status=status, headers=[tuple(header) for header in headers])
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _conflict(message, status):
+    response = jsonify({"error": message})
+    if status == 409:
+        response.headers["Retry-After"] = "1"
+    return response, status
+
+
+def _claim(key_digest, request_digest):
+    """None if this request now owns the key, else the response to send instead."""
+    config = current_app.config
+    table = IdempotencyKey.__table__
+    deadline = time.monotonic() + config["IDEMPOTENCY_WAIT_SECONDS"]
+
+    while True:
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(table.insert().values(
+                    key_digest=key_digest, request_digest=request_digest, status="in_progress",
+                    created_at=now, expires_at=now + timedelta(seconds=config["IDEMPOTENCY_TTL_SECONDS"]),
+                ))
+            return None
+        except IntegrityError:
+            pass
+
+        with db.engine.begin() as conn:
+            row = conn.execute(table.select().where(table.c.key_digest == key_digest)).first()
+            if row is not None and row.expires_at <= now:
+                conn.execute(table.delete().where(table.c.key_digest == key_digest))
+                continue
+        if row is None:
+            continue  # the owner gave up (5xx); try to take over
+        if row.request_digest != request_digest:
+            return _conflict("Idempotency-Key was already used for a different request", 422)
+        if row.status == "completed":
+            return _replay((row.response_status, json.loads(row.response_headers), row.response_body))
+        if time.monotonic() > deadline:
+            return _conflict("A request with this Idempotency-Key is still in progress", 409)
+        time.sleep(config["IDEMPOTENCY_POLL_SECONDS"])
+
+
+def _finish(key_digest, result):
+    """Stores the response, or releases the key when there is nothing to replay."""
+    table = IdempotencyKey.__table__
+    with db.engine.begin() as conn:
+        if result is None or result[0] >= 500:
+            conn.execute(table.delete().where(table.c.key_digest == key_digest))
+        else:
+            status, headers, body = result
+            conn.execute(table.update().where(table.c.key_digest == key_digest).values(
+                status="completed", response_status=status, response_headers=json.dumps(headers),
+                response_body=body,
+            ))
+
+
+# --------------------------
+# Decorator
+# --------------------------
+def idempotent(view):
+    """Honours Idempotency-Key on this view. Place it below login_required / token_required."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER) or request.form.get(FORM_FIELD)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _conflict(f"{HEADER} must be at most {MAX_KEY_LENGTH} characters", 400)
+
+        key_digest = hashlib.sha256(f"{_caller()}\0{key}".encode()).hexdigest()
+        request_digest = _request_digest()
+
+        with _lock:
+            flight = _flights.get(key_digest)
+            leader = flight is None
+            if leader:
+                flight = _flights[key_digest] = _Flight(request_digest)
+
+        if not leader:
+            if flight.request_digest != request_digest:
+                return _conflict("Idempotency-Key was already used for a different request", 422)
+            if not flight.done.wait(current_app.config["IDEMPOTENCY_WAIT_SECONDS"]) or flight.result is None:
+                return _conflict("A request with this Idempotency-Key is still in progress", 409)
+            return _replay(flight.result)
+
+        try:
+            stored = _claim(key_digest, request_digest)
+            if stored is not None:
+                response = current_app.make_response(stored)
+                flight.result = None if response.is_streamed else _snapshot(response)
+                return response
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                _finish(key_digest, None)
+                raise
+            # whatever the view left uncommitted would be discarded at teardown anyway
+            db.session.rollback()
+            flight.result = None if response.is_streamed else _snapshot(response)
+            _finish(key_digest, flight.result)
+            return response
+        finally:
+            flight.done.set()
+            with _lock:
+                _flights.pop(key_digest, None)
+
+    return wrapper
+
+
+# --------------------------
+# Maintenance
+# --------------------------
+def purge_idempotency_keys(now=None, chunk_size=None):
+    """Deletes expired keys, chunk_size rows per transaction. Returns the number deleted."""
+    now = now or datetime.utcnow()
+    chunk_size = chunk_size or current_app.config["IDEMPOTENCY_PURGE_CHUNK"]
+    table = IdempotencyKey.__table__
+    deleted = 0
+    while True:
+        with db.engine.begin() as conn:
+            keys = conn.execute(
+                db.select(table.c.key_digest).where(table.c.expires_at < now).limit(chunk_size)
+            ).scalars().all()
+            if not keys:
+                return deleted
+            conn.execute(table.delete().where(table.c.key_digest.in_(keys)))
+        deleted += len(keys)
@@ -0,0 +1,248 @@
+# utils/live_updates.py
+"""
+Pub/sub for live institution dashboards, across worker processes.
+
+Verification inserts and status changes are collected during the flush and,
+once the transaction commits, written to the live_events table. Every
+process that has open dashboards runs one poller thread that reads new
+events every LIVE_POLL_SECONDS and pushes them to its local subscribers,
+so a dashboard sees writes made by any worker (or by CLI jobs). Event ids
+are the table's ids, so a reconnecting client catches up via Last-Event-ID
+whichever worker it lands on. Events older than LIVE_EVENT_RETENTION_SECONDS
+are purged by the pollers.
+
+Each open dashboard holds a Subscription (a bounded queue) that the SSE
+endpoint drains. Under gevent/eventlet workers the lock and queue are
+cooperative, so one worker can keep hundreds of idle streams open; under
+gthread every stream occupies a thread, which is why LIVE_MAX_STREAMS caps
+them per worker.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from models import db, Certificate, LiveEvent, Verification
+from utils.db_routing import RoutingSession
+
+CREATED_EVENT = "verification.created"
+STATUS_CHANGED_EVENT = "verification.status_changed"
+
+
+class Subscription:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # the client is not keeping up; end its stream so it reconnects and replays
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next (event_id, event_type, data), or None on timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Fans events out to this process's subscriptions."""
+
+    def __init__(self, queue_size=200, backlog_size=100):
+        self.queue_size = queue_size
+        self.backlog_size = backlog_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._cursor = None     # id of the last event published here
+        self._poller_pid = None
+        self._last_purge = 0.0
+
+    def subscribe(self, channel, last_event_id=None):
+        """Call inside an app context; the backlog since last_event_id is read from live_events."""
+        self._ensure_poller(current_app._get_current_object())
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            # under the lock the poller cannot publish, so the backlog ends where it will continue
+            if last_event_id is not None and self._cursor is not None:
+                for item in _read_backlog(channel, last_event_id, self._cursor, self.backlog_size):
+                    subscription.push(item)
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, events):
+        """events: (event_id, channel, event_type, data) in id order, as read by the poller."""
+        with self._lock:
+            for event_id, channel, event_type, data in events:
+                for subscription in self._subscribers.get(channel, ()):
+                    subscription.push((event_id, event_type, data))
+                self._cursor = event_id
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    # --------------------------
+    # Poller (one thread per process)
+    # --------------------------
+    def _ensure_poller(self, app):
+        with self._lock:
+            if self._poller_pid == os.getpid():
+                return
+            # first stream in this process (workers fork after the app is built)
+            self._poller_pid = os.getpid()
+            self._cursor = _latest_event_id()
+        threading.Thread(target=self._run, args=(app,), name="live-events", daemon=True).start()
+
+    def _run(self, app):
+        with app.app_context():
+            interval = app.config["LIVE_POLL_SECONDS"]
+            while True:
+                time.sleep(interval)
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"Live event poll failed: {e}")
+
+    def poll(self, chunk_size=1000):
+        while True:
+            events = _read_events_after(self._cursor, chunk_size)
+            self.publish(events)
+            if len(events) < chunk_size:
+                break
+
+        retention = current_app.config["LIVE_EVENT_RETENTION_SECONDS"]
+        if time.monotonic() - self._last_purge >= min(retention, 60):
+            self._last_purge = time.monotonic()
+            _purge_events(datetime.utcnow() - timedelta(seconds=retention))
+
+
+broker = Broker()
+
+
+def configure(config):
+    global broker
+    broker = Broker(config["LIVE_QUEUE_SIZE"], config["LIVE_BACKLOG_SIZE"])
+
+
+# --------------------------
+# live_events table (primary database, own short transactions)
+# --------------------------
+def _latest_event_id():
+    with db.engine.connect() as conn:
+        return conn.execute(db.select(db.func.max(LiveEvent.event_id))).scalar() or 0
+
+
+def _read_events_after(cursor, limit):
+    with db.engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(
+            db.select(LiveEvent.event_id, LiveEvent.channel, LiveEvent.event_type, LiveEvent.data)
+            .where(LiveEvent.event_id > cursor)
+            .order_by(LiveEvent.event_id)
+            .limit(limit)
+        )]
+
+
+def _read_backlog(channel, after_id, up_to_id, limit):
+    """The newest `limit` events of the channel in (after_id, up_to_id], oldest first."""
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            db.select(LiveEvent.event_id, LiveEvent.event_type, LiveEvent.data)
+            .where(LiveEvent.channel == channel, LiveEvent.event_id > after_id, LiveEvent.event_id <= up_to_id)
+            .order_by(LiveEvent.event_id.desc())
+            .limit(limit)
+        ).all()
+    return [tuple(row) for row in reversed(rows)]
+
+
+def _write_events(events):
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        conn.execute(LiveEvent.__table__.insert(), [
+            {"channel": channel, "event_type": event_type, "data": data, "created_at": now}
+            for channel, event_type, data in events
+        ])
+
+
+def _purge_events(before):
+    with db.engine.begin() as conn:
+        conn.execute(LiveEvent.__table__.delete().where(LiveEvent.created_at < before))
+
+
+def format_sse(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# --------------------------
+# Feed from verification writes
+# --------------------------
+def verification_event(ver, cert):
+    return {
+        "verification_id": ver.verification_id,
+        "certificate_id": ver.certificate_id,
+        "student_name": cert.student_name if cert else None,
+        "course_name": cert.course_name if cert else None,
+        "graduation_year": cert.graduation_year if cert else None,
+        "status": ver.status,
+        "verified_at": ver.verified_at.isoformat() if ver.verified_at else None,
+        "task_id": ver.task_id,
+    }
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_verification_events(session, flush_context):
+    changes = [(obj, CREATED_EVENT) for obj in session.new if isinstance(obj, Verification)]
+    for obj in session.dirty:
+        if isinstance(obj, Verification) and inspect(obj).attrs.status.history.has_changes():
+            changes.append((obj, STATUS_CHANGED_EVENT))
+
+    if not changes:
+        return
+
+    pending = session.info.setdefault("live_events", [])
+    with session.no_autoflush:
+        for ver, event_type in changes:
+            cert = session.get(Certificate, ver.certificate_id) if ver.certificate_id else None
+            # the dashboard lists verifications by the certificate's institution
+            channel = cert.institution_id if cert else ver.verified_by_institution_id
+            if channel:
+                pending.append((channel, event_type, verification_event(ver, cert)))
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _publish_verification_events(session):
+    events = session.info.pop("live_events", None)
+    if not events:
+        return
+    try:
+        _write_events(events)
+    except Exception as e:
+        # the change itself is committed; dashboards pick it up on their next reload
+        print(f"Failed to queue {len(events)} live event(s): {e}")
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_verification_events(session):
+    session.info.pop("live_events", None)
@@ -0,0 +1,76 @@
+# utils/lookups.py
+from models import db, Certificate
+from utils.bloom import might_have_student_number
+from utils.db_routing import ShardScopeError
+from utils.sharding import use_institution_shard
+
+# Columns returned by student number lookups
+LOOKUP_COLUMNS = (
+    Certificate.certificate_id,
+    Certificate.student_number,
+    Certificate.student_name,
+    Certificate.course_name,
+    Certificate.graduation_year,
+    Certificate.verified,
+)
+
+
+def student_numbers_query(institution_id, student_numbers):
+    """One SELECT for any number of student numbers (verified records first)."""
+    return (
+        db.select(*LOOKUP_COLUMNS)
+        .where(
+            Certificate.institution_id == institution_id,
+            Certificate.student_number.in_(student_numbers),
+        )
+        .order_by(Certificate.verified.desc(), Certificate.certificate_id)
+    )
+
+
+def lookup_result(row):
+    if row is None:
+        return {"status": "not_found"}
+    return {
+        "status": "valid" if row.verified else "pending",
+        "certificate_id": row.certificate_id,
+        "student_name": row.student_name,
+        "course_name": row.course_name,
+        "graduation_year": row.graduation_year,
+    }
+
+
+def public_lookup_result(result):
+    """What unauthenticated callers may see of a lookup_result(): found or not_found, nothing more."""
+    return {"status": "not_found" if result["status"] == "not_found" else "found"}
+
+
+def lookup_student_numbers(institution_id, student_numbers):
+    """
+    Returns {student_number: result}. Numbers the Bloom filter rules out never
+    reach the database; the rest are resolved together in one query.
+    """
+    candidates = [sn for sn in student_numbers if might_have_student_number(institution_id, sn)]
+
+    found = {}
+    if candidates:
+        try:
+            with use_institution_shard(institution_id):
+                for row in db.session.execute(student_numbers_query(institution_id, candidates)):
+                    found.setdefault(row.student_number, row)
+        except ShardScopeError:
+            pass  # an institution no shard knows has no certificates
+
+    return {sn: lookup_result(found.get(sn)) for sn in student_numbers}
+
+
+async def lookup_student_numbers_async(session_factory, institution_id, student_numbers):
+    """lookup_student_numbers() for the ASGI app; a session is only opened if the Bloom filter lets a number through."""
+    candidates = [sn for sn in student_numbers if might_have_student_number(institution_id, sn)]
+
+    found = {}
+    if candidates:
+        async with session_factory() as session:
+            for row in await session.execute(student_numbers_query(institution_id, candidates)):
+                found.setdefault(row.student_number, row)
+
+    return {sn: lookup_result(found.get(sn)) for sn in student_numbers}
@@ -0,0 +1,307 @@
+# utils/matching.py
+"""
+Matching verification requests to certificates an institution already holds.
+
+Every certificate has a handful of rows in certificate_match_keys, scoped
+to its institution:
+
+    number  the student number, upper-case alphanumerics only
+    name    Soundex codes of all name parts, sorted ("Banda John" == "Jon Bandah")
+    sound   the Soundex code of each name part
+    tri     the trigrams of each name part (catches typos Soundex misses)
+
+A request is turned into the same keys. A first query counts each key's
+postings on the covering index; keys shared by more than
+MATCH_MAX_POSTINGS certificates (a common surname, the trigram "an ")
+say little and are skipped. A second query reads the remaining postings,
+and the best MATCH_CANDIDATES by weighted key hits (plus any tied with
+the last of them) are scored field by field.
+
+Keys are kept current by mapper events, so ORM writes need nothing else;
+`manage.py build-match-keys` rebuilds them after bulk loads.
+"""
+import re
+import unicodedata
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+from flask import current_app
+from sqlalchemy import event, inspect, select, text
+
+from models import db, Certificate, CertificateMatchKey
+from utils.sharding import each_shard
+
+KEY_WEIGHTS = {"number": 10.0, "name": 4.0, "sound": 1.0, "tri": 0.25}
+FIELD_WEIGHTS = {"name": 0.4, "number": 0.35, "year": 0.1, "course": 0.15}
+
+# course and year are the per-field similarities (None when either side lacks the field)
+Match = namedtuple("Match", "certificate_id score exact verified course year")
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"), "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+# --------------------------
+# Normalization and keys
+# --------------------------
+def normalize_name(name):
+    """Lower-case ASCII name parts, accents removed, in sorted order."""
+    value = unicodedata.normalize("NFKD", name or "")
+    value = "".join(c for c in value if not unicodedata.combining(c)).lower()
+    return " ".join(sorted(re.findall(r"[a-z]+", value)))
+
+
+def normalize_number(student_number):
+    return re.sub(r"[^0-9A-Z]", "", (student_number or "").upper())
+
+
+def soundex(word):
+    first, previous, code = word[0].upper(), _SOUNDEX_CODES.get(word[0]), ""
+    for char in word[1:]:
+        digit = _SOUNDEX_CODES.get(char)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 3:
+                break
+        if char not in "hw":  # h and w do not separate equal codes
+            previous = digit
+    return (first + code).ljust(4, "0")
+
+
+def trigrams(words):
+    """Trigrams of each word, padded so that first and last letters count."""
+    grams = set()
+    for word in words.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def match_keys(student_name, student_number):
+    """The set of (kind, key) a certificate is indexed under."""
+    keys = set()
+    number = normalize_number(student_number)
+    if number:
+        keys.add(("number", number[:40]))
+
+    name = normalize_name(student_name)
+    parts = name.split()
+    if parts:
+        codes = [soundex(part) for part in parts]
+        keys.add(("name", " ".join(sorted(codes))[:40]))
+        keys.update(("sound", code) for code, part in zip(codes, parts) if len(part) > 1)
+        keys.update(("tri", gram) for gram in trigrams(name))
+    return keys
+
+
+# --------------------------
+# Scoring
+# --------------------------
+def similarity(a, b):
+    """Dice coefficient of the trigram sets (0..1)."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def score_candidate(submitted, candidate):
+    """(score 0..1, exact, parts) for two dicts with student_name, student_number, course_name, graduation_year."""
+    parts = {}
+    name_a, name_b = normalize_name(submitted["student_name"]), normalize_name(candidate["student_name"])
+    parts["name"] = 1.0 if name_a == name_b else similarity(name_a, name_b)
+
+    number_a, number_b = normalize_number(submitted["student_number"]), normalize_number(candidate["student_number"])
+    if number_a and number_b:
+        parts["number"] = 1.0 if number_a == number_b else similarity(number_a.lower(), number_b.lower()) / 2
+
+    year_a, year_b = submitted.get("graduation_year"), candidate.get("graduation_year")
+    if year_a and year_b:
+        parts["year"] = {0: 1.0, 1: 0.5}.get(abs(int(year_a) - int(year_b)), 0.0)
+
+    course_a, course_b = normalize_name(submitted.get("course_name")), normalize_name(candidate.get("course_name"))
+    if course_a and course_b:
+        parts["course"] = similarity(course_a, course_b)
+
+    weight = sum(FIELD_WEIGHTS[field] for field in parts)
+    score = sum(FIELD_WEIGHTS[field] * value for field, value in parts.items()) / weight
+    # every field must be present on both sides and equal; a missing one is never an exact match
+    exact = (
+        name_a == name_b
+        and parts.get("number") == 1.0
+        and bool(course_a) and course_a == course_b
+        and bool(year_a) and bool(year_b) and int(year_a) == int(year_b)
+    )
+    return round(score, 4), exact, parts
+
+
+# --------------------------
+# Lookup
+# --------------------------
+@lru_cache(maxsize=256)
+def _postings_sql(key_count, count=False, only=None):
+    """UNION ALL of one capped index range scan per key; statements are cached per shape."""
+    column = "count(*)" if count else "certificate_id"
+    parts = [
+        f"SELECT {i} AS key_index, {column} FROM ("
+        f"SELECT certificate_id FROM certificate_match_keys "
+        f"WHERE institution_id = :institution_id AND kind = :kind_{i} AND key = :key_{i} LIMIT :limit"
+        f") AS postings_{i}"
+        for i in (only if only is not None else range(key_count))
+    ]
+    return text(" UNION ALL ".join(parts))
+
+
+def find_matches(institution_id, student_name, student_number, course_name=None, graduation_year=None, limit=5):
+    """Best scoring certificates of this institution for the submitted details, best first."""
+    config = current_app.config
+    keys = sorted(match_keys(student_name, student_number))
+    if not keys:
+        return []
+
+    params = {"institution_id": institution_id, "limit": config["MATCH_MAX_POSTINGS"] + 1}
+    for i, (kind, key) in enumerate(keys):
+        params[f"kind_{i}"], params[f"key_{i}"] = kind, key
+
+    # the mapper routes the textual SQL like a query on the table (to the institution's shard, if any)
+    bind = {"mapper": CertificateMatchKey}
+    # first count each key's postings (index only, capped), then read only the selective ones
+    counts = db.session.execute(_postings_sql(len(keys), count=True), params, bind_arguments=bind)
+    selective = [i for i, count in counts if count < params["limit"]]
+    if not selective:
+        return []
+
+    weights = defaultdict(float)
+    postings = db.session.execute(_postings_sql(len(keys), only=tuple(selective)), params, bind_arguments=bind)
+    for key_index, certificate_id in postings:
+        weights[certificate_id] += KEY_WEIGHTS[keys[key_index][0]]
+    if not weights:
+        return []
+
+    # the best MATCH_CANDIDATES, plus any tied with the last one (namesakes must be compared, not cut off)
+    ranked = sorted(weights, key=weights.get, reverse=True)
+    cutoff = weights[ranked[min(len(ranked), config["MATCH_CANDIDATES"]) - 1]]
+    candidates = [certificate_id for certificate_id in ranked if weights[certificate_id] >= cutoff]
+    rows = db.session.execute(
+        select(Certificate.certificate_id, Certificate.student_name, Certificate.student_number,
+               Certificate.course_name, Certificate.graduation_year, Certificate.verified)
+        .where(Certificate.certificate_id.in_(candidates))
+    ).mappings()
+
+    submitted = {"student_name": student_name, "student_number": student_number,
+                 "course_name": course_name, "graduation_year": graduation_year}
+    matches = []
+    for row in rows:
+        score, exact, parts = score_candidate(submitted, row)
+        matches.append(Match(row["certificate_id"], score, exact, bool(row["verified"]),
+                             parts.get("course"), parts.get("year")))
+    matches.sort(key=lambda match: (match.exact, match.score), reverse=True)
+    return matches[:limit]
+
+
+def best_match(institution_id, student_name, student_number, course_name=None, graduation_year=None):
+    """
+    The top match if it is exact, or clears MATCH_LINK_THRESHOLD without a
+    close runner-up; otherwise None. Without a student number, namesakes can
+    only be told apart by year and course, so any runner-up that also clears
+    the threshold makes the request ambiguous.
+
+    Name and number outweigh the rest, so a student's other qualification
+    (same name, number and year, another course) can clear the threshold on
+    its own; a fuzzy match is only linked when both sides have a year and a
+    course, the years are equal and the courses at least
+    MATCH_COURSE_AGREEMENT alike.
+    """
+    config = current_app.config
+    if not config["MATCH_ENABLED"]:
+        return None
+    matches = find_matches(institution_id, student_name, student_number, course_name, graduation_year, limit=2)
+    if not matches:
+        return None
+    best = matches[0]
+    if best.exact:
+        return best
+    if best.score < config["MATCH_LINK_THRESHOLD"]:
+        return None
+    if best.year != 1.0 or best.course is None or best.course < config["MATCH_COURSE_AGREEMENT"]:
+        return None
+    if len(matches) > 1:
+        runner_up = matches[1]
+        if normalize_number(student_number):
+            ambiguous = best.score - runner_up.score < config["MATCH_AMBIGUITY_MARGIN"]
+        else:
+            ambiguous = runner_up.score >= config["MATCH_LINK_THRESHOLD"]
+        if ambiguous:
+            return None
+    return best
+
+
+# --------------------------
+# Maintenance
+# --------------------------
+def _key_rows(certificate_id, institution_id, student_name, student_number):
+    return [
+        {"certificate_id": certificate_id, "institution_id": institution_id, "kind": kind, "key": key}
+        for kind, key in match_keys(student_name, student_number)
+    ]
+
+
+def rebuild_match_keys(chunk_size=5000):
+    """Recomputes every certificate's keys, shard by shard. Returns the number of key rows written."""
+    return sum(_rebuild_match_keys(chunk_size) for _ in each_shard())
+
+
+def _rebuild_match_keys(chunk_size):
+    table = CertificateMatchKey.__table__
+    db.session.execute(table.delete())
+
+    written, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Certificate.certificate_id, Certificate.institution_id,
+                   Certificate.student_name, Certificate.student_number)
+            .where(Certificate.certificate_id > last_id, Certificate.institution_id.isnot(None))
+            .order_by(Certificate.certificate_id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        key_rows = [key_row for row in rows for key_row in _key_rows(*row)]
+        if key_rows:
+            db.session.execute(table.insert(), key_rows)
+        db.session.commit()
+        written += len(key_rows)
+        last_id = rows[-1][0]
+    db.session.commit()
+    return written
+
+
+def _write_keys(connection, target):
+    table = CertificateMatchKey.__table__
+    connection.execute(table.delete().where(table.c.certificate_id == target.certificate_id))
+    if target.institution_id is None:
+        return
+    rows = _key_rows(target.certificate_id, target.institution_id, target.student_name, target.student_number)
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+@event.listens_for(Certificate, "after_insert")
+def _index_certificate(mapper, connection, target):
+    _write_keys(connection, target)
+
+
+@event.listens_for(Certificate, "after_update")
+def _reindex_certificate(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if any(getattr(attrs, name).history.has_changes()
+           for name in ("student_name", "student_number", "institution_id")):
+        _write_keys(connection, target)
+
+
+@event.listens_for(Certificate, "before_delete")
+def _unindex_certificate(mapper, connection, target):
+    table = CertificateMatchKey.__table__
+    connection.execute(table.delete().where(table.c.certificate_id == target.certificate_id))
@@ -0,0 +1,213 @@
+# utils/merkle.py
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app
+
+from models import db, Certificate, CertificateBatch
+from utils.sharding import each_shard
+
+# Domain separation prefixes so a leaf can never be passed off as an inner node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+# Certificate columns that go into a leaf, in canonical order
+LEAF_COLUMNS = (
+    Certificate.certificate_id,
+    Certificate.institution_id,
+    Certificate.student_number,
+    Certificate.student_name,
+    Certificate.course_name,
+    Certificate.graduation_year,
+)
+
+_sha256 = hashlib.sha256
+
+
+# --------------------------
+# Hashing
+# --------------------------
+def leaf_hash(values):
+    """values: a row of LEAF_COLUMNS, e.g. (certificate_id, institution_id, ...)"""
+    encoded = json.dumps(list(values), separators=(",", ":"), ensure_ascii=False).encode()
+    return _sha256(LEAF_PREFIX + encoded).digest()
+
+
+def certificate_leaf(cert):
+    return leaf_hash([getattr(cert, col.key) for col in LEAF_COLUMNS])
+
+
+def build_levels(leaves):
+    """
+    Returns every level of the tree, leaves first and root last. An odd node
+    at the end of a level is promoted unchanged instead of being duplicated.
+    """
+    levels = [list(leaves)]
+    level = levels[0]
+    while len(level) > 1:
+        last = len(level) - 1
+        parents = [_sha256(NODE_PREFIX + level[i] + level[i + 1]).digest() for i in range(0, last, 2)]
+        if len(level) % 2:
+            parents.append(level[last])
+        levels.append(parents)
+        level = parents
+    return levels
+
+
+def pack_leaves(leaves):
+    return b"".join(leaves)
+
+
+def unpack_leaves(packed):
+    return [packed[i:i + 32] for i in range(0, len(packed), 32)]
+
+
+def merkle_root(leaves):
+    return build_levels(leaves)[-1][0]
+
+
+def build_proofs(levels, indices=None):
+    """
+    Builds inclusion proofs for many leaves at once by walking the tree level
+    by level for all requested indices together, instead of once per leaf.
+    Each proof is a list of (sibling_hash, sibling_is_left) pairs.
+    """
+    if indices is None:
+        indices = range(len(levels[0]))
+    positions = list(indices)
+    proofs = [[] for _ in positions]
+
+    for level in levels[:-1]:
+        size = len(level)
+        for proof, pos in zip(proofs, positions):
+            sibling = pos ^ 1
+            if sibling < size:
+                proof.append((level[sibling], sibling < pos))
+        positions = [pos >> 1 for pos in positions]
+
+    return proofs
+
+
+def root_from_proof(leaf, proof):
+    node = leaf
+    for sibling, sibling_is_left in proof:
+        if sibling_is_left:
+            node = _sha256(NODE_PREFIX + sibling + node).digest()
+        else:
+            node = _sha256(NODE_PREFIX + node + sibling).digest()
+    return node
+
+
+def proof_to_json(proof):
+    return [{"hash": sibling.hex(), "position": "left" if is_left else "right"} for sibling, is_left in proof]
+
+
+def proof_from_json(data):
+    return [(bytes.fromhex(step["hash"]), step["position"] == "left") for step in data]
+
+
+# --------------------------
+# Batching
+# --------------------------
+def anchor_pending_certificates(institution_id=None):
+    """
+    Groups verified certificates that are not in a batch yet into one Merkle
+    tree per institution (split at MERKLE_BATCH_SIZE) and stores only the root.
+    Returns the created batches.
+    """
+    batches = []
+    for _ in each_shard():
+        batches.extend(_anchor_pending(institution_id))
+    return batches
+
+
+def _anchor_pending(institution_id):
+    max_size = current_app.config["MERKLE_BATCH_SIZE"]
+
+    institutions = db.session.query(Certificate.institution_id).filter(
+        Certificate.batch_id.is_(None),
+        Certificate.verified.is_(True),
+        Certificate.institution_id.isnot(None),
+    )
+    if institution_id:
+        institutions = institutions.filter(Certificate.institution_id == institution_id)
+
+    batches = []
+    for (inst_id,) in institutions.distinct().all():
+        while True:
+            rows = (
+                db.session.query(*LEAF_COLUMNS)
+                .filter(
+                    Certificate.institution_id == inst_id,
+                    Certificate.batch_id.is_(None),
+                    Certificate.verified.is_(True),
+                )
+                .order_by(Certificate.certificate_id)
+                .limit(max_size)
+                .all()
+            )
+            if not rows:
+                break
+
+            leaves = [leaf_hash(row) for row in rows]
+            batch = CertificateBatch(
+                institution_id=inst_id,
+                merkle_root=merkle_root(leaves).hex(),
+                leaf_count=len(rows),
+                leaf_hashes=pack_leaves(leaves),
+                created_at=datetime.utcnow(),
+            )
+            db.session.add(batch)
+            db.session.flush()
+
+            db.session.execute(
+                db.update(Certificate),
+                [
+                    {"certificate_id": row[0], "batch_id": batch.batch_id, "batch_index": index}
+                    for index, row in enumerate(rows)
+                ],
+            )
+            db.session.commit()
+            # loaded and detached, so callers can read it outside this shard's scope
+            db.session.refresh(batch)
+            db.session.expunge(batch)
+            batches.append(batch)
+
+            if len(rows) < max_size:
+                break
+
+    return batches
+
+
+# Recently used trees, keyed by batch_id; trees are built from the leaves stored
+# at anchoring, so later edits to certificates never change them
+_tree_cache = OrderedDict()
+_TREE_CACHE_SIZE = 8
+
+
+def batch_levels(batch_id):
+    levels = _tree_cache.get(batch_id)
+    if levels is None:
+        packed = db.session.query(CertificateBatch.leaf_hashes).filter(CertificateBatch.batch_id == batch_id).scalar()
+        levels = build_levels(unpack_leaves(packed or b""))
+        _tree_cache[batch_id] = levels
+        if len(_tree_cache) > _TREE_CACHE_SIZE:
+            _tree_cache.popitem(last=False)
+    else:
+        _tree_cache.move_to_end(batch_id)
+    return levels
+
+
+def certificate_proof(cert):
+    """
+    The certificate's inclusion proof, or None when its fields no longer
+    hash to the leaf anchored for it (edited since, or a batch anchored
+    before leaves were stored and since changed).
+    """
+    levels = batch_levels(cert.batch_id)
+    leaves = levels[0]
+    if cert.batch_index >= len(leaves) or leaves[cert.batch_index] != certificate_leaf(cert):
+        return None
+    return build_proofs(levels, [cert.batch_index])[0]
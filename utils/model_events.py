@@ -0,0 +1,8 @@
+# utils/model_events.py
+"""
+Imports every module that hooks ORM events, so that writes made from any
+app - the web app or the lightweight CLI app - keep the statistics
+rollups, webhook outbox, Bloom filters, match keys, cache generations,
+credential revocations and live dashboard feed consistent.
+"""
+from utils import bloom, credentials, http_cache, live_updates, matching, stats, webhooks  # noqa: F401
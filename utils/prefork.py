@@ -0,0 +1,51 @@
+# utils/prefork.py
+"""
+Process setup for pre-forking servers (see gunicorn.conf.py).
+
+With preload_app the master imports the app once. warm_shared_state()
+then loads the read-mostly data every worker needs: compiled templates,
+the institution list, the credential revocation set and the Bloom filter
+manifest. Workers are forked with all of it already in memory and share
+those pages copy-on-write, instead of each one building its own on its
+first requests. gc.freeze() moves everything allocated so far out of the
+collector's reach, so collections in the workers do not touch (and copy)
+the shared pages.
+
+Database connections must never cross the fork: the master closes its
+pool after warming, and after_fork() discards whatever a worker still
+inherited without touching the sockets the parent may share.
+"""
+import gc
+
+from flask import current_app
+
+from models import db
+from utils.bloom import ensure_bloom_filters
+from utils.credentials import refresh_revocations
+from utils.http_cache import institution_list
+
+
+def warm_shared_state(app):
+    """Loads reference data in the master, then releases its connections. Call once, before forking."""
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        institution_list()
+        refresh_revocations()
+        if current_app.config["BLOOM_FILTER_ENABLED"]:
+            # builds missing filters here, rather than in every worker at once
+            ensure_bloom_filters()
+
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """Drops pooled connections inherited from the master. Call first thing in each worker."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,123 @@
+# utils/reminders.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app, has_request_context, url_for
+
+from models import db, Verification, Certificate, Institution
+from utils.confirmations import group_by_task
+from utils.email_service import send_email
+from utils.sharding import each_shard
+
+
+def reminder_due(ver, now=None):
+    """True if the institution has not been reminded about this verification recently."""
+    now = now or datetime.utcnow()
+    interval = timedelta(hours=current_app.config["REMINDER_INTERVAL_HOURS"])
+    return ver.last_reminded_at is None or ver.last_reminded_at <= now - interval
+
+
+def mark_reminded(ver, now=None):
+    ver.last_reminded_at = now or datetime.utcnow()
+    ver.reminder_count = (ver.reminder_count or 0) + 1
+
+
+def overdue_verifications(now=None):
+    """Pending verifications past the SLA that are due another reminder (uses the status/requested_at index)."""
+    config = current_app.config
+    now = now or datetime.utcnow()
+
+    return (
+        db.session.query(Verification, Certificate)
+        .join(Certificate, Verification.certificate_id == Certificate.certificate_id)
+        .filter(
+            Verification.status == "pending",
+            Verification.requested_at <= now - timedelta(hours=config["REMINDER_SLA_HOURS"]),
+            db.or_(
+                Verification.last_reminded_at.is_(None),
+                Verification.last_reminded_at <= now - timedelta(hours=config["REMINDER_INTERVAL_HOURS"]),
+            ),
+            db.or_(Verification.reminder_count.is_(None), Verification.reminder_count < config["REMINDER_MAX_COUNT"]),
+        )
+        .order_by(Verification.verified_by_institution_id, Verification.requested_at)
+        .all()
+    )
+
+
+def sweep_reminders(now=None):
+    """
+    Sends one digest email per institution listing all its overdue
+    verifications. Returns {institution_id: number_of_items} for the digests
+    delivered; verifications whose digest failed stay due for the next sweep.
+    """
+    if not has_request_context():
+        # url_for(_external=True) needs a request outside of Flask routes
+        with current_app.test_request_context(base_url=current_app.config["APP_BASE_URL"]):
+            return sweep_reminders(now)
+
+    now = now or datetime.utcnow()
+    sent = {}
+    for _ in each_shard():
+        sent.update(_sweep_reminders(now))
+    return sent
+
+
+def _sweep_reminders(now):
+    grouped = defaultdict(list)
+    for ver, cert in overdue_verifications(now):
+        grouped[ver.verified_by_institution_id].append((ver, cert))
+
+    if not grouped:
+        return {}
+
+    institutions = {
+        inst.institution_id: inst
+        for inst in Institution.query.filter(Institution.institution_id.in_(grouped)).all()
+    }
+
+    sent = {}
+    for institution_id, items in grouped.items():
+        inst = institutions.get(institution_id)
+        if not inst or not inst.contact_email:
+            continue
+
+        # requests sharing a confirmation task are one question for the institution
+        listed = group_by_task([ver for ver, _ in items])
+        certs = {ver.verification_id: cert for ver, cert in items}
+        digest = [(ver, certs[ver.verification_id], requesters) for ver, requesters in listed]
+
+        if not send_email(
+            to=inst.contact_email,
+            subject=f"Reminder: {len(digest)} certificate verification(s) pending",
+            body=digest_body(inst, digest, now),
+        ):
+            continue
+        for ver, _ in items:
+            mark_reminded(ver, now)
+        # commit per institution so a crash never re-sends digests already delivered
+        db.session.commit()
+        sent[institution_id] = len(digest)
+
+    return sent
+
+
+def digest_body(inst, items, now):
+    rows = "".join(
+        f"""
+        <tr>
+            <td>{cert.student_name}</td>
+            <td>{cert.student_number or '-'}</td>
+            <td>{cert.course_name}</td>
+            <td>{cert.graduation_year}</td>
+            <td>{(now - ver.requested_at).days} days{f" ({requesters} requesters)" if requesters > 1 else ""}</td>
+            <td><a href="{url_for('api.view_verification', verification_id=ver.verification_id, _external=True)}">Verify</a></td>
+        </tr>"""
+        for ver, cert, requesters in items
+    )
+    return f"""
+    <b>Reminder:</b> {inst.institution_name} has {len(items)} certificate verification(s) still pending.<br><br>
+    <table border="1" cellpadding="4" cellspacing="0">
+        <tr><th>Student</th><th>Student Number</th><th>Course</th><th>Year</th><th>Waiting</th><th></th></tr>
+        {rows}
+    </table>
+    """
@@ -0,0 +1,354 @@
+# utils/reports.py
+"""
+Institution report exports: certificates, verification outcomes and
+turnaround times, as CSV, gzip-compressed CSV or a zip holding the CSV.
+
+Rows come from a server-side cursor (stream_results + yield_per), are
+written to CSV a buffer of about REPORT_CHUNK_BYTES at a time and pushed
+through a streaming compressor, so no export is ever held in memory
+whatever its size. The same generator feeds an HTTP response, a file
+written by the CLI, or a background ReportJob file written by
+`manage.py report-worker`; each run counts its rows, bytes and seconds.
+
+    certificates   certificates uploaded in the period (uploaded_at)
+    verifications  verifications requested in the period (requested_at), archived ones included
+    turnaround     per day and institution: resolved count, median and p90 hours (rollup tables)
+"""
+import csv
+import io
+import itertools
+import os
+import time
+import zipfile
+import zlib
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+from models import db, ArchivedVerification, Certificate, ReportJob, Verification, VerificationTurnaroundStat
+from utils.sharding import each_shard, use_institution_shard
+from utils.stats import histogram_quantile
+
+# format -> (mimetype, file suffix)
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "gzip": ("application/gzip", ".csv.gz"),
+    "zip": ("application/zip", ".zip"),
+}
+
+
+class ReportError(ValueError):
+    pass
+
+
+# --------------------------
+# Period and names
+# --------------------------
+def report_period(month=None, date_from=None, date_to=None):
+    """(first day, last day) from YYYY-MM or two YYYY-MM-DD strings; either end may be None."""
+    try:
+        if month:
+            first = datetime.strptime(month, "%Y-%m").date()
+            following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+            return first, following - timedelta(days=1)
+        return (date.fromisoformat(date_from) if date_from else None,
+                date.fromisoformat(date_to) if date_to else None)
+    except ValueError:
+        raise ReportError("month must be YYYY-MM, from/to YYYY-MM-DD")
+
+
+def report_filename(report, fmt, institution_id=None, date_from=None, date_to=None):
+    parts = [report, f"institution-{institution_id}" if institution_id else "all"]
+    if date_from or date_to:
+        parts.append(f"{date_from or 'start'}_{date_to or 'now'}")
+    return "-".join(str(part) for part in parts) + FORMATS[fmt][1]
+
+
+def _between(column, date_from, date_to):
+    filters = []
+    if date_from:
+        filters.append(column >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        filters.append(column < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return filters
+
+
+def _streamed(stmt):
+    chunk_rows = current_app.config["REPORT_CHUNK_ROWS"]
+    return db.session.execute(stmt.execution_options(stream_results=True, yield_per=chunk_rows))
+
+
+def _sharded(stmt, institution_id):
+    """_streamed(stmt) on the institution's shard, or on every shard in turn (rows are in order within a shard)."""
+    if institution_id:
+        with use_institution_shard(institution_id):
+            yield from _streamed(stmt)
+        return
+    for _ in each_shard():
+        yield from _streamed(stmt)
+
+
+def _hours(start, end):
+    return round((end - start).total_seconds() / 3600, 2) if start and end else None
+
+
+# --------------------------
+# Reports: (institution_id, date_from, date_to) -> (header, rows)
+# --------------------------
+def certificates_report(institution_id, date_from, date_to):
+    stmt = (
+        db.select(
+            Certificate.certificate_id, Certificate.institution_id, Certificate.student_number,
+            Certificate.student_name, Certificate.course_name, Certificate.graduation_year,
+            Certificate.verified, Certificate.uploaded_at, Certificate.batch_id,
+        )
+        .where(*_between(Certificate.uploaded_at, date_from, date_to))
+        .order_by(Certificate.certificate_id)
+    )
+    if institution_id:
+        stmt = stmt.where(Certificate.institution_id == institution_id)
+
+    header = ["certificate_id", "institution_id", "student_number", "student_name", "course_name",
+              "graduation_year", "verified", "uploaded_at", "batch_id"]
+    return header, _sharded(stmt, institution_id)
+
+
+def verifications_report(institution_id, date_from, date_to):
+    live = (
+        db.select(
+            Verification.verification_id, Verification.verified_by_institution_id, Verification.status,
+            Verification.method, Verification.requested_at, Verification.verified_at, Verification.certificate_id,
+            Certificate.student_number, Certificate.course_name, Certificate.graduation_year,
+        )
+        .outerjoin(Certificate, Certificate.certificate_id == Verification.certificate_id)
+        .where(*_between(Verification.requested_at, date_from, date_to))
+        .order_by(Verification.verification_id)
+    )
+    # the archive index keeps the certificate_id; certificates themselves are never archived
+    archived = (
+        db.select(
+            ArchivedVerification.verification_id, ArchivedVerification.verified_by_institution_id,
+            ArchivedVerification.status, ArchivedVerification.method, ArchivedVerification.requested_at,
+            ArchivedVerification.verified_at, ArchivedVerification.certificate_id,
+            Certificate.student_number, Certificate.course_name, Certificate.graduation_year,
+        )
+        .outerjoin(Certificate, Certificate.certificate_id == ArchivedVerification.certificate_id)
+        .where(*_between(ArchivedVerification.requested_at, date_from, date_to))
+        .order_by(ArchivedVerification.verification_id)
+    )
+    if institution_id:
+        live = live.where(Verification.verified_by_institution_id == institution_id)
+        archived = archived.where(ArchivedVerification.verified_by_institution_id == institution_id)
+
+    def rows():
+        for row in _sharded(archived, institution_id):
+            yield (*row, _hours(row.requested_at, row.verified_at), True)
+        for row in _sharded(live, institution_id):
+            yield (*row, _hours(row.requested_at, row.verified_at), False)
+
+    header = ["verification_id", "institution_id", "status", "method", "requested_at", "verified_at",
+              "certificate_id", "student_number", "course_name", "graduation_year", "turnaround_hours", "archived"]
+    return header, rows()
+
+
+def turnaround_report(institution_id, date_from, date_to):
+    stat = VerificationTurnaroundStat
+    stmt = (
+        db.select(stat.day, stat.institution_id, stat.bucket, stat.count)
+        .order_by(stat.day, stat.institution_id, stat.bucket)
+    )
+    if date_from:
+        stmt = stmt.where(stat.day >= date_from)
+    if date_to:
+        stmt = stmt.where(stat.day <= date_to)
+    if institution_id:
+        stmt = stmt.where(stat.institution_id == institution_id)
+
+    def rows():
+        # one histogram per (day, institution), read in order so only one is held at a time
+        for (day, inst_id), buckets in itertools.groupby(_streamed(stmt), key=lambda row: (row.day, row.institution_id)):
+            histogram = {row.bucket: row.count for row in buckets}
+            median, p90 = histogram_quantile(histogram, 0.5), histogram_quantile(histogram, 0.9)
+            yield (day, inst_id, sum(histogram.values()),
+                   round(median / 3600, 2), round(p90 / 3600, 2))
+
+    return ["day", "institution_id", "resolved", "median_hours", "p90_hours"], rows()
+
+
+REPORTS = {
+    "certificates": certificates_report,
+    "verifications": verifications_report,
+    "turnaround": turnaround_report,
+}
+
+
+# --------------------------
+# Encoding
+# --------------------------
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    return value
+
+
+def _csv_chunks(header, rows, counter, chunk_bytes):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_cell(value) for value in row])
+        counter["rows"] += 1
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _gzip(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ZipSink:
+    """Write-only, unseekable file for ZipFile: it then streams with data descriptors."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _zip(chunks, member_name, level):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level) as archive:
+        info = zipfile.ZipInfo(member_name, datetime.utcnow().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, "w", force_zip64=True) as member:
+            for chunk in chunks:
+                member.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
+
+
+def stream_report(report, fmt, institution_id=None, date_from=None, date_to=None, counter=None):
+    """
+    Generator of the encoded export. counter (a dict) gets "rows" and
+    "bytes" as they are produced. Raises ReportError for an unknown report
+    or format before anything is read.
+    """
+    if report not in REPORTS:
+        raise ReportError(f"report must be one of {', '.join(REPORTS)}")
+    if fmt not in FORMATS:
+        raise ReportError(f"format must be one of {', '.join(FORMATS)}")
+
+    config = current_app.config
+    counter = counter if counter is not None else {}
+    counter.update(rows=0, bytes=0)
+
+    def generate():
+        header, rows = REPORTS[report](institution_id, date_from, date_to)
+        chunks = _csv_chunks(header, rows, counter, config["REPORT_CHUNK_BYTES"])
+        if fmt == "gzip":
+            chunks = _gzip(chunks, config["REPORT_COMPRESS_LEVEL"])
+        elif fmt == "zip":
+            member = report_filename(report, "csv", institution_id, date_from, date_to)
+            chunks = _zip(chunks, member, config["REPORT_COMPRESS_LEVEL"])
+        for chunk in chunks:
+            counter["bytes"] += len(chunk)
+            yield chunk
+
+    return generate()
+
+
+def write_report(path, report, fmt, institution_id=None, date_from=None, date_to=None):
+    """Streams an export into path (via a temporary file). Returns {"rows", "bytes", "seconds"}."""
+    counter = {}
+    chunks = stream_report(report, fmt, institution_id, date_from, date_to, counter)
+    start = time.perf_counter()
+    partial = f"{path}.partial"
+    try:
+        with open(partial, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {**counter, "seconds": time.perf_counter() - start}
+
+
+def rows_per_second(rows, seconds):
+    return round(rows / seconds) if rows and seconds else None
+
+
+# --------------------------
+# Background jobs
+# --------------------------
+def report_folder():
+    folder = current_app.config.get("REPORT_FOLDER") or os.path.join(current_app.instance_path, "reports")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def report_job_path(job):
+    return os.path.join(report_folder(), f"{job.job_id}-{job.file_name}")
+
+
+def _claim_next_job():
+    """Marks the oldest queued job running; the conditional UPDATE lets several workers share the queue."""
+    table = ReportJob.__table__
+    while True:
+        job_id = db.session.execute(
+            db.select(table.c.job_id).where(table.c.status == "queued").order_by(table.c.created_at, table.c.job_id).limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+        claimed = db.session.execute(
+            table.update()
+            .where(table.c.job_id == job_id, table.c.status == "queued")
+            .values(status="running", started_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(ReportJob, job_id)
+
+
+def run_report_job(job):
+    try:
+        result = write_report(report_job_path(job), job.report, job.format, job.institution_id,
+                              job.date_from, job.date_to)
+    except Exception as e:
+        db.session.rollback()
+        job.status, job.error = "failed", str(e)
+    else:
+        job.status = "done"
+        job.row_count, job.byte_count, job.seconds = result["rows"], result["bytes"], round(result["seconds"], 3)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+def run_queued_report_jobs():
+    """Runs queued jobs until none are left. Returns the jobs run."""
+    jobs = []
+    while (job := _claim_next_job()) is not None:
+        jobs.append(run_report_job(job))
+    return jobs
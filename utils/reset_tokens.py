@@ -0,0 +1,80 @@
+# utils/reset_tokens.py
+"""
+Password reset / invitation tokens.
+
+The link carries a signed, timestamped payload (user id, lifetime and a
+random nonce); the table stores only its SHA-256 digest. Lifetime and
+signature are checked from the token itself, so expired and forged links
+are rejected without touching the database, and valid ones are found with
+one lookup on the (token_digest, used) index.
+"""
+import hashlib
+import secrets
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+from models import db, PasswordResetToken
+
+SALT = "password-reset"
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=SALT)
+
+
+def hash_reset_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_reset_token(user_id, ttl):
+    """Adds the token row to the session (caller commits) and returns the token for the link."""
+    ttl = int(ttl.total_seconds())
+    token = _serializer().dumps({"user_id": user_id, "ttl": ttl, "n": secrets.token_urlsafe(8)})
+    db.session.add(PasswordResetToken(
+        user_id=user_id,
+        token_digest=hash_reset_token(token),
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+    ))
+    return token
+
+
+def verify_reset_token(token):
+    """The unused PasswordResetToken for this token, or None if it is forged, expired or used."""
+    if not token:
+        return None
+    try:
+        payload, signed_at = _serializer().loads(
+            token, max_age=current_app.config["PASSWORD_RESET_MAX_AGE_SECONDS"], return_timestamp=True
+        )
+        ttl = int(payload["ttl"])
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+    if time.time() - signed_at.timestamp() > ttl:
+        return None
+
+    prt = PasswordResetToken.query.filter_by(token_digest=hash_reset_token(token), used=False).first()
+    if prt is None or prt.user_id != payload.get("user_id") or prt.is_expired():
+        return None
+    return prt
+
+
+def sweep_reset_tokens(now=None, chunk_size=None):
+    """Deletes used and expired tokens, chunk_size rows per transaction. Returns the number deleted."""
+    now = now or datetime.utcnow()
+    chunk_size = chunk_size or current_app.config["PASSWORD_RESET_SWEEP_CHUNK"]
+    table = PasswordResetToken.__table__
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            db.select(table.c.id)
+            .where(db.or_(table.c.expires_at < now, table.c.used.is_(True)))
+            .limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(table.delete().where(table.c.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
@@ -0,0 +1,435 @@
+# utils/sharding.py
+"""
+Optional sharding by institution.
+
+With DATABASE_SHARD_URLS set, each institution's certificates,
+verifications and related rows (db_routing.SHARDED_TABLES) live in one
+shard database, so one institution's writes only lock its own shard.
+Users, institutions, tokens, statistics rollups, webhooks and every other
+table stay on the primary, which also holds the shard map
+(institution_shards). New institutions are placed on the shard with the
+fewest institutions when they are created.
+
+RoutingSession picks the shard for each statement:
+
+- a flush writes to the shard of the institutions of the rows it writes
+  (one shard per flush; commit each institution's changes separately);
+- use_institution_shard() / use_shard() set the shard explicitly;
+- otherwise a request uses the shard of its institution (the logged-in
+  user's, or the API token's), or the one scope_to_row() found.
+
+Views across institutions use fan_out(), which runs a function once per
+shard, concurrently, each in its own app context and session, and
+fan_out_rows() / each_shard() built on it. Ids of certificates,
+verifications, confirmation tasks and Merkle batches stay unique across
+shards: each shard draws them from its own shard_sequences row, which
+steps by SHARD_ID_STRIDE from a per-shard offset.
+
+`manage.py split-shards` moves an existing database into the shards.
+"""
+import heapq
+import itertools
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, session
+from sqlalchemy import event, func, select
+
+from models import db, Institution, InstitutionShard, ShardSequence, User
+from utils.db_routing import (
+    RoutingSession, SHARDED_TABLES, ShardScopeError, current_shard, shard_engines, use_shard,
+)
+from utils.tracing import attached, current_span
+
+# sharded table -> column naming the institution a row belongs to
+INSTITUTION_COLUMNS = {
+    "certificates": "institution_id",
+    "certificate_match_keys": "institution_id",
+    "certificate_batches": "institution_id",
+    "verifications": "verified_by_institution_id",
+    "confirmation_tasks": "institution_id",
+    "verification_archive": "verified_by_institution_id",
+}
+assert set(INSTITUTION_COLUMNS) == SHARDED_TABLES
+
+# ids that appear outside their shard (URLs, credentials, proofs); drawn from shard_sequences
+GLOBAL_ID_TABLES = {
+    "certificate_batches": "batch_id",
+    "certificates": "certificate_id",
+    "confirmation_tasks": "task_id",
+    "verifications": "verification_id",
+}
+
+# parents before children
+COPY_ORDER = [
+    "certificate_batches", "certificates", "certificate_match_keys",
+    "confirmation_tasks", "verifications", "verification_archive",
+]
+
+_shard_map = {}  # institution_id -> shard, per process
+_pool = None
+
+
+# --------------------------
+# Shard map
+# --------------------------
+def sharding_enabled():
+    return bool(shard_engines(db))
+
+
+def shard_names():
+    return sorted(shard_engines(db))
+
+
+def default_shard():
+    """Where rows without an institution go."""
+    return shard_names()[0]
+
+
+def shard_for_institution(institution_id):
+    if institution_id is None:
+        return default_shard()
+    name = _shard_map.get(institution_id)
+    if name is None:
+        # own connection: this also runs while another statement is being routed
+        with db.engines[None].connect() as connection:
+            name = connection.execute(
+                select(InstitutionShard.shard).where(InstitutionShard.institution_id == institution_id)
+            ).scalar()
+        if name is None:
+            raise ShardScopeError(f"Institution {institution_id} has no shard; run `manage.py split-shards`")
+        _shard_map[institution_id] = name
+    return name
+
+
+@contextmanager
+def use_institution_shard(institution_id):
+    """Scopes sharded statements to the institution's shard (nothing to do without shards)."""
+    if not sharding_enabled():
+        yield
+        return
+    with use_shard(shard_for_institution(institution_id)):
+        yield
+
+
+def scope_to_institution(institution_id):
+    """Scopes the rest of the request to the institution's shard (nothing to do without shards)."""
+    if sharding_enabled() and has_request_context():
+        g._db_shard = shard_for_institution(institution_id)
+
+
+def _request_institution_shard():
+    """db_shard_resolver: the shard of the institution the request acts for, if any."""
+    institution_id = g.get("api_institution_id") or session.get("institution_id")
+    if institution_id is None and "user_id" in session:
+        # sessions from before institution_id was stored at login
+        with db.engines[None].connect() as connection:
+            institution_id = connection.execute(
+                select(User.institution_id).where(User.user_id == session["user_id"])
+            ).scalar()
+    return shard_for_institution(institution_id) if institution_id else None
+
+
+# --------------------------
+# Fan-out
+# --------------------------
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(current_app.config["SHARD_FANOUT_WORKERS"], thread_name_prefix="shard")
+    return _pool
+
+
+def fan_out(fn, *args, **kwargs):
+    """
+    fn(*args, **kwargs) once per shard, concurrently, in shard_names()
+    order; [fn(...)] without shards. fn gets its own app context and
+    session, so it should return plain values or rows, not ORM objects
+    that still need to load.
+    """
+    names = shard_names()
+    if not names:
+        return [fn(*args, **kwargs)]
+
+    app = current_app._get_current_object()
+    parent = current_span()  # SQL on the pool threads still shows up in the request's trace
+
+    def run(name):
+        with attached(parent), app.app_context(), use_shard(name):
+            return fn(*args, **kwargs)
+
+    return list(_executor().map(run, names))
+
+
+def fan_out_rows(stmt, descending=False, limit=None, key=0):
+    """Rows of stmt from every shard, merged on column `key` (each shard's rows must be ordered by it)."""
+    results = fan_out(lambda: db.session.execute(stmt).all())
+    merged = heapq.merge(*results, key=lambda row: row[key], reverse=descending)
+    return list(itertools.islice(merged, limit))
+
+
+def each_shard():
+    """Yields each shard name with sharded statements scoped to it, one after another (None once without shards)."""
+    names = shard_names()
+    if not names:
+        yield None
+        return
+    for name in names:
+        with use_shard(name):
+            yield name
+
+
+def locate(model, pk):
+    """The shard holding model's row with primary key pk, or None."""
+    column = model.__mapper__.primary_key[0]
+    found = fan_out(lambda: db.session.execute(select(column).where(column == pk)).first() is not None)
+    return next((name for name, hit in zip(shard_names(), found) if hit), None)
+
+
+def scope_to_row(model, pk):
+    """
+    Scopes the rest of the request to the shard holding model's row pk and
+    returns it (the default shard when no shard has it, where the caller's
+    lookup then simply misses). Returns None without shards.
+    """
+    if not sharding_enabled():
+        return None
+    name = locate(model, pk)
+    if has_request_context():
+        g._db_shard = name or default_shard()
+    return name
+
+
+# --------------------------
+# Writes: one shard per flush, global ids
+# --------------------------
+def _row_shard(obj):
+    institution_id = getattr(obj, INSTITUTION_COLUMNS[obj.__table__.name])
+    if institution_id is None:
+        return current_shard() or default_shard()
+    return shard_for_institution(institution_id)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _route_flush(session, flush_context, instances):
+    session.info.pop("flush_shard", None)
+    if not sharding_enabled():
+        return
+
+    with session.no_autoflush:
+        rows = [
+            obj for obj in itertools.chain(session.new, session.dirty, session.deleted)
+            if getattr(obj, "__table__", None) is not None and obj.__table__.name in SHARDED_TABLES
+        ]
+        shards = {_row_shard(obj) for obj in rows}
+        if not shards:
+            return
+        if len(shards) > 1:
+            raise ShardScopeError(f"One flush writes to one shard, not {', '.join(sorted(shards))}; "
+                                  "commit each institution's changes separately")
+
+        name = session.info["flush_shard"] = session.info["last_shard"] = shards.pop()
+        needing_ids = {}
+        for obj in session.new:
+            table = obj.__table__.name
+            if table in GLOBAL_ID_TABLES and getattr(obj, GLOBAL_ID_TABLES[table]) is None:
+                needing_ids.setdefault(table, []).append(obj)
+        for table, objs in needing_ids.items():
+            for obj, new_id in zip(objs, _allocate_ids(session, name, table, len(objs))):
+                setattr(obj, GLOBAL_ID_TABLES[table], new_id)
+
+
+def _allocate_ids(session, shard, table, count):
+    """count ids for table from the shard's sequence, in this transaction (so a rollback returns them)."""
+    sequence = ShardSequence.__table__
+    stride = current_app.config["SHARD_ID_STRIDE"]
+    bind = {"bind": shard_engines(db)[shard]}
+    updated = session.execute(
+        sequence.update().where(sequence.c.name == table).values(next_id=sequence.c.next_id + count * stride),
+        bind_arguments=bind,
+    ).rowcount
+    if not updated:
+        raise ShardScopeError(f"Shard {shard} has no id sequence for {table}; run `manage.py split-shards`")
+    end = session.execute(select(sequence.c.next_id).where(sequence.c.name == table), bind_arguments=bind).scalar()
+    return [end - (count - i) * stride for i in range(count)]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _place_new_institutions(session, flush_context):
+    if not sharding_enabled():
+        return
+    new = [obj.institution_id for obj in session.new if isinstance(obj, Institution)]
+    if not new:
+        return
+
+    placed = Counter({name: 0 for name in shard_names()})
+    placed.update(dict(session.execute(
+        select(InstitutionShard.shard, func.count()).group_by(InstitutionShard.shard)
+    ).all()))
+    rows = []
+    for institution_id in new:
+        name = min(placed, key=lambda shard: (placed[shard], shard))
+        placed[name] += 1
+        rows.append({"institution_id": institution_id, "shard": name, "assigned_at": datetime.utcnow()})
+        _shard_map[institution_id] = name
+    session.execute(InstitutionShard.__table__.insert(), rows)
+
+
+@event.listens_for(RoutingSession, "after_flush_postexec")
+def _clear_flush_shard(session, flush_context):
+    session.info.pop("flush_shard", None)
+
+
+# --------------------------
+# Splitting an existing database
+# --------------------------
+def shard_metadata():
+    """The sharded tables and shard_sequences, without foreign keys to tables that stay on the primary."""
+    metadata = sa.MetaData()
+    for name in (*COPY_ORDER, ShardSequence.__tablename__):
+        db.metadata.tables[name].to_metadata(metadata)
+    for table in metadata.tables.values():
+        for constraint in list(table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split(".")[0] not in SHARDED_TABLES:
+                table.constraints.discard(constraint)
+                for element in constraint.elements:
+                    element.parent.foreign_keys.discard(element)
+                    table.foreign_keys.discard(element)
+    return metadata
+
+
+def _balanced_plan(connection, names, mapped):
+    """Places unmapped institutions, largest first, on the shard with the fewest certificates."""
+    certificates = db.metadata.tables["certificates"]
+    sizes = dict(connection.execute(
+        select(certificates.c.institution_id, func.count()).group_by(certificates.c.institution_id)
+    ).all())
+    load = Counter({name: 0 for name in names})
+    for institution_id, name in mapped.items():
+        load[name] += sizes.get(institution_id, 0)
+
+    unmapped = [i for i in connection.execute(select(Institution.institution_id)).scalars() if i not in mapped]
+    plan = {}
+    for institution_id in sorted(unmapped, key=lambda i: -sizes.get(i, 0)):
+        name = min(names, key=lambda shard: (load[shard], shard))
+        plan[institution_id] = name
+        load[name] += sizes.get(institution_id, 0)
+    return plan
+
+
+def _seed_sequences(primary, engines, stride):
+    """Gives every shard missing one a sequence per GLOBAL_ID_TABLES table, above every id in use, on a free offset."""
+    sequence = ShardSequence.__table__
+    existing = {}
+    for name, engine in engines.items():
+        with engine.connect() as connection:
+            existing[name] = dict(connection.execute(select(sequence.c.name, sequence.c.next_id)).all())
+
+    for table, column in GLOBAL_ID_TABLES.items():
+        highest = 0
+        for engine in (primary, *engines.values()):
+            with engine.connect() as connection:
+                source = db.metadata.tables[table]
+                highest = max(highest, connection.execute(select(func.max(source.c[column]))).scalar() or 0)
+        base = (highest // stride + 1) * stride
+        used = {next_id % stride for rows in existing.values() for name, next_id in rows.items() if name == table}
+        free = (offset for offset in range(stride) if offset not in used)
+        for name in sorted(engines):
+            if table in existing[name]:
+                continue
+            offset = next(free, None)
+            if offset is None:
+                raise ShardScopeError(f"More than SHARD_ID_STRIDE={stride} shards")
+            with engines[name].begin() as connection:
+                connection.execute(sequence.insert().values(name=table, next_id=base + offset))
+
+
+def split_into_shards(purge=False, chunk_size=5000):
+    """
+    Copies the sharded rows of every institution not yet in the shard map
+    from the primary to its shard, then records the map. Institutions
+    already mapped are left alone, so the command can be re-run, e.g. after
+    adding a shard. With purge, copied rows are deleted from the primary.
+    Returns {shard: {"institutions": n, "rows": n}}.
+    """
+    primary = db.engines[None]
+    engines = shard_engines(db)
+    if not engines:
+        raise ShardScopeError("No shards configured (DATABASE_SHARD_URLS)")
+    names = sorted(engines)
+    metadata = shard_metadata()
+    for engine in engines.values():
+        metadata.create_all(engine)
+
+    with primary.connect() as connection:
+        mapped = dict(connection.execute(select(InstitutionShard.institution_id, InstitutionShard.shard)).all())
+        plan = _balanced_plan(connection, names, mapped)
+    # rows without an institution are re-copied to the default shard every run
+    targets = {**plan, None: names[0]}
+    summary = {name: {"institutions": 0, "rows": 0} for name in names}
+    for name in plan.values():
+        summary[name]["institutions"] += 1
+
+    with ExitStack() as stack, primary.connect() as source:
+        shards = {name: stack.enter_context(engine.begin()) for name, engine in engines.items()}
+
+        # start clean: an interrupted run may have copied part of these institutions
+        for table_name in reversed(COPY_ORDER):
+            table = metadata.tables[table_name]
+            column = table.c[INSTITUTION_COLUMNS[table_name]]
+            for name, connection in shards.items():
+                ids = [i for i, shard in plan.items() if shard == name]
+                for start in range(0, len(ids), 500):
+                    connection.execute(table.delete().where(column.in_(ids[start:start + 500])))
+                if name == names[0]:
+                    connection.execute(table.delete().where(column.is_(None)))
+
+        for table_name in COPY_ORDER:
+            source_table = db.metadata.tables[table_name]
+            column = INSTITUTION_COLUMNS[table_name]
+            buffers = {name: [] for name in names}
+            rows = source.execution_options(stream_results=True, yield_per=chunk_size).execute(select(source_table))
+            for row in rows:
+                institution_id = row._mapping[column]
+                if institution_id not in targets:
+                    continue  # already on its shard
+                name = targets[institution_id]
+                buffers[name].append(dict(row._mapping))
+                if len(buffers[name]) >= chunk_size:
+                    shards[name].execute(metadata.tables[table_name].insert(), buffers[name])
+                    summary[name]["rows"] += len(buffers[name])
+                    buffers[name] = []
+            for name, buffer in buffers.items():
+                if buffer:
+                    shards[name].execute(metadata.tables[table_name].insert(), buffer)
+                    summary[name]["rows"] += len(buffer)
+
+    if plan:
+        with primary.begin() as connection:
+            now = datetime.utcnow()
+            connection.execute(InstitutionShard.__table__.insert(), [
+                {"institution_id": institution_id, "shard": name, "assigned_at": now}
+                for institution_id, name in plan.items()
+            ])
+    _seed_sequences(primary, engines, current_app.config["SHARD_ID_STRIDE"])
+    _shard_map.clear()
+
+    if purge:
+        with primary.begin() as connection:
+            for table_name in reversed(COPY_ORDER):
+                table = db.metadata.tables[table_name]
+                column = table.c[INSTITUTION_COLUMNS[table_name]]
+                moved = list(targets)
+                for start in range(0, len(moved), 500):
+                    chunk = [i for i in moved[start:start + 500] if i is not None]
+                    connection.execute(table.delete().where(column.in_(chunk)))
+                connection.execute(table.delete().where(column.is_(None)))
+    return summary
+
+
+def init_app(app):
+    """Lets requests default to their institution's shard. Call after db.init_app(app)."""
+    app.extensions["db_shard_resolver"] = _request_institution_shard
@@ -0,0 +1,234 @@
+# utils/stats.py
+"""
+Incrementally maintained statistics rollups.
+
+An after_flush listener turns every Verification insert, status/method
+change, verified_at change and delete into +/- deltas on the rollup tables,
+written in the same transaction. backfill_stats() rebuilds both tables
+from scratch, archived verifications included. The stats API only ever
+reads the rollups.
+"""
+import itertools
+import math
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import event, func, inspect
+
+from models import db, ArchivedVerification, Verification, VerificationDailyStat, VerificationTurnaroundStat
+from utils.db_routing import RoutingSession
+from utils.sharding import each_shard
+
+# Turnaround histogram resolution: 4 buckets per doubling (~19% wide)
+BUCKETS_PER_DOUBLING = 4
+
+
+def turnaround_bucket(seconds):
+    return int(math.floor(BUCKETS_PER_DOUBLING * math.log2(max(seconds, 0) + 1)))
+
+
+def bucket_midpoint(bucket):
+    return 2 ** ((bucket + 0.5) / BUCKETS_PER_DOUBLING) - 1
+
+
+def _day(value):
+    return (value or datetime.utcnow()).date()
+
+
+# --------------------------
+# Deltas from ORM events
+# --------------------------
+def _daily_key(ver, status=None, method=None, requested_at=None):
+    return (
+        _day(requested_at or ver.requested_at),
+        ver.verified_by_institution_id or 0,
+        status or ver.status or "pending",
+        method or ver.method or "manual_form",
+    )
+
+
+def _turnaround_key(ver, verified_at):
+    seconds = (verified_at - (ver.requested_at or verified_at)).total_seconds()
+    return (verified_at.date(), ver.verified_by_institution_id or 0, turnaround_bucket(seconds))
+
+
+def _old(history, current):
+    return history.deleted[0] if history.deleted else current
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _apply_verification_deltas(session, flush_context):
+    daily, turnaround = Counter(), Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Verification):
+            daily[_daily_key(obj)] += 1
+            if obj.verified_at:
+                turnaround[_turnaround_key(obj, obj.verified_at)] += 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, Verification):
+            continue
+        attrs = inspect(obj).attrs
+        status, method = attrs.status.history, attrs.method.history
+        institution, requested = attrs.verified_by_institution_id.history, attrs.requested_at.history
+
+        if any(h.has_changes() for h in (status, method, institution, requested)):
+            old_institution = _old(institution, obj.verified_by_institution_id)
+            old_key = (
+                _day(_old(requested, obj.requested_at)), old_institution or 0,
+                _old(status, obj.status) or "pending", _old(method, obj.method) or "manual_form",
+            )
+            new_key = _daily_key(obj)
+            if old_key != new_key:
+                daily[old_key] -= 1
+                daily[new_key] += 1
+
+        verified = attrs.verified_at.history
+        if verified.has_changes():
+            if verified.deleted and verified.deleted[0]:
+                turnaround[_turnaround_key(obj, verified.deleted[0])] -= 1
+            if obj.verified_at:
+                turnaround[_turnaround_key(obj, obj.verified_at)] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Verification):
+            daily[_daily_key(obj)] -= 1
+            if obj.verified_at:
+                turnaround[_turnaround_key(obj, obj.verified_at)] -= 1
+
+    for key, delta in daily.items():
+        if delta:
+            _increment(session, VerificationDailyStat, dict(zip(("day", "institution_id", "status", "method"), key)), delta)
+    for key, delta in turnaround.items():
+        if delta:
+            _increment(session, VerificationTurnaroundStat, dict(zip(("day", "institution_id", "bucket"), key)), delta)
+
+
+def _increment(session, model, keys, delta):
+    """Atomic count += delta on the row identified by keys, creating it if needed."""
+    table = model.__table__
+    dialect = session.get_bind(mapper=model).dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**keys, count=delta)
+        stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_={"count": table.c.count + delta})
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(**keys, count=delta)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + delta)
+    else:
+        where = [table.c[name] == value for name, value in keys.items()]
+        if session.execute(table.update().where(*where).values(count=table.c.count + delta)).rowcount:
+            return
+        stmt = table.insert().values(**keys, count=delta)
+
+    session.execute(stmt)
+
+
+# --------------------------
+# Backfill
+# --------------------------
+def backfill_stats():
+    """Recomputes both rollup tables from the verifications table and the archive index."""
+    db.session.execute(VerificationDailyStat.__table__.delete())
+    db.session.execute(VerificationTurnaroundStat.__table__.delete())
+
+    daily = Counter()
+    turnaround = Counter()
+    # archived verifications (utils.archive) still count; every shard's rows, one shard after another
+    rows = itertools.chain.from_iterable(
+        db.session.query(
+            model.requested_at, model.verified_at, model.verified_by_institution_id, model.status, model.method,
+        )
+        .execution_options(stream_results=True)
+        .yield_per(5000)
+        for _ in each_shard()
+        for model in (Verification, ArchivedVerification)
+    )
+    for requested_at, verified_at, institution_id, status, method in rows:
+        daily[(_day(requested_at), institution_id or 0, status or "pending", method or "manual_form")] += 1
+        if verified_at:
+            seconds = (verified_at - (requested_at or verified_at)).total_seconds()
+            turnaround[(verified_at.date(), institution_id or 0, turnaround_bucket(seconds))] += 1
+
+    if daily:
+        db.session.execute(VerificationDailyStat.__table__.insert(), [
+            {"day": d, "institution_id": i, "status": s, "method": m, "count": n}
+            for (d, i, s, m), n in daily.items()
+        ])
+    if turnaround:
+        db.session.execute(VerificationTurnaroundStat.__table__.insert(), [
+            {"day": d, "institution_id": i, "bucket": b, "count": n}
+            for (d, i, b), n in turnaround.items()
+        ])
+    db.session.commit()
+    return {"daily_rows": len(daily), "turnaround_rows": len(turnaround)}
+
+
+# --------------------------
+# Reads (rollups only)
+# --------------------------
+def read_stats(institution_id=None, date_from=None, date_to=None):
+    daily_filters, turnaround_filters = [], []
+    for model, filters in ((VerificationDailyStat, daily_filters), (VerificationTurnaroundStat, turnaround_filters)):
+        if institution_id is not None:
+            filters.append(model.institution_id == institution_id)
+        if date_from:
+            filters.append(model.day >= date_from)
+        if date_to:
+            filters.append(model.day <= date_to)
+
+    by_status, by_method, by_institution = Counter(), Counter(), Counter()
+    by_day = defaultdict(Counter)
+    for day, inst_id, status, method, count in db.session.query(
+        VerificationDailyStat.day, VerificationDailyStat.institution_id, VerificationDailyStat.status,
+        VerificationDailyStat.method, VerificationDailyStat.count,
+    ).filter(*daily_filters):
+        by_status[status] += count
+        by_method[method] += count
+        by_institution[inst_id] += count
+        by_day[day.isoformat()][status] += count
+
+    histogram = dict(
+        db.session.query(VerificationTurnaroundStat.bucket, func.sum(VerificationTurnaroundStat.count))
+        .filter(*turnaround_filters)
+        .group_by(VerificationTurnaroundStat.bucket)
+        .all()
+    )
+
+    return {
+        "total": sum(by_status.values()),
+        "by_status": dict(by_status),
+        "by_method": dict(by_method),
+        "by_institution": {str(k): v for k, v in by_institution.items()},
+        "by_day": {day: dict(counts) for day, counts in sorted(by_day.items())},
+        "turnaround": {
+            "completed": sum(histogram.values()),
+            "median_seconds": _histogram_median(histogram),
+        },
+    }
+
+
+def _histogram_median(histogram):
+    return histogram_quantile(histogram, 0.5)
+
+
+def histogram_quantile(histogram, q):
+    """Seconds at quantile q of a {bucket: count} turnaround histogram (bucket midpoint), or None if empty."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= q * total:
+            return round(bucket_midpoint(bucket), 1)
+
+
+def parse_day(value):
+    return date.fromisoformat(value) if value else None
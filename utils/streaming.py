@@ -0,0 +1,100 @@
+# utils/streaming.py
+"""
+Streamed, keyset-paginated list pages.
+
+Rows are read with yield_per and handed to stream_template one at a time,
+so neither the result set nor the rendered page is ever fully in memory
+and the first bytes go out before the last row is read. Pages are
+addressed by the last id seen (?after=) rather than an OFFSET, so every
+page costs the same index range scan however deep it is. With shards
+configured each shard's page is read concurrently and merged by id.
+"""
+from flask import current_app, request, stream_template, Response
+from sqlalchemy import select
+
+from models import db
+from utils.sharding import fan_out_rows, sharding_enabled
+
+
+class KeysetPage:
+    """Iterates at most per_page rows and remembers where the page ends."""
+
+    def __init__(self, result, per_page, has_prev=False):
+        self._result = result
+        self.per_page = per_page
+        self.has_prev = has_prev
+        self.has_next = False
+        self.first_id = None
+        self.last_id = None
+        self.count = 0
+
+    def __iter__(self):
+        try:
+            for row in self._result:
+                if self.count == self.per_page:
+                    # the extra row only tells us there is another page
+                    self.has_next = True
+                    break
+                row_id = row[0]
+                if self.first_id is None:
+                    self.first_id = row_id
+                self.last_id = row_id
+                self.count += 1
+                yield row
+        finally:
+            close = getattr(self._result, "close", None)  # merged shard pages are plain lists
+            if close:
+                close()
+
+
+def page_args():
+    """(after, before, per_page) from the query string, clamped to the configured limits."""
+    config = current_app.config
+    per_page = request.args.get("per_page", config["LIST_PAGE_SIZE"], type=int)
+    per_page = max(1, min(per_page, config["LIST_PAGE_SIZE_MAX"]))
+    return request.args.get("after", type=int), request.args.get("before", type=int), per_page
+
+
+def keyset_page(stmt, id_column, after=None, before=None, per_page=100, chunk_size=500):
+    """Runs stmt for one page ordered by id_column; id_column must be the first selected column."""
+    sharded = sharding_enabled()
+    start, has_prev = None, after is not None
+    if before is not None:
+        # the previous page starts at the per_page-th id below `before`
+        ids_stmt = select(id_column).where(id_column < before).order_by(id_column.desc()).limit(per_page + 1)
+        if sharded:
+            ids = [row[0] for row in fan_out_rows(ids_stmt, descending=True, limit=per_page + 1)]
+        else:
+            ids = db.session.execute(ids_stmt).scalars().all()
+        if len(ids) > per_page:
+            start, has_prev = ids[per_page - 1], True
+        after = None
+
+    if after is not None:
+        stmt = stmt.where(id_column > after)
+    elif start is not None:
+        stmt = stmt.where(id_column >= start)
+    stmt = stmt.order_by(id_column).limit(per_page + 1)
+
+    if sharded:
+        return KeysetPage(fan_out_rows(stmt, limit=per_page + 1), per_page, has_prev)
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    return KeysetPage(result, per_page, has_prev)
+
+
+def _coalesce(chunks, size):
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_page(template_name, **context):
+    """stream_template() regrouped into STREAM_CHUNK_BYTES pieces (fewer writes, better compression)."""
+    chunks = stream_template(template_name, **context)
+    return Response(_coalesce(chunks, current_app.config["STREAM_CHUNK_BYTES"]), mimetype="text/html")
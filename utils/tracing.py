@@ -0,0 +1,369 @@
+# utils/tracing.py
+"""
+Lightweight request tracing, exported as OTLP JSON.
+
+Off unless TRACE_EXPORT is set. Then TRACE_SAMPLE_RATE of the requests
+(or every request whose W3C traceparent header says its caller sampled it)
+get a root span, and everything that runs inside it adds child spans:
+
+- request.parse_form: reading the form / multipart body, uploads included;
+- one span per SQL statement on any engine (primary, replicas, shards),
+  and one per session commit, around the flush it runs;
+- upload.save and smtp.send around file writes and SMTP sessions, and
+  whatever else is wrapped in span().
+
+The current span is kept in a ContextVar, so spans nest across function
+calls without being passed around; attached() carries it into worker
+threads. Code outside a sampled trace pays one ContextVar lookup per
+span() and never builds a span.
+
+Finished spans are queued in memory and a background thread exports them
+every TRACE_EXPORT_SECONDS, as one OTLP/JSON ExportTraceServiceRequest
+per batch: POSTed to an OTLP/HTTP collector when TRACE_EXPORT is a URL,
+otherwise appended as one line to that file (the OpenTelemetry
+collector's file format, readable by its otlpjsonfile receiver).
+"""
+import atexit
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import Request, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.db_routing import RoutingSession
+
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_ERROR = 2
+SCOPE_NAME = "undiziwa.tracing"
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current = ContextVar("trace_span", default=None)
+_exporter = None
+_sample_rate = 0.0
+_max_statement = 1000
+
+# ids must differ between forked workers
+_random = random.Random()
+os.register_at_fork(after_in_child=_random.seed)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, trace_id, parent_id=None, kind="internal", attributes=None):
+        self.trace_id = trace_id
+        self.span_id = f"{_random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = SPAN_KINDS[kind]
+        self.attributes = attributes or {}
+        self.error = None
+        self.end_ns = None
+        self.start_ns = time.time_ns()
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def traceparent(self):
+        """W3C traceparent header value for calls made from inside this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return span
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}  # int64 is a string in OTLP JSON
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+# --------------------------
+# Spans
+# --------------------------
+def current_span():
+    """The span code is running in, or None outside a sampled trace."""
+    return _current.get()
+
+
+def start_trace(name, traceparent=None, kind="internal", **attributes):
+    """
+    Root span for a unit of work, or None if it is not sampled. A valid
+    traceparent continues the caller's trace and follows its decision.
+    """
+    if _exporter is None:
+        return None
+    match = TRACEPARENT.match(traceparent or "")
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        if not int(flags, 16) & 1:
+            return None
+    elif _random.random() < _sample_rate:
+        trace_id, parent_id = f"{_random.getrandbits(128):032x}", None
+    else:
+        return None
+    return Span(name, trace_id, parent_id, kind, attributes)
+
+
+def _finish(span):
+    span.end_ns = time.time_ns()
+    _exporter.add(span)
+
+
+@contextmanager
+def _running(span):
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        _finish(span)
+
+
+@contextmanager
+def trace(name, traceparent=None, kind="internal", **attributes):
+    """Runs the block as a root span if start_trace() samples it; yields the span or None."""
+    root = start_trace(name, traceparent, kind, **attributes)
+    if root is None:
+        yield None
+        return
+    with _running(root):
+        yield root
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """Runs the block as a child of the current span; a no-op (yields None) outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _running(Span(name, parent.trace_id, parent.span_id, kind, attributes)) as child:
+        yield child
+
+
+@contextmanager
+def attached(parent):
+    """Makes parent the current span, e.g. in a pool thread working for a traced request."""
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+# --------------------------
+# Export
+# --------------------------
+class Exporter:
+    def __init__(self, target, service_name, interval, max_queue):
+        self.target = target
+        self.service_name = service_name
+        self.interval = interval
+        self.max_queue = max_queue
+        self.exported = 0
+        self.dropped = 0
+        self._spans = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def add(self, span):
+        with self._lock:
+            if len(self._spans) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._spans.append(span)
+            if self._pid != os.getpid():
+                # first span in this process (workers fork after the app is built)
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="trace-export", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def payload(self, spans):
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                _attribute("service.name", self.service_name),
+                _attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+
+    def flush(self):
+        """Exports the queued spans now. Returns how many were sent."""
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return 0
+
+        body = json.dumps(self.payload(spans), separators=(",", ":")).encode()
+        try:
+            if self.target.startswith(("http://", "https://")):
+                import urllib.request  # deferred: http.client is only needed by processes that export
+
+                post = urllib.request.Request(self.target, data=body, method="POST",
+                                              headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(post, timeout=10).close()
+            else:
+                # one write per batch, so lines from several workers do not interleave
+                with open(self.target, "ab") as fh:
+                    fh.write(body + b"\n")
+        except (OSError, ValueError) as e:
+            self.dropped += len(spans)
+            print(f"Failed to export {len(spans)} spans to {self.target}: {e}")
+            return 0
+        self.exported += len(spans)
+        return len(spans)
+
+
+def flush():
+    return _exporter.flush() if _exporter else 0
+
+
+# --------------------------
+# Instrumentation
+# --------------------------
+class TracedRequest(Request):
+    def _load_form_data(self):
+        # runs once, on first access to request.form / request.files
+        with span("request.parse_form", **{"http.request.body.size": self.content_length}):
+            super()._load_form_data()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    child = Span(operation, parent.trace_id, parent.span_id, "client", {
+        "db.system.name": conn.dialect.name,
+        "db.namespace": os.path.basename(conn.engine.url.database or ""),
+        "db.query.text": statement[:_max_statement],
+        "db.operation.batch.size": len(parameters) if executemany else None,
+    })
+    conn.info.setdefault("trace_spans", []).append(child)
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        _finish(spans.pop())
+
+
+def _execute_failed(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("trace_spans") if conn is not None else None
+    if spans:
+        child = spans.pop()
+        child.record_error(exception_context.original_exception)
+        _finish(child)
+
+
+def _start_commit(session):
+    parent = _current.get()
+    if parent is not None:
+        child = Span("commit", parent.trace_id, parent.span_id)
+        session.info["trace_commit"] = (child, _current.set(child))
+
+
+def _end_commit(session, error=None):
+    started = session.info.pop("trace_commit", None)
+    if started:
+        child, token = started
+        child.error = error
+        _current.reset(token)
+        _finish(child)
+
+
+def _commit_rolled_back(session):
+    _end_commit(session, "rolled back")
+
+
+def _start_request_trace():
+    route = request.url_rule.rule if request.url_rule else None
+    root = start_trace(
+        f"{request.method} {route or 'unmatched'}", request.headers.get("traceparent"), "server",
+        **{"http.request.method": request.method, "url.path": request.path, "http.route": route},
+    )
+    if root is not None:
+        g._trace_span, g._trace_token = root, _current.set(root)
+
+
+def _tag_response(response):
+    root = g.get("_trace_span")
+    if root is not None:
+        root.set("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            root.error = f"HTTP {response.status_code}"
+    return response
+
+
+def _end_request_trace(exc):
+    root = g.pop("_trace_span", None)
+    if root is None:
+        return
+    if exc is not None:
+        root.record_error(exc)
+    _current.reset(g.pop("_trace_token"))
+    _finish(root)
+
+
+def init_app(app):
+    """Traces requests and SQL when TRACE_EXPORT is set; otherwise installs nothing."""
+    global _exporter, _sample_rate, _max_statement
+
+    config = app.config
+    if not config["TRACE_EXPORT"]:
+        return
+
+    _sample_rate = config["TRACE_SAMPLE_RATE"]
+    _max_statement = config["TRACE_MAX_STATEMENT"]
+    if _exporter is None:
+        _exporter = Exporter(config["TRACE_EXPORT"], config["TRACE_SERVICE_NAME"],
+                             config["TRACE_EXPORT_SECONDS"], config["TRACE_QUEUE_SIZE"])
+        atexit.register(flush)
+        event.listen(Engine, "before_cursor_execute", _before_execute)
+        event.listen(Engine, "after_cursor_execute", _after_execute)
+        event.listen(Engine, "handle_error", _execute_failed)
+        event.listen(RoutingSession, "before_commit", _start_commit)
+        event.listen(RoutingSession, "after_commit", _end_commit)
+        event.listen(RoutingSession, "after_rollback", _commit_rolled_back)
+
+    if app.request_class is Request:
+        app.request_class = TracedRequest
+    app.before_request(_start_request_trace)
+    app.after_request(_tag_response)
+    app.teardown_request(_end_request_trace)
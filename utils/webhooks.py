@@ -0,0 +1,317 @@
+# utils/webhooks.py
+"""
+Webhook delivery for verification status changes.
+
+Status transitions are written to webhook_deliveries inside the same flush
+that changes the verification (outbox pattern), so an event is queued if
+and only if the change commits. `manage.py webhook-worker` drains the queue: due
+events are grouped per endpoint and POSTed as one signed batch over a
+shared keep-alive connection pool, failures back off exponentially and
+end up as 'dead' after WEBHOOK_MAX_ATTEMPTS. Events for endpoints that were
+disabled, or whose host no longer resolves to a public address, are marked
+'skipped' instead of being retried.
+
+Endpoint URLs must resolve to public addresses only (no loopback, private,
+link-local or reserved ranges), so webhooks cannot be used to reach the
+server's own network. The check runs at registration and again before every
+delivery, since DNS answers can change; redirects are never followed.
+WEBHOOK_ALLOW_PRIVATE_URLS turns it off for local development.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import secrets
+import socket
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from sqlalchemy import event, func, inspect
+
+from models import db, Verification, WebhookEndpoint, WebhookDelivery
+from utils.db_routing import RoutingSession
+
+STATUS_CHANGED_EVENT = "verification.status_changed"
+
+
+def generate_webhook_secret():
+    return secrets.token_hex(32)
+
+
+def sign_payload(secret, timestamp, body):
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def non_public_address(url):
+    """
+    The first address url's host resolves to that is not public, or None.
+    Raises socket.gaierror (or UnicodeError) if the host does not resolve.
+    """
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    for info in socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM):
+        ip = ipaddress.ip_address(info[4][0].split("%")[0])  # drop an IPv6 zone id
+        if not ip.is_global or ip.is_multicast:
+            return ip
+    return None
+
+
+def url_error(url, allow_private=False):
+    """Why url may not be registered as a webhook endpoint, or None if it may."""
+    try:
+        parts = urlsplit(url)
+        parts.port  # raises ValueError for a malformed port
+    except ValueError:
+        return "A valid http(s) url is required"
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return "A valid http(s) url is required"
+    if allow_private:
+        return None
+
+    try:
+        address = non_public_address(url)
+    except (socket.gaierror, UnicodeError):
+        return f"Cannot resolve {parts.hostname}"
+    if address:
+        return f"{parts.hostname} resolves to a non-public address ({address})"
+    return None
+
+
+# --------------------------
+# Enqueue (outbox)
+# --------------------------
+@event.listens_for(RoutingSession, "before_flush")
+def _enqueue_status_changes(session, flush_context, instances):
+    changed = []
+    for obj in session.dirty:
+        if isinstance(obj, Verification):
+            history = inspect(obj).attrs.status.history
+            if history.has_changes() and history.deleted and history.deleted[0] != obj.status:
+                changed.append((obj, history.deleted[0]))
+    _enqueue(session, changed)
+
+    # verifications inserted already resolved (e.g. exact matches) have no id
+    # until this flush runs; they are enqueued, as leaving "pending", once it has
+    created = [obj for obj in session.new if isinstance(obj, Verification) and (obj.status or "pending") != "pending"]
+    if created:
+        session.info.setdefault("webhook_created", []).extend(created)
+
+
+@event.listens_for(RoutingSession, "after_flush_postexec")
+def _enqueue_created(session, flush_context):
+    created = session.info.pop("webhook_created", None)
+    if created:
+        # added here, the deliveries are written by the flush loop of the same commit
+        _enqueue(session, [(ver, "pending") for ver in created if ver.verification_id is not None])
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_created(session):
+    session.info.pop("webhook_created", None)
+
+
+def _enqueue(session, changed):
+    if not changed:
+        return
+
+    with session.no_autoflush:
+        requesters = {ver.requested_by for ver, _ in changed if ver.requested_by}
+        endpoints = defaultdict(list)
+        if requesters:
+            for endpoint_id, user_id in session.query(WebhookEndpoint.endpoint_id, WebhookEndpoint.user_id).filter(
+                WebhookEndpoint.user_id.in_(requesters), WebhookEndpoint.is_active.is_(True)
+            ):
+                endpoints[user_id].append(endpoint_id)
+
+        for ver, previous_status in changed:
+            for endpoint_id in endpoints.get(ver.requested_by, []):
+                session.add(WebhookDelivery(
+                    endpoint_id=endpoint_id,
+                    event=STATUS_CHANGED_EVENT,
+                    payload=status_change_payload(ver, previous_status),
+                    status="pending",
+                    next_attempt_at=datetime.utcnow(),
+                ))
+
+
+def status_change_payload(ver, previous_status):
+    try:
+        result = json.loads(ver.result_json) if ver.result_json else None
+    except ValueError:
+        result = ver.result_json
+    return {
+        "event": STATUS_CHANGED_EVENT,
+        "verification_id": ver.verification_id,
+        "certificate_id": ver.certificate_id,
+        "previous_status": previous_status,
+        "status": ver.status,
+        "result": result,
+        "verified_at": ver.verified_at.isoformat() if ver.verified_at else None,
+        "occurred_at": datetime.utcnow().isoformat(),
+    }
+
+
+# --------------------------
+# Delivery
+# --------------------------
+class WebhookDispatcher:
+    """Sends batches from a thread pool; DB access stays on the calling thread."""
+
+    def __init__(self, config):
+        import httpx  # deferred: only the worker sends; web processes just enqueue
+
+        self.config = config
+        self.client = httpx.Client(
+            timeout=config["WEBHOOK_TIMEOUT_SECONDS"],
+            limits=httpx.Limits(max_keepalive_connections=config["WEBHOOK_WORKERS"] * 2),
+        )
+        self.pool = ThreadPoolExecutor(max_workers=config["WEBHOOK_WORKERS"], thread_name_prefix="webhook")
+
+    def close(self):
+        self.pool.shutdown()
+        self.client.close()
+
+    def _post(self, endpoint, events):
+        """(outcome, error): delivered, failed (retried later) or skipped (never retried)."""
+        import httpx
+
+        if not self.config["WEBHOOK_ALLOW_PRIVATE_URLS"]:
+            try:
+                address = non_public_address(endpoint.url)
+            except (socket.gaierror, UnicodeError) as e:
+                return "failed", f"Cannot resolve host: {e}"  # may be temporary
+            except ValueError:
+                return "skipped", "invalid url"
+            if address:
+                return "skipped", f"host resolves to a non-public address ({address})"
+
+        body = json.dumps({"events": events}, separators=(",", ":")).encode()
+        timestamp = str(int(time.time()))
+        try:
+            response = self.client.post(endpoint.url, content=body, headers={
+                "Content-Type": "application/json",
+                "X-Undiziwa-Timestamp": timestamp,
+                "X-Undiziwa-Signature": "sha256=" + sign_payload(endpoint.secret, timestamp, body),
+            })
+            response.raise_for_status()
+            return "delivered", None
+        except httpx.HTTPError as e:
+            return "failed", str(e) or type(e).__name__
+
+    def deliver_due(self):
+        """One delivery round. Returns a dict of metrics for the round."""
+        now = datetime.utcnow()
+        due = (
+            WebhookDelivery.query
+            .filter(WebhookDelivery.status == "pending", WebhookDelivery.next_attempt_at <= now)
+            .order_by(WebhookDelivery.delivery_id)
+            .limit(self.config["WEBHOOK_BATCH_SIZE"] * self.config["WEBHOOK_WORKERS"])
+            .all()
+        )
+
+        batches = defaultdict(list)
+        for delivery in due:
+            if len(batches[delivery.endpoint_id]) < self.config["WEBHOOK_BATCH_SIZE"]:
+                batches[delivery.endpoint_id].append(delivery)
+
+        endpoints = {
+            endpoint.endpoint_id: endpoint
+            for endpoint in WebhookEndpoint.query.filter(WebhookEndpoint.endpoint_id.in_(batches)).all()
+        }
+
+        futures = {
+            endpoint_id: self.pool.submit(self._post, endpoints[endpoint_id], [d.payload for d in deliveries])
+            for endpoint_id, deliveries in batches.items()
+            if endpoint_id in endpoints and endpoints[endpoint_id].is_active
+        }
+
+        delivered, failed, skipped, latencies = 0, 0, 0, []
+        finished = datetime.utcnow()
+        for endpoint_id, deliveries in batches.items():
+            if endpoint_id in futures:
+                outcome, error = futures[endpoint_id].result()
+            else:
+                outcome, error = "skipped", "endpoint disabled"
+            for delivery in deliveries:
+                if outcome == "skipped":
+                    delivery.status = "skipped"
+                    delivery.last_error = error
+                    skipped += 1
+                    continue
+                delivery.attempts = (delivery.attempts or 0) + 1
+                if outcome == "delivered":
+                    delivery.status = "delivered"
+                    delivery.delivered_at = finished
+                    latencies.append((finished - delivery.created_at).total_seconds())
+                    delivered += 1
+                else:
+                    delivery.last_error = error
+                    failed += 1
+                    if delivery.attempts >= self.config["WEBHOOK_MAX_ATTEMPTS"]:
+                        delivery.status = "dead"
+                    else:
+                        delivery.next_attempt_at = finished + retry_delay(
+                            delivery.attempts, self.config["WEBHOOK_BACKOFF_SECONDS"]
+                        )
+        db.session.commit()
+
+        return {
+            "batches": len(batches),
+            "delivered": delivered,
+            "failed": failed,
+            "skipped": skipped,
+            "avg_latency_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "queue_depth": queue_depth(),
+        }
+
+
+def retry_delay(attempts, base_seconds):
+    """Exponential backoff with jitter: base * 2^(attempts-1) * [0.5, 1.5)."""
+    return timedelta(seconds=base_seconds * 2 ** (attempts - 1) * random.uniform(0.5, 1.5))
+
+
+# --------------------------
+# Reporting
+# --------------------------
+def queue_depth():
+    return db.session.query(func.count()).select_from(WebhookDelivery).filter(
+        WebhookDelivery.status == "pending"
+    ).scalar()
+
+
+def delivery_stats(window_minutes=60):
+    since = datetime.utcnow() - timedelta(minutes=window_minutes)
+    rows = (
+        db.session.query(WebhookDelivery.created_at, WebhookDelivery.delivered_at)
+        .filter(WebhookDelivery.status == "delivered", WebhookDelivery.delivered_at >= since)
+        .all()
+    )
+    latencies = sorted((delivered - created).total_seconds() for created, delivered in rows)
+    oldest_pending = db.session.query(func.min(WebhookDelivery.created_at)).filter(
+        WebhookDelivery.status == "pending"
+    ).scalar()
+
+    return {
+        "queue_depth": queue_depth(),
+        "dead_letters": db.session.query(func.count()).select_from(WebhookDelivery).filter(
+            WebhookDelivery.status == "dead"
+        ).scalar(),
+        "skipped": db.session.query(func.count()).select_from(WebhookDelivery).filter(
+            WebhookDelivery.status == "skipped"
+        ).scalar(),
+        "oldest_pending_age_seconds": (
+            round((datetime.utcnow() - oldest_pending).total_seconds(), 1) if oldest_pending else None
+        ),
+        "window_minutes": window_minutes,
+        "delivered": len(latencies),
+        "latency_seconds": {
+            "avg": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": latencies[len(latencies) // 2] if latencies else None,
+            "p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        },
+    }